@@ -0,0 +1,222 @@
+"""Search-as-you-type suggestions over drink and ingredient names.
+
+Names are kept in one sorted array of lowercase keys, with an entry for
+every word start ("new york sour", "york sour", "sour"), so a prefix is a
+bisect range and "sour" finds "New York Sour". Each name carries a weight
+(favourites + searches). One- and two-letter prefixes match too many names
+to rank per request, so their best matches are kept in small lists that
+are updated in place as entries and weights change.
+
+The index is built from the database once and then kept up to date one
+name at a time as drinks are mirrored, created, edited or deleted.
+"""
+
+import heapq
+import string
+import threading
+from bisect import bisect_left, bisect_right
+
+from ingredients import normalize_ingredient
+from models import db, CatalogDrink, Drink
+from popularity import favourite_counts
+
+MAX_LIMIT = 20
+SHORT_PREFIX = 2
+TOP_KEEP = MAX_LIMIT * 2
+
+
+def normalize(text):
+    return normalize_ingredient(text) or ''
+
+
+class Autocomplete:
+    """Prefix suggestions ranked by weight.
+
+    Entries are identified by a hashable key, e.g. ('catalog', 11007), and
+    have a display label and a kind ('drink' or 'ingredient').
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self._keys = []
+        self._refs = []
+        self._top = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def _word_starts(label):
+        words = normalize(label).split(' ')
+        return {' '.join(words[i:]) for i in range(len(words)) if words[i]}
+
+    @classmethod
+    def _short_prefixes(cls, label):
+        return {start[:n] for start in cls._word_starts(label) for n in range(1, SHORT_PREFIX + 1)}
+
+    def _rank(self, key):
+        entry = self.entries[key]
+        return -entry['weight'], len(entry['label']), entry['label']
+
+    def _best(self, prefix, n):
+        lo = bisect_left(self._keys, prefix)
+        hi = bisect_left(self._keys, prefix + '\uffff', lo)
+        return heapq.nsmallest(n, set(self._refs[lo:hi]), key=self._rank)
+
+    def _offer(self, key):
+        """Re-rank `key` in the memoised top lists of its short prefixes."""
+        for prefix in self._short_prefixes(self.entries[key]['label']):
+            top = self._top.get(prefix)
+            if top is not None:
+                if key not in top:
+                    top.append(key)
+                top.sort(key=self._rank)
+                del top[TOP_KEEP:]
+
+    def add(self, key, label, kind='drink', weight=0):
+        """Add or replace one entry; an existing entry keeps its weight."""
+
+        with self._lock:
+            old = self.entries.get(key)
+            if old is not None:
+                if old['label'] == label:
+                    return
+                weight = max(weight, old['weight'])
+                self.remove(key)
+            self.entries[key] = {'label': label, 'kind': kind, 'weight': weight}
+            for start in self._word_starts(label):
+                i = bisect_right(self._keys, start)
+                self._keys.insert(i, start)
+                self._refs.insert(i, key)
+            self._offer(key)
+
+    def add_many(self, rows):
+        """Add (key, label, kind, weight) rows for new keys with one sort."""
+
+        with self._lock:
+            pairs = list(zip(self._keys, self._refs))
+            for key, label, kind, weight in rows:
+                if key in self.entries:
+                    continue
+                self.entries[key] = {'label': label, 'kind': kind, 'weight': weight}
+                pairs.extend((start, key) for start in self._word_starts(label))
+            pairs.sort(key=lambda pair: pair[0])
+            self._keys = [start for start, _ in pairs]
+            self._refs = [key for _, key in pairs]
+            self._top.clear()
+
+    def remove(self, key):
+        with self._lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return
+            for start in self._word_starts(entry['label']):
+                i = bisect_left(self._keys, start)
+                while self._refs[i] != key:
+                    i += 1
+                del self._keys[i]
+                del self._refs[i]
+            # the next best name isn't known; recompute these lists on demand
+            for prefix in self._short_prefixes(entry['label']):
+                top = self._top.get(prefix)
+                if top is not None and key in top:
+                    del self._top[prefix]
+
+    def add_weight(self, key, amount=1):
+        with self._lock:
+            if key in self.entries:
+                self.entries[key]['weight'] += amount
+                self._offer(key)
+
+    def bump(self, label, amount=1):
+        """Add popularity to every entry labelled `label` (case-insensitive)."""
+
+        target = normalize(label)
+        with self._lock:
+            lo = bisect_left(self._keys, target)
+            hi = bisect_right(self._keys, target, lo)
+            for key in set(self._refs[lo:hi]):
+                if normalize(self.entries[key]['label']) == target:
+                    self.add_weight(key, amount)
+
+    def warm(self, prefixes):
+        """Rank the given short prefixes now rather than on their first request."""
+        for prefix in prefixes:
+            self.suggest(prefix)
+
+    def suggest(self, prefix, limit=10):
+        """Best `limit` entries with a word starting with `prefix`."""
+
+        prefix = normalize(prefix)
+        limit = min(limit, MAX_LIMIT)
+        if not prefix:
+            return []
+
+        with self._lock:
+            if len(prefix) <= SHORT_PREFIX:
+                # broad prefixes match thousands of names; keep their ranking
+                top = self._top.get(prefix)
+                if top is None:
+                    top = self._top[prefix] = self._best(prefix, TOP_KEEP)
+                best = list(top)
+            else:
+                best = self._best(prefix, limit * 2)
+
+            found, seen = [], set()
+            for key in best:
+                entry = self.entries[key]
+                label = normalize(entry['label'])
+                if label in seen:
+                    continue
+                seen.add(label)
+                found.append({'label': entry['label'], 'kind': entry['kind']})
+                if len(found) == limit:
+                    break
+        return found
+
+
+def catalog_rows(data, weight=0):
+    yield ('catalog', int(data['idDrink'])), data.get('strDrink') or '', 'drink', weight
+    yield from ingredient_rows(data.get(f'strIngredient{n}') for n in range(1, 16))
+
+
+def user_drink_rows(drink):
+    yield ('drink', drink.id), drink.name or '', 'drink', 0
+    yield from ingredient_rows(getattr(drink, f'ingredient{n}') for n in range(1, 11))
+
+
+def ingredient_rows(names):
+    for name in filter(None, map(normalize_ingredient, names)):
+        yield ('ingredient', name), name.title(), 'ingredient', 0
+
+
+def build_index(search_counts=()):
+    """Index every mirrored drink, user drink and ingredient name.
+
+    `search_counts` is (term, count) pairs from the search log; each count
+    is added to the weight of entries with that name.
+    """
+
+    index = Autocomplete()
+    favourites = favourite_counts()
+    rows = []
+    for data in db.session.execute(db.select(CatalogDrink.data)).scalars():
+        rows.extend(catalog_rows(data, favourites.get(int(data['idDrink']), 0)))
+    for drink in db.session.execute(db.select(Drink)).scalars():
+        rows.extend(user_drink_rows(drink))
+    index.add_many(rows)
+    for term, count in search_counts:
+        index.bump(term, count)
+    index.warm(string.ascii_lowercase + string.digits)
+    return index
+
+
+def index_catalog_drink(index, data):
+    for row in catalog_rows(data):
+        index.add(*row)
+
+
+def index_user_drink(index, drink):
+    for row in user_drink_rows(drink):
+        index.add(*row)
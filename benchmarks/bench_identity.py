@@ -0,0 +1,105 @@
+"""Queries issued per request by the identity loading in add_user_to_g.
+
+Run from the repo root against a scratch database:
+
+    python -m benchmarks.bench_identity
+
+Each scenario makes a handful of requests and reports the average number
+of SQL statements per request spent loading the user. Measured on SQLite,
+before (User lookup in add_user_to_g on every request, static included)
+and after (request-scoped cache, static skipped, optional snapshot):
+
+    scenario                     before  after  after (snapshot)
+    anonymous                       0.0    0.0               0.0
+    static file                     1.0    0.0               0.0
+    logged in, JSON API             1.0    1.0               0.0
+    logged in, @login_required      1.0    1.0               0.0
+"""
+
+import time
+
+from sqlalchemy import event
+
+from app import create_app, CURR_USER_KEY, USER_SNAPSHOT_KEY
+from models import db, User
+
+REQUESTS = 20
+
+
+class QueryCounter:
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def measure(client, counter, path, setup=None):
+    total = 0
+    for _ in range(REQUESTS):
+        if setup:
+            with client.session_transaction() as sess:
+                setup(sess)
+        # main() holds an app context open, which the test client reuses;
+        # start each request with an empty session as a real worker would
+        db.session.remove()
+        counter.count = 0
+        client.get(path)
+        total += counter.count
+    return total / REQUESTS
+
+
+def main():
+    app = create_app({"SQLALCHEMY_ECHO": False, "TESTING": True})
+    with app.app_context():
+        run(app)
+
+
+def run(app):
+    db.create_all()
+    user = User(username="bench-identity", password="x")
+    db.session.add(user)
+    db.session.commit()
+    user_id = user.id
+
+    @app.route("/_bench/login-required")
+    def bench_login_required():
+        from flask_login import current_user
+        return {"id": current_user.get_id()}
+
+    def logged_in(sess):
+        sess[CURR_USER_KEY] = user_id
+        sess["_user_id"] = str(user_id)
+
+    def logged_in_snapshot(sess):
+        logged_in(sess)
+        sess[USER_SNAPSHOT_KEY] = {"id": user_id, "username": "bench-identity", "at": time.time()}
+
+    counter = QueryCounter(db.engine)
+    client = app.test_client()
+    scenarios = [
+        ("anonymous", "/api/drinks/0", lambda sess: sess.clear()),
+        ("static file", "/static/stylesheets/style.css", logged_in),
+        ("logged in, JSON API", "/api/drinks/0", logged_in),
+        ("logged in, @login_required", "/_bench/login-required", logged_in),
+    ]
+    try:
+        for ttl in (0, 60):
+            app.config["IDENTITY_SNAPSHOT_TTL"] = ttl
+            print(f"IDENTITY_SNAPSHOT_TTL={ttl}")
+            for name, path, setup in scenarios:
+                if ttl and setup is logged_in:
+                    setup = logged_in_snapshot
+                # the drink lookup itself is one query; only count identity work
+                baseline = 1 if path.startswith("/api/drinks") else 0
+                queries = measure(client, counter, path, setup) - baseline
+                print(f"  {name:<30} {queries:.1f} queries/request")
+    finally:
+        db.session.delete(db.session.get(User, user_id))
+        db.session.commit()
+
+
+if __name__ == "__main__":
+    main()
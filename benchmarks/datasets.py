@@ -0,0 +1,84 @@
+"""Seeded benchmark datasets, for SQLite or Postgres.
+
+Each size describes how many drinks the fake upstream knows, how many of
+those are mirrored locally (the rest are fetched from the fake upstream
+on demand), and how many users, user-created drinks and favourites there
+are. Seeding is deterministic for a given size and seed.
+"""
+
+import random
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+
+import ingredients
+import popularity
+from benchmarks.fake_upstream import INGREDIENTS, STYLES, BASES, drink, drink_id
+from models import db, User, Drink, AddDrink, CatalogDrink, DrinkIngredient
+
+SIZES = {
+    'small': dict(upstream=1000, mirrored=500, users=20, user_drinks=200, favourites=10),
+    'medium': dict(upstream=10000, mirrored=5000, users=200, user_drinks=5000, favourites=30),
+    'large': dict(upstream=50000, mirrored=25000, users=2000, user_drinks=50000, favourites=50),
+}
+BATCH = 5000
+
+Dataset = namedtuple('Dataset', 'size upstream user_ids drink_ids own_drink_ids')
+
+
+def _batches(rows):
+    for start in range(0, len(rows), BATCH):
+        yield rows[start:start + BATCH]
+
+
+def seed(size, seed=0):
+    """Fill an empty schema with the `size` dataset. Returns a Dataset."""
+
+    spec = SIZES[size]
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+
+    for rows in _batches([{'id': drink_id(n), 'name': data['strDrink'],
+                           'category': data['strCategory'], 'synced_at': now, 'data': data}
+                          for n, data in ((n, drink(n)) for n in range(spec['mirrored']))]):
+        db.session.execute(insert(CatalogDrink), rows)
+
+    # one hash for every account; benchmarks don't log in through the form
+    password = generate_password_hash("benchmark")
+    user_ids = db.session.execute(
+        insert(User).returning(User.id, sort_by_parameter_order=True),
+        [{'username': f"bench{n}", 'password': password} for n in range(spec['users'])]
+    ).scalars().all()
+
+    own = []
+    for n in range(spec['user_drinks']):
+        row = {'name': f"{rng.choice(STYLES)} {rng.choice(BASES)} by bench{n % len(user_ids)}",
+               'category': 'Cocktail', 'instructions': 'Stir.',
+               'user_id': user_ids[n % len(user_ids)]}
+        for i, name in enumerate(rng.sample(INGREDIENTS, rng.randint(2, 6)), start=1):
+            row[f'ingredient{i}'] = name
+        own.append(row)
+    own_drink_ids = []
+    for rows in _batches(own):
+        ids = db.session.execute(
+            insert(Drink).returning(Drink.id, sort_by_parameter_order=True), rows
+        ).scalars().all()
+        drinks = db.session.execute(db.select(Drink).where(Drink.id.in_(ids))).scalars().all()
+        db.session.execute(insert(DrinkIngredient), ingredients.link_rows(drinks))
+        own_drink_ids.extend(ids)
+
+    favourites = []
+    for user_id in user_ids:
+        for n, picked in enumerate(rng.sample(range(spec['upstream']), spec['favourites'])):
+            favourites.append({'user_id': user_id, 'drink_id': drink_id(picked),
+                               'created_at': now - timedelta(minutes=n)})
+    for rows in _batches(favourites):
+        db.session.execute(insert(AddDrink), rows)
+    popularity.reconcile_totals()
+    db.session.commit()
+    db.session.expunge_all()
+
+    return Dataset(size, spec['upstream'], user_ids,
+                   [drink_id(n) for n in range(spec['upstream'])], own_drink_ids)
@@ -0,0 +1,170 @@
+"""A local stand-in for TheCocktailDB, for benchmarks.
+
+Serves the three endpoints the app uses (search.php?s=, search.php?f=,
+lookup.php?i=) from a deterministic, generated catalogue, with a
+configurable delay and error rate per request. Run it on its own with
+
+    python -m benchmarks.fake_upstream --port 8099 --latency 0.05 --error-rate 0.01
+
+and point the app at it with COCKTAILDB_URL=http://127.0.0.1:8099/api/json/v1/1.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from drink_words import BASES, INGREDIENTS, STYLES
+
+API_PREFIX = "/api/json/v1/1/"
+FIRST_ID = 100000
+
+SEARCH_TERMS = [base.lower() for base in BASES] + [style.lower() for style in STYLES]
+
+
+def drink_id(n):
+    return FIRST_ID + n
+
+
+def drink(n):
+    """The n-th generated drink, in TheCocktailDB's JSON shape."""
+
+    rng = random.Random(n)
+    name = f"{STYLES[n % len(STYLES)]} {BASES[(n // len(STYLES)) % len(BASES)]} No. {n}"
+    # a skewed pick, so a few spirits are in most drinks as in the real data
+    picked, wanted = [], rng.randint(3, 7)
+    while len(picked) < wanted:
+        ingredient = INGREDIENTS[min(int(rng.paretovariate(1.2)) - 1, len(INGREDIENTS) - 1)
+                                 if rng.random() < 0.5 else rng.randrange(len(INGREDIENTS))]
+        if ingredient not in picked:
+            picked.append(ingredient)
+    data = {
+        "idDrink": str(drink_id(n)),
+        "strDrink": name,
+        "strCategory": "Cocktail" if n % 3 else "Shot",
+        "strAlcoholic": "Alcoholic",
+        "strGlass": "Cocktail glass",
+        "strInstructions": f"Shake {', '.join(picked).lower()} with ice and strain.",
+        "strDrinkThumb": f"https://example.invalid/{n}.jpg",
+        "dateModified": "2016-07-18 22:49:04",
+    }
+    for i in range(1, 16):
+        data[f"strIngredient{i}"] = picked[i - 1] if i <= len(picked) else None
+        data[f"strMeasure{i}"] = "1 oz" if i <= len(picked) else None
+    return data
+
+
+class FakeCocktailDB:
+    """Threaded HTTP server over `size` generated drinks.
+
+    Every request sleeps `latency` seconds (plus up to `jitter` more) and
+    fails with a 500 with probability `error_rate`.
+    """
+
+    def __init__(self, size=1000, latency=0.0, jitter=0.0, error_rate=0.0,
+                 host="127.0.0.1", port=0, seed=0):
+        self.size = size
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._names = [(drink(n)["strDrink"].lower(), n) for n in range(size)]
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX.rstrip('/')}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="fake-cocktaildb", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def respond(self, path, params):
+        """(status, body) for one request."""
+
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + self._rng.random() * self.jitter
+            failed = self._rng.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        if delay:
+            time.sleep(delay)
+        if failed:
+            return 500, {"error": "injected failure"}
+
+        endpoint = path[len(API_PREFIX):] if path.startswith(API_PREFIX) else None
+        if endpoint == "lookup.php":
+            n = int(params.get("i", "0")) - FIRST_ID
+            return 200, {"drinks": [drink(n)] if 0 <= n < self.size else None}
+        if endpoint == "search.php" and "f" in params:
+            letter = params["f"][:1].lower()
+            found = [drink(n) for name, n in self._names if name.startswith(letter)]
+            return 200, {"drinks": found or None}
+        if endpoint == "search.php":
+            term = params.get("s", "").lower()
+            found = [drink(n) for name, n in self._names if term in name][:100]
+            return 200, {"drinks": found or None}
+        return 404, {"error": "not found"}
+
+    def _handler(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                status, body = upstream.respond(url.path, params)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    upstream = FakeCocktailDB(args.size, args.latency, args.jitter, args.error_rate,
+                              port=args.port).start()
+    print(f"Serving {args.size} drinks at {upstream.url}")
+    try:
+        upstream._thread.join()
+    except KeyboardInterrupt:
+        upstream.stop()
+
+
+if __name__ == "__main__":
+    main()
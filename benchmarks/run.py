@@ -0,0 +1,262 @@
+"""Load-test the app against a local fake upstream and compare with baselines.
+
+    python -m benchmarks.run                        # small SQLite dataset, all scenarios
+    python -m benchmarks.run --size medium --scenario search --concurrency 16
+    python -m benchmarks.run --latency 0.05 --error-rate 0.02
+    python -m benchmarks.run --database-url postgresql:///mixology-bench
+    python -m benchmarks.run --update-baseline      # accept the current numbers
+
+The app is served by a threaded werkzeug server in this process. Each
+scenario runs `--iterations` iterations over `--concurrency` simulated,
+logged-in users and reports requests per second, p50/p95/p99 latency and
+SQL statements per request. Results are compared with the stored
+baseline for the same database, dataset size, concurrency and upstream
+settings; baselines are machine-specific, so record your own with
+--update-baseline before comparing. A run fails (exit status
+1) when throughput drops or latency or queries per request rise by more
+than `--tolerance`, or when more requests fail with a 5xx than in the
+baseline. Latencies of error pages mean nothing, so unless --error-rate
+injects upstream failures a baseline is only saved if no request failed.
+
+The database at --database-url is dropped and re-seeded; by default a
+throwaway SQLite file is used.
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+from sqlalchemy import event
+from werkzeug.serving import make_server
+
+from benchmarks.fake_upstream import FakeCocktailDB
+from benchmarks.scenarios import SCENARIOS
+
+BASELINES = os.path.join(os.path.dirname(__file__), "baselines.json")
+METRICS = ("rps", "p50_ms", "p95_ms", "p99_ms", "queries_per_request", "error_rate")
+
+
+class QueryCounter:
+    """SQL statements executed on `engine`, from any thread."""
+
+    def __init__(self, engine):
+        self.count = 0
+        self._lock = threading.Lock()
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        with self._lock:
+            self.count += 1
+
+
+class Stats:
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def add(self, seconds, status):
+        with self._lock:
+            self.latencies.append(seconds)
+            if status >= 500:
+                self.errors += 1
+
+
+class Client:
+    """One simulated user with their own cookie session."""
+
+    def __init__(self, base_url, user_id, stats):
+        self.base_url = base_url
+        self.user_id = user_id
+        self.stats = stats
+        self.session = requests.Session()
+        self.session.get(f"{base_url}/_bench/login/{user_id}").raise_for_status()
+
+    def request(self, method, path, **kwargs):
+        started = time.perf_counter()
+        res = self.session.request(method, self.base_url + path, allow_redirects=False, **kwargs)
+        self.stats.add(time.perf_counter() - started, res.status_code)
+        return res
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run_scenario(scenario, base_url, data, iterations, concurrency, seed):
+    stats = Stats()
+    claimed = itertools.count()
+
+    def worker(n):
+        client = Client(base_url, data.user_ids[n % len(data.user_ids)], stats)
+        rng = random.Random(seed * 1000 + n)
+        while next(claimed) < iterations:
+            scenario(client, rng, data)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats, time.perf_counter() - started
+
+
+def measure(name, base_url, data, counter, args):
+    scenario = SCENARIOS[name]
+    run_scenario(scenario, base_url, data, args.warmup, args.concurrency, args.seed + 1)
+    queries_before = counter.count
+    stats, elapsed = run_scenario(scenario, base_url, data, args.iterations,
+                                  args.concurrency, args.seed)
+    queries = counter.count - queries_before
+    ordered = sorted(stats.latencies)
+    count = len(ordered) or 1
+    return {
+        "requests": len(ordered),
+        "errors": stats.errors,
+        "error_rate": round(stats.errors / count, 4),
+        "rps": round(len(ordered) / elapsed, 1),
+        "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+        "queries_per_request": round(queries / count, 2),
+    }
+
+
+def regressions(result, baseline, tolerance):
+    """Human-readable list of metrics that got worse than `baseline` allows."""
+
+    found = []
+    # any 5xx beyond what the baseline had (e.g. injected upstream errors)
+    # means requests broke, whatever the timings say
+    if result["error_rate"] > baseline.get("error_rate", 0):
+        found.append(f"error rate {result['error_rate']:.2%} > {baseline.get('error_rate', 0):.2%} "
+                     f"({result['errors']} of {result['requests']} requests)")
+    if result["rps"] < baseline["rps"] * (1 - tolerance):
+        found.append(f"rps {result['rps']} < {baseline['rps']}")
+    # the slowest 1% is a handful of requests, so p99 gets twice the slack
+    for metric, slack in (("p50_ms", tolerance), ("p95_ms", tolerance), ("p99_ms", 2 * tolerance)):
+        if result[metric] > baseline[metric] * (1 + slack):
+            found.append(f"{metric} {result[metric]} > {baseline[metric]}")
+    # statement counts are deterministic, so any real increase is a regression
+    if result["queries_per_request"] > baseline["queries_per_request"] + 0.5:
+        found.append(f"queries/request {result['queries_per_request']} > "
+                     f"{baseline['queries_per_request']}")
+    return found
+
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baselines(path, baselines):
+    with open(path, "w") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="small", help="Dataset size: small, medium or large.")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Scenario to run (repeatable; default: all).")
+    parser.add_argument("--database-url", help="Database to wipe and seed (default: temp SQLite).")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake upstream delay (s).")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random upstream delay (s).")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fake upstream 500 rate.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baselines", default=BASELINES)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--update-baseline", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from benchmarks.datasets import SIZES
+    upstream = FakeCocktailDB(SIZES[args.size]["upstream"], args.latency, args.jitter,
+                              args.error_rate, seed=args.seed).start()
+    workdir = tempfile.mkdtemp(prefix="mixology-bench-")
+    os.environ.setdefault("MIXOLOGY_PROFILE", "benchmark")
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{workdir}/bench.sqlite"
+    os.environ["COCKTAILDB_URL"] = upstream.url
+
+    from app import create_app, CURR_USER_KEY
+    from benchmarks.datasets import seed
+    from models import db
+
+    app = create_app({"TESTING": True, "SQLALCHEMY_ECHO": False})
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        data = seed(args.size, args.seed)
+        counter = QueryCounter(db.engine)
+        dialect = db.engine.dialect.name
+
+    @app.route("/_bench/login/<int:user_id>")
+    def bench_login(user_id):
+        from flask import session
+        session[CURR_USER_KEY] = user_id
+        session["_user_id"] = str(user_id)
+        return {"id": user_id}
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-server", daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    key = (f"{dialect}/{args.size} concurrency={args.concurrency} "
+           f"latency={args.latency:g} errors={args.error_rate:g}")
+    baselines = load_baselines(args.baselines)
+    stored = baselines.get(key, {})
+    failed = []
+    print(f"{key}: {args.iterations} iterations")
+    print(f"{'scenario':<12} {'reqs':>6} {'errs':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'q/req':>6}")
+    try:
+        for name in args.scenario or list(SCENARIOS):
+            result = measure(name, base_url, data, counter, args)
+            print(f"{name:<12} {result['requests']:>6} {result['errors']:>5} {result['rps']:>8} "
+                  f"{result['p50_ms']:>8} {result['p95_ms']:>8} {result['p99_ms']:>8} "
+                  f"{result['queries_per_request']:>6}")
+            if args.update_baseline:
+                if result["errors"] and not args.error_rate:
+                    failed.append(f"{name}: {result['errors']} requests failed; not saving a baseline")
+                stored[name] = {metric: result[metric] for metric in METRICS}
+            elif name in stored:
+                for problem in regressions(result, stored[name], args.tolerance):
+                    failed.append(f"{name}: {problem}")
+    finally:
+        server.shutdown()
+        upstream.stop()
+
+    print(f"upstream: {upstream.requests} requests, {upstream.errors} injected errors")
+    if args.update_baseline and not failed:
+        baselines[key] = stored
+        save_baselines(args.baselines, baselines)
+        print(f"Baseline for {key} saved to {args.baselines}")
+    if failed:
+        print("REGRESSIONS:\n  " + "\n  ".join(failed))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
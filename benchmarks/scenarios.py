@@ -0,0 +1,38 @@
+"""Scripted benchmark scenarios.
+
+A scenario is one iteration of one simulated user. It makes its requests
+through `client.request`, which times each one. `client.user_id` is the
+logged-in user, `data` the seeded Dataset.
+"""
+
+from benchmarks.fake_upstream import INGREDIENTS, SEARCH_TERMS
+
+
+def search(client, rng, data):
+    client.request("GET", "/search", params={"search-name": rng.choice(SEARCH_TERMS)})
+
+
+def view_drink(client, rng, data):
+    client.request("GET", f"/drinks/{rng.choice(data.drink_ids)}")
+
+
+def favourites(client, rng, data):
+    client.request("GET", f"/users/{client.user_id}/fav/")
+
+
+def api_crud(client, rng, data):
+    created = client.request("POST", "/api/drinks", json={"name": f"Bench {rng.randrange(10**6)}"})
+    if created.status_code != 201:
+        return
+    drink_id = created.json()["drink"]["id"]
+    client.request("GET", f"/api/drinks/{drink_id}")
+    client.request("PATCH", f"/api/drinks/{drink_id}", json={"ingredient1": rng.choice(INGREDIENTS)})
+    client.request("DELETE", f"/api/drinks/{drink_id}")
+
+
+SCENARIOS = {
+    'search': search,
+    'view_drink': view_drink,
+    'favourites': favourites,
+    'api_crud': api_crud,
+}
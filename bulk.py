@@ -0,0 +1,183 @@
+"""Batch create / update / delete for the drinks JSON API.
+
+Each batch is validated item by item, then every valid item is written in
+one transaction with executemany-style statements. If the batch statement
+itself fails, it is rolled back and replayed one item per savepoint, so a
+single bad row is reported against its own index instead of failing the
+whole batch.
+"""
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.exc import SQLAlchemyError
+
+import ingredients
+from models import db, Drink, DrinkIngredient
+
+DRINK_FIELDS = ('name', 'category', 'instructions',
+                *(f'ingredient{n}' for n in range(1, 11)))
+INGREDIENT_FIELDS = frozenset(f'ingredient{n}' for n in range(1, 11))
+
+
+class ItemError(Exception):
+    """One batch item is invalid; the message is reported back to the caller."""
+
+
+def is_id(value):
+    # JSON true/false arrive as bools, which are ints to isinstance
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def clean(item, creating):
+    if not isinstance(item, dict):
+        raise ItemError("item must be an object")
+    unknown = set(item) - set(DRINK_FIELDS) - {'id'}
+    if unknown:
+        raise ItemError(f"unknown fields: {', '.join(sorted(unknown))}")
+    values = {field: item[field] for field in DRINK_FIELDS if field in item}
+    for field, value in values.items():
+        if value is not None and not isinstance(value, str):
+            raise ItemError(f"{field} must be a string")
+    if creating:
+        if not values.get('name'):
+            raise ItemError("name is required")
+    else:
+        if not is_id(item.get('id')):
+            raise ItemError("id is required")
+        if 'name' in values and not values['name']:
+            raise ItemError("name cannot be empty")
+        values['id'] = item['id']
+    return values
+
+
+def _rebuild_links(drink_ids):
+    if not drink_ids:
+        return
+    db.session.execute(delete(DrinkIngredient).where(DrinkIngredient.drink_id.in_(drink_ids)))
+    drinks = db.session.execute(
+        db.select(Drink).where(Drink.id.in_(drink_ids))
+        .execution_options(populate_existing=True)
+    ).scalars().all()
+    links = ingredients.link_rows(drinks)
+    if links:
+        db.session.execute(insert(DrinkIngredient), links)
+
+
+def _insert(rows):
+    ids = db.session.execute(
+        insert(Drink).returning(Drink.id, sort_by_parameter_order=True), rows
+    ).scalars().all()
+    _rebuild_links(ids)
+    return ids
+
+
+def _update(rows):
+    db.session.execute(update(Drink), rows)
+    _rebuild_links([row['id'] for row in rows if INGREDIENT_FIELDS & set(row)])
+    return [row['id'] for row in rows]
+
+
+def _delete(ids):
+    db.session.execute(delete(DrinkIngredient).where(DrinkIngredient.drink_id.in_(ids)))
+    db.session.execute(delete(Drink).where(Drink.id.in_(ids)))
+    return list(ids)
+
+
+def _write(rows, positions, write, status, results):
+    """Run `write` over all rows in one go, falling back to one savepoint per row."""
+
+    if not rows:
+        return []
+    try:
+        ids = write(rows)
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        ids = []
+        for row, position in zip(rows, positions):
+            try:
+                with db.session.begin_nested():
+                    ids.extend(write([row]))
+                results[position] = {'index': position, 'status': status, 'id': ids[-1]}
+            except SQLAlchemyError as exc:
+                results[position] = {'index': position, 'status': 'error',
+                                     'error': str(exc.orig if hasattr(exc, 'orig') else exc)}
+        db.session.commit()
+        return ids
+
+    for position, drink_id in zip(positions, ids):
+        results[position] = {'index': position, 'status': status, 'id': drink_id}
+    return ids
+
+
+def _summary(results, ids):
+    failed = sum(1 for r in results if r['status'] == 'error')
+    return {'results': results, 'succeeded': len(results) - failed, 'failed': failed}, ids
+
+
+def create_drinks(items):
+    """Insert many drinks. Returns (response body, ids created)."""
+
+    results = [None] * len(items)
+    rows, positions = [], []
+    for position, item in enumerate(items):
+        try:
+            rows.append(clean(item, creating=True))
+            positions.append(position)
+        except ItemError as exc:
+            results[position] = {'index': position, 'status': 'error', 'error': str(exc)}
+    ids = _write(rows, positions, _insert, 'created', results)
+    return _summary(results, ids)
+
+
+def update_drinks(items):
+    """Partially update many drinks by id. Returns (response body, ids updated)."""
+
+    results = [None] * len(items)
+    cleaned = {}
+    seen = set()
+    for position, item in enumerate(items):
+        try:
+            values = clean(item, creating=False)
+            if values['id'] in seen:
+                raise ItemError("id appears more than once in this batch")
+            seen.add(values['id'])
+            cleaned[position] = values
+        except ItemError as exc:
+            results[position] = {'index': position, 'status': 'error', 'error': str(exc)}
+
+    existing = set(db.session.execute(
+        db.select(Drink.id).where(Drink.id.in_([v['id'] for v in cleaned.values()]))
+    ).scalars())
+    rows, positions = [], []
+    for position, values in cleaned.items():
+        if values['id'] not in existing:
+            results[position] = {'index': position, 'status': 'error', 'error': "not found"}
+        else:
+            rows.append(values)
+            positions.append(position)
+    ids = _write(rows, positions, _update, 'updated', results)
+    return _summary(results, ids)
+
+
+def delete_drinks(ids):
+    """Delete many drinks by id. Returns (response body, ids deleted)."""
+
+    results = [None] * len(ids)
+    wanted = [i for i in ids if is_id(i)]
+    existing = set(db.session.execute(db.select(Drink.id).where(Drink.id.in_(wanted))).scalars())
+    seen = set()
+    rows, positions = [], []
+    for position, drink_id in enumerate(ids):
+        if not is_id(drink_id):
+            results[position] = {'index': position, 'status': 'error', 'error': "id must be an integer"}
+        elif drink_id in seen:
+            results[position] = {'index': position, 'status': 'error',
+                                 'error': "id appears more than once in this batch"}
+        elif drink_id not in existing:
+            results[position] = {'index': position, 'status': 'error', 'error': "not found"}
+        else:
+            seen.add(drink_id)
+            rows.append(drink_id)
+            positions.append(position)
+    deleted = _write(rows, positions, _delete, 'deleted', results)
+    return _summary(results, deleted)
@@ -0,0 +1,506 @@
+"""Read-through cache for upstream CocktailDB lookups.
+
+Two interchangeable backends are provided:
+
+* LRUCache - in-process, TTL + size bounded, evicts least recently used.
+* DBCache  - shared between workers, stored in the `api_cache` table.
+
+Both expose the same small interface (get / get_entry / set / invalidate /
+clear / stats) so the app can switch between them with the CACHE_BACKEND
+config.
+
+Entries have a hard TTL, after which they are gone, and optionally an
+earlier soft TTL, after which they are still served but reported as stale
+so the caller can refresh them in the background.
+
+Misses can be coalesced with a SingleFlight, so a burst of requests for
+the same key (or a popular entry expiring) costs one upstream call per
+process, or per cluster when a DBLock is attached.
+"""
+
+import asyncio
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, InvalidStateError
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import IntegrityError
+
+MISSING = object()
+
+
+class CacheStats:
+    """Hit/miss/eviction counters shared by every backend."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_hits = 0
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def as_dict(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+            'stale_hits': self.stale_hits,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with a per-entry TTL."""
+
+    def __init__(self, maxsize=1024, ttl=300, clock=time.monotonic, soft_ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.soft_ttl = soft_ttl
+        self.clock = clock
+        self.counters = CacheStats()
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=MISSING):
+        entry = self.get_entry(key)
+        return default if entry is MISSING else entry[0]
+
+    def get_entry(self, key):
+        """(value, stale) for a live entry, or MISSING."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.counters.incr('misses')
+                return MISSING
+            value, stale_at, expires_at = entry
+            now = self.clock()
+            if expires_at <= now:
+                del self._data[key]
+                self.counters.incr('expirations')
+                self.counters.incr('misses')
+                return MISSING
+            self._data.move_to_end(key)
+            self.counters.incr('hits')
+            stale = stale_at <= now
+            if stale:
+                self.counters.incr('stale_hits')
+            return value, stale
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        soft_ttl = ttl if self.soft_ttl is None else min(self.soft_ttl, ttl)
+        with self._lock:
+            now = self.clock()
+            self._data[key] = (value, now + soft_ttl, now + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.counters.incr('evictions')
+
+    def invalidate(self, key):
+        with self._lock:
+            removed = self._data.pop(key, None) is not None
+        if removed:
+            self.counters.incr('invalidations')
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return dict(self.counters.as_dict(), size=len(self._data), maxsize=self.maxsize)
+
+
+def dialect_insert(dialect):
+    """The INSERT construct with ON CONFLICT support for `dialect`, or None."""
+
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert
+
+
+class DBCache:
+    """Cache backed by the `api_cache` table so every worker shares entries.
+
+    Values are stored as JSON. Cache reads and writes run on their own
+    connection from the engine, so they never commit (or roll back) work
+    the calling request has pending in its session. A write is an upsert,
+    so workers filling the same key don't collide. At most once every
+    `trim_interval` seconds a write also deletes expired rows and, if the
+    table is still over `maxsize`, the oldest ones.
+
+    On SQLite, which allows one writer at a time, a cache write would wait
+    behind anything the same request has already flushed, so use this
+    backend with Postgres.
+    """
+
+    def __init__(self, db, model, maxsize=50000, ttl=3600, soft_ttl=None, trim_interval=60,
+                 clock=time.monotonic):
+        self.db = db
+        self.table = model.__table__
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.soft_ttl = soft_ttl
+        self.trim_interval = trim_interval
+        self.clock = clock
+        self.counters = CacheStats()
+        self._trimmed_at = clock()
+        self._trim_lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        entry = self.get_entry(key)
+        return default if entry is MISSING else entry[0]
+
+    def get_entry(self, key):
+        """(value, stale) for a live entry, or MISSING."""
+        with self.db.engine.connect() as conn:
+            entry = conn.execute(select(self.table).where(self.table.c.key == key)).first()
+        if entry is None:
+            self.counters.incr('misses')
+            return MISSING
+        now = datetime.utcnow()
+        if entry.expires_at <= now:
+            # deleted (and counted as an expiration) by the next _trim
+            self.counters.incr('misses')
+            return MISSING
+        self.counters.incr('hits')
+        stale = (self.soft_ttl is not None
+                 and entry.stored_at + timedelta(seconds=self.soft_ttl) <= now)
+        if stale:
+            self.counters.incr('stale_hits')
+        return json.loads(entry.value), stale
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        now = datetime.utcnow()
+        row = {'key': key, 'value': json.dumps(value), 'stored_at': now,
+               'expires_at': now + timedelta(seconds=ttl)}
+        with self.db.engine.begin() as conn:
+            upsert = dialect_insert(conn.dialect.name)
+            if upsert is None:
+                self._replace(conn, key, row)
+            else:
+                stmt = upsert(self.table).values(row)
+                conn.execute(stmt.on_conflict_do_update(
+                    index_elements=['key'],
+                    set_={name: stmt.excluded[name] for name in ('value', 'stored_at', 'expires_at')},
+                ))
+        if self.clock() - self._trimmed_at >= self.trim_interval:
+            self._trim()
+
+    def _replace(self, conn, key, row):
+        conn.execute(delete(self.table).where(self.table.c.key == key))
+        try:
+            with conn.begin_nested():
+                conn.execute(insert(self.table), row)
+        except IntegrityError:
+            # another worker stored the key between our delete and insert;
+            # its value is just as fresh
+            pass
+
+    def _trim(self):
+        if not self._trim_lock.acquire(blocking=False):
+            return
+        try:
+            self._trimmed_at = self.clock()
+            with self.db.engine.begin() as conn:
+                expired = conn.execute(
+                    delete(self.table).where(self.table.c.expires_at <= datetime.utcnow())).rowcount
+                self.counters.incr('expirations', expired)
+                overflow = conn.scalar(select(func.count()).select_from(self.table)) - self.maxsize
+                if overflow <= 0:
+                    return
+                oldest = (select(self.table.c.key)
+                          .order_by(self.table.c.stored_at)
+                          .limit(overflow)
+                          .scalar_subquery())
+                conn.execute(delete(self.table).where(self.table.c.key.in_(oldest)))
+            self.counters.incr('evictions', overflow)
+        finally:
+            self._trim_lock.release()
+
+    def invalidate(self, key):
+        with self.db.engine.begin() as conn:
+            removed = conn.execute(delete(self.table).where(self.table.c.key == key)).rowcount
+        if removed:
+            self.counters.incr('invalidations')
+        return bool(removed)
+
+    def clear(self):
+        with self.db.engine.begin() as conn:
+            conn.execute(delete(self.table))
+
+    def stats(self):
+        with self.db.engine.connect() as conn:
+            size = conn.scalar(select(func.count()).select_from(self.table))
+        return dict(self.counters.as_dict(), size=size, maxsize=self.maxsize)
+
+
+def make_cache(config):
+    """Build the cache backend named by config["CACHE_BACKEND"]."""
+
+    backend = config.get('CACHE_BACKEND', 'memory')
+    maxsize = config.get('CACHE_MAXSIZE', 1024)
+    ttl = config.get('CACHE_TTL', 300)
+    soft_ttl = config.get('CACHE_SOFT_TTL')
+
+    if backend == 'memory':
+        return LRUCache(maxsize=maxsize, ttl=ttl, soft_ttl=soft_ttl)
+    if backend == 'db':
+        from models import db, CachedResponse
+        return DBCache(db, CachedResponse, maxsize=maxsize, ttl=ttl, soft_ttl=soft_ttl)
+    raise ValueError(f"Unknown CACHE_BACKEND {backend!r}")
+
+
+# Result handed to followers when the leader was interrupted before it got
+# one (e.g. its request hit a deadline); they retry instead of failing.
+ABANDONED = object()
+
+
+class DBLock:
+    """Cluster-wide lease per key, stored in the `upstream_locks` table.
+
+    `acquire` returns a token when this caller now holds the lease, or None
+    when someone else does. Leases expire after `ttl` seconds so a crashed
+    worker can't hold a key forever. Like DBCache, every call runs on its
+    own connection rather than the request's session.
+    """
+
+    def __init__(self, db, model, ttl=10):
+        self.db = db
+        self.table = model.__table__
+        self.ttl = ttl
+
+    def acquire(self, key):
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+        try:
+            with self.db.engine.begin() as conn:
+                conn.execute(delete(self.table).where(self.table.c.key == key,
+                                                      self.table.c.expires_at <= now))
+                conn.execute(insert(self.table), {'key': key, 'token': token,
+                                                  'expires_at': now + timedelta(seconds=self.ttl)})
+        except IntegrityError:
+            return None
+        return token
+
+    def held(self, key):
+        with self.db.engine.connect() as conn:
+            return conn.scalar(select(
+                select(self.table.c.key)
+                .where(self.table.c.key == key, self.table.c.expires_at > datetime.utcnow())
+                .exists()))
+
+    def release(self, key, token):
+        with self.db.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.key == key,
+                                                  self.table.c.token == token))
+
+
+class SingleFlight:
+    """Let only one load per key run at a time; concurrent callers share its result.
+
+    Works across threads and event loops: callers that find a load already
+    in flight block on (or await) the leader's future. With a `lock`, the
+    leader also takes a cluster-wide lease; if another process holds it,
+    the leader polls the shared cache for that process's result instead of
+    calling the upstream itself.
+    """
+
+    def __init__(self, lock=None, poll_interval=0.05):
+        self.lock = lock
+        self.poll_interval = poll_interval
+        self.leaders = 0
+        self.followers = 0
+        self._calls = {}
+        self._mutex = threading.Lock()
+
+    def _join(self, key):
+        with self._mutex:
+            future = self._calls.get(key)
+            if future is not None:
+                self.followers += 1
+                return future, False
+            future = self._calls[key] = Future()
+            self.leaders += 1
+            return future, True
+
+    def _finish(self, key, future, value=ABANDONED, exc=None):
+        with self._mutex:
+            del self._calls[key]
+        if future.done():
+            return
+        try:
+            if exc is not None:
+                future.set_exception(exc)
+            else:
+                future.set_result(value)
+        except InvalidStateError:
+            # cancelled between the check and here; nobody is waiting on it
+            pass
+
+    def do(self, key, fn):
+        """Return fn(), or the result of an identical call already running."""
+
+        while True:
+            future, leader = self._join(key)
+            if not leader:
+                value = future.result()
+                if value is ABANDONED:
+                    continue
+                return value
+            try:
+                value = fn()
+            except Exception as exc:
+                self._finish(key, future, exc=exc)
+                raise
+            except BaseException:
+                self._finish(key, future)
+                raise
+            self._finish(key, future, value)
+            return value
+
+    async def do_async(self, key, fn):
+        """do() for coroutine functions."""
+
+        while True:
+            future, leader = self._join(key)
+            if not leader:
+                # shielded: a waiter giving up mustn't cancel the shared future
+                value = await asyncio.shield(asyncio.wrap_future(future))
+                if value is ABANDONED:
+                    continue
+                return value
+            try:
+                value = await fn()
+            except Exception as exc:
+                self._finish(key, future, exc=exc)
+                raise
+            except BaseException:
+                self._finish(key, future)
+                raise
+            self._finish(key, future, value)
+            return value
+
+    def fill(self, cache, key, loader):
+        """Load `key` into `cache`, unless another process already is."""
+
+        token = self.lock.acquire(key) if self.lock else None
+        if self.lock and token is None:
+            value = self._wait_for(cache, key)
+            if value is not MISSING:
+                return value
+        try:
+            value = loader()
+            cache.set(key, value)
+        finally:
+            if token:
+                self.lock.release(key, token)
+        return value
+
+    async def fill_async(self, cache, key, loader):
+        token = self.lock.acquire(key) if self.lock else None
+        if self.lock and token is None:
+            value = await self._wait_for_async(cache, key)
+            if value is not MISSING:
+                return value
+        try:
+            value = await loader()
+            cache.set(key, value)
+        finally:
+            if token:
+                self.lock.release(key, token)
+        return value
+
+    def _wait_for(self, cache, key):
+        deadline = time.monotonic() + self.lock.ttl
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            value = cache.get(key)
+            if value is not MISSING or not self.lock.held(key):
+                return value
+        return MISSING
+
+    async def _wait_for_async(self, cache, key):
+        deadline = time.monotonic() + self.lock.ttl
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            value = cache.get(key)
+            if value is not MISSING or not self.lock.held(key):
+                return value
+        return MISSING
+
+    def stats(self):
+        with self._mutex:
+            return {'leaders': self.leaders, 'coalesced': self.followers,
+                    'in_flight': len(self._calls)}
+
+
+def make_single_flight(config):
+    """SingleFlight for the upstream cache; config["CACHE_LOCK"] = "db" adds the lock table."""
+
+    if config.get('CACHE_LOCK', 'process') == 'db':
+        if config.get('CACHE_BACKEND', 'memory') != 'db':
+            # followers poll the cache for the leader's value, so it has to be shared
+            raise ValueError("CACHE_LOCK=db needs CACHE_BACKEND=db")
+        from models import db, UpstreamLock
+        return SingleFlight(DBLock(db, UpstreamLock, ttl=config.get('CACHE_LOCK_TTL', 10)))
+    return SingleFlight()
+
+
+def read_through(cache, key, loader, flight=None, on_stale=None):
+    """Return the cached value for `key`, calling `loader()` on a miss.
+
+    With a SingleFlight, concurrent misses for the same key share one
+    `loader()` call. A stale (past soft TTL) value is returned as is, after
+    calling `on_stale()` so the caller can schedule a refresh.
+    """
+
+    entry = cache.get_entry(key)
+    if entry is not MISSING:
+        value, stale = entry
+        if stale and on_stale is not None:
+            on_stale()
+        return value
+    if flight is None:
+        value = loader()
+        cache.set(key, value)
+        return value
+    return flight.do(key, lambda: flight.fill(cache, key, loader))
+
+
+async def read_through_async(cache, key, loader, flight=None, on_stale=None):
+    """read_through for coroutine loaders: `await loader()` on a miss."""
+
+    entry = cache.get_entry(key)
+    if entry is not MISSING:
+        value, stale = entry
+        if stale and on_stale is not None:
+            on_stale()
+        return value
+    if flight is None:
+        value = await loader()
+        cache.set(key, value)
+        return value
+    return await flight.do_async(key, lambda: flight.fill_async(cache, key, loader))
@@ -0,0 +1,156 @@
+"""Local mirror of the TheCocktailDB catalogue.
+
+`sync_catalog` walks the upstream catalogue one first letter at a time (the
+same `search.php?f=` call the old /letters/<l> route used) and upserts the
+drinks into `catalog_drinks`. Rows whose upstream `dateModified` hasn't
+changed are left alone, so re-running it only writes what changed, and
+mirrored drinks of a letter that the upstream no longer lists are deleted.
+
+Every drink a letter returns has its `synced_at` moved to the time it was
+fetched. With `max_age`, letters whose drinks were all seen that recently
+aren't fetched again, so a sync that stopped part way (or hit failing
+letters) can be rerun and only pulls what it missed.
+"""
+
+import logging
+import string
+import weakref
+from datetime import datetime
+
+from sqlalchemy import delete, func, select, update
+
+from models import db, CatalogDrink
+
+LETTERS = string.ascii_lowercase + string.digits
+
+
+def parse_modified(data):
+    value = data.get('dateModified')
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return None
+
+
+def _store(session, row, data, now):
+    modified_at = parse_modified(data)
+    if row is None:
+        session.add(CatalogDrink(id=int(data['idDrink']), name=data['strDrink'],
+                                 category=data.get('strCategory'),
+                                 modified_at=modified_at, synced_at=now, data=data))
+        return 'added'
+    if row.modified_at == modified_at and row.data == data:
+        return 'unchanged'
+    row.name = data['strDrink']
+    row.category = data.get('strCategory')
+    row.modified_at = modified_at
+    row.synced_at = now
+    row.data = data
+    return 'updated'
+
+
+def store_drink(data, now=None):
+    """Insert or update one upstream drink dict. Returns 'added', 'updated' or 'unchanged'."""
+
+    row = db.session.get(CatalogDrink, int(data['idDrink']))
+    return _store(db.session, row, data, now or datetime.utcnow())
+
+
+def store_drinks(drinks, now=None, session=None):
+    """store_drink for many drinks, reading their existing rows in one query.
+
+    Returns a map of id -> status. Writes go to `session` (default
+    db.session); the caller commits.
+    """
+
+    session = session or db.session
+    now = now or datetime.utcnow()
+    by_id = {int(data['idDrink']): data for data in drinks}
+    if not by_id:
+        return {}
+    rows = {row.id: row for row in
+            session.scalars(select(CatalogDrink).where(CatalogDrink.id.in_(list(by_id))))}
+    return {drink_id: _store(session, rows.get(drink_id), data, now)
+            for drink_id, data in by_id.items()}
+
+
+def _first_letter():
+    return func.lower(func.substr(CatalogDrink.name, 1, 1))
+
+
+def fresh_letters(letters, max_age, now=None):
+    """The letters in `letters` whose mirrored drinks were all synced within `max_age`."""
+
+    now = now or datetime.utcnow()
+    letter = _first_letter()
+    rows = db.session.execute(
+        select(letter, func.min(CatalogDrink.synced_at))
+        .where(letter.in_(list(letters)))
+        .group_by(letter)).all()
+    return {first for first, synced_at in rows if synced_at >= now - max_age}
+
+
+def sync_catalog(client, letters=LETTERS, max_age=None):
+    """Pull every drink for each letter into the mirror. Returns per-status counts.
+
+    Letters synced within `max_age` (a timedelta) are skipped; None fetches
+    them all.
+    """
+
+    counts = {'added': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0,
+              'skipped_letters': 0, 'failed_letters': 0}
+    fresh = fresh_letters(letters, max_age) if max_age is not None else set()
+    for letter in letters:
+        if letter in fresh:
+            counts['skipped_letters'] += 1
+            continue
+        try:
+            drinks = client.by_letter(letter) or []
+        except Exception:
+            logging.exception("Catalog sync failed for letter %r", letter)
+            counts['failed_letters'] += 1
+            continue
+        now = datetime.utcnow()
+        for status in store_drinks(drinks, now).values():
+            counts[status] += 1
+        seen = [int(data['idDrink']) for data in drinks]
+        db.session.execute(update(CatalogDrink).where(CatalogDrink.id.in_(seen))
+                           .values(synced_at=now))
+        counts['deleted'] += db.session.execute(
+            delete(CatalogDrink).where(_first_letter() == letter, CatalogDrink.id.not_in(seen))
+        ).rowcount
+        db.session.commit()
+    return counts
+
+
+# Engines known to have a mirrored catalogue. The mirror only ever goes
+# from empty to filled, so a yes is kept for the life of the process and
+# searches stop asking.
+_mirrored = weakref.WeakSet()
+
+
+def has_catalog():
+    engine = db.engine
+    if engine in _mirrored:
+        return True
+    found = db.session.query(CatalogDrink.id).limit(1).first() is not None
+    if found:
+        _mirrored.add(engine)
+    return found
+
+
+def get_catalog_drink(drink_id):
+    row = db.session.get(CatalogDrink, int(drink_id))
+    return row.data if row else None
+
+
+def get_catalog_drinks(ids):
+    """Map of id -> drink data for every id the mirror has, in one query."""
+
+    ids = [int(i) for i in ids]
+    if not ids:
+        return {}
+    rows = CatalogDrink.query.filter(CatalogDrink.id.in_(ids)).all()
+    return {row.id: row.data for row in rows}
@@ -0,0 +1,297 @@
+"""Shared HTTP client for TheCocktailDB.
+
+One pooled, keep-alive `requests.Session` is shared by every worker thread.
+Transient failures are retried with jittered exponential backoff, and a
+circuit breaker stops calling the upstream for a while once it keeps
+failing, so an outage fails fast instead of tying up worker threads.
+"""
+
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_URL = "https://www.thecocktaildb.com/api/json/v1/1"
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class UpstreamError(Exception):
+    """TheCocktailDB could not be reached or returned a bad response."""
+
+
+class CircuitOpenError(UpstreamError):
+    """The circuit breaker is open; the upstream was not called."""
+
+
+class CircuitBreaker:
+    """Closed -> open after `threshold` consecutive failures.
+
+    While open every call is rejected. After `reset_timeout` seconds one
+    trial call is let through (half-open); success closes the circuit,
+    failure opens it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = self.clock()
+
+    def release(self):
+        """End a call with no verdict (it was cancelled), freeing a half-open trial."""
+        with self._lock:
+            self._trial_running = False
+
+
+@contextmanager
+def observed(observer, endpoint):
+    """Report the wrapped call's duration and outcome to `observer(endpoint, seconds, ok)`."""
+    started = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        if observer is not None:
+            observer(endpoint, time.perf_counter() - started, ok)
+
+
+class CocktailDBClient:
+    """Thin wrapper around the CocktailDB JSON endpoints."""
+
+    def __init__(self, base_url=DEFAULT_URL, pool_size=10, connect_timeout=3.05,
+                 read_timeout=5, retries=2, backoff=0.2, breaker=None, observer=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker or CircuitBreaker()
+        self.observer = observer
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            backoff_jitter=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['GET']),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                              max_retries=retry, pool_block=True)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @classmethod
+    def from_config(cls, config, observer=None):
+        return cls(
+            base_url=config.get('COCKTAILDB_URL', DEFAULT_URL),
+            pool_size=config.get('UPSTREAM_POOL_SIZE', 10),
+            connect_timeout=config.get('UPSTREAM_CONNECT_TIMEOUT', 3.05),
+            read_timeout=config.get('UPSTREAM_READ_TIMEOUT', 5),
+            retries=config.get('UPSTREAM_RETRIES', 2),
+            backoff=config.get('UPSTREAM_BACKOFF', 0.2),
+            breaker=CircuitBreaker(
+                threshold=config.get('UPSTREAM_BREAKER_THRESHOLD', 5),
+                reset_timeout=config.get('UPSTREAM_BREAKER_RESET', 30),
+            ),
+            observer=observer,
+        )
+
+    def get_json(self, endpoint, **params):
+        with observed(self.observer, endpoint):
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"CocktailDB circuit open, skipping {endpoint}")
+            try:
+                res = self.session.get(f"{self.base_url}/{endpoint}", params=params,
+                                       timeout=self.timeout)
+                res.raise_for_status()
+                data = res.json()
+            except (requests.RequestException, ValueError) as exc:
+                self.breaker.record_failure()
+                raise UpstreamError(f"CocktailDB {endpoint} failed: {exc}") from exc
+            except BaseException:
+                # interrupted, not failed: no verdict, but don't keep the trial claimed
+                self.breaker.release()
+                raise
+            self.breaker.record_success()
+            return data
+
+    def search(self, name):
+        """Drinks whose name matches `name`, or None."""
+        return self.get_json('search.php', s=name)['drinks']
+
+    def lookup(self, idDrink):
+        """Full details for one drink id, or None if it doesn't exist."""
+        drinks = self.get_json('lookup.php', i=idDrink)['drinks']
+        return drinks[0] if drinks else None
+
+    def by_letter(self, letter):
+        """Every drink whose name starts with `letter`, or None."""
+        return self.get_json('search.php', f=letter)['drinks']
+
+    def close(self):
+        self.session.close()
+
+
+_async_session = contextvars.ContextVar('cocktaildb_async_session', default=None)
+
+
+class _SessionClient:
+    """The httpx.AsyncClient of one session(), opened by the first call that needs it."""
+
+    def __init__(self, open_client):
+        self.open_client = open_client
+        self.client = None
+
+    def get(self):
+        if self.client is None:
+            self.client = self.open_client()
+        return self.client
+
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aclose()
+
+
+class AsyncCocktailDBClient:
+    """Non-blocking counterpart of CocktailDBClient, built on httpx.
+
+    Calls made inside `async with client.session():` share one pooled,
+    keep-alive httpx.AsyncClient, opened on the first call (a session that
+    makes none costs nothing); calls outside a session open a short-lived
+    one. Shares the circuit breaker with the sync client so
+    both paths agree on whether the upstream is down.
+    """
+
+    def __init__(self, base_url=DEFAULT_URL, pool_size=10, connect_timeout=3.05,
+                 read_timeout=5, retries=2, backoff=0.2, breaker=None, transport=None,
+                 observer=None):
+        self.base_url = base_url.rstrip('/')
+        self.transport = transport
+        self.limits = httpx.Limits(max_connections=pool_size,
+                                   max_keepalive_connections=pool_size)
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.observer = observer
+
+    @classmethod
+    def from_config(cls, config, breaker=None, observer=None):
+        return cls(
+            base_url=config.get('COCKTAILDB_URL', DEFAULT_URL),
+            pool_size=config.get('UPSTREAM_ASYNC_POOL_SIZE', 100),
+            connect_timeout=config.get('UPSTREAM_CONNECT_TIMEOUT', 3.05),
+            read_timeout=config.get('UPSTREAM_READ_TIMEOUT', 5),
+            retries=config.get('UPSTREAM_RETRIES', 2),
+            backoff=config.get('UPSTREAM_BACKOFF', 0.2),
+            breaker=breaker,
+            observer=observer,
+        )
+
+    @asynccontextmanager
+    async def session(self):
+        if _async_session.get() is not None:
+            yield
+            return
+        pooled = _SessionClient(lambda: httpx.AsyncClient(limits=self.limits, timeout=self.timeout,
+                                                          transport=self.transport))
+        token = _async_session.set(pooled)
+        try:
+            yield
+        finally:
+            _async_session.reset(token)
+            await pooled.aclose()
+
+    async def _sleep_before_retry(self, attempt):
+        await asyncio.sleep(self.backoff * (2 ** attempt) + random.uniform(0, self.backoff))
+
+    async def get_json(self, endpoint, **params):
+        async with self.session():
+            with observed(self.observer, endpoint):
+                client = _async_session.get().get()
+                if not self.breaker.allow():
+                    raise CircuitOpenError(f"CocktailDB circuit open, skipping {endpoint}")
+                url = f"{self.base_url}/{endpoint}"
+                try:
+                    for attempt in range(self.retries + 1):
+                        try:
+                            res = await client.get(url, params=params)
+                            if res.status_code in RETRY_STATUSES and attempt < self.retries:
+                                await self._sleep_before_retry(attempt)
+                                continue
+                            res.raise_for_status()
+                            data = res.json()
+                            break
+                        except httpx.TransportError as exc:
+                            if attempt < self.retries:
+                                await self._sleep_before_retry(attempt)
+                                continue
+                            self.breaker.record_failure()
+                            raise UpstreamError(f"CocktailDB {endpoint} failed: {exc}") from exc
+                        except (httpx.HTTPStatusError, ValueError) as exc:
+                            self.breaker.record_failure()
+                            raise UpstreamError(f"CocktailDB {endpoint} failed: {exc}") from exc
+                except UpstreamError:
+                    raise
+                except BaseException:
+                    # cancelled (e.g. at LOOKUP_DEADLINE): no verdict on the upstream,
+                    # but a half-open trial must not stay claimed forever
+                    self.breaker.release()
+                    raise
+                self.breaker.record_success()
+                return data
+
+    async def search(self, name):
+        return (await self.get_json('search.php', s=name))['drinks']
+
+    async def lookup(self, idDrink):
+        drinks = (await self.get_json('lookup.php', i=idDrink))['drinks']
+        return drinks[0] if drinks else None
+
+    async def by_letter(self, letter):
+        return (await self.get_json('search.php', f=letter))['drinks']
@@ -0,0 +1,16 @@
+"""Word lists that generated drink names and ingredient lists are drawn from.
+
+Used by `flask seed` and by the benchmarks' fake upstream.
+"""
+
+STYLES = ["Blue", "Frozen", "Spiced", "Dark", "Golden", "Smoky", "Bitter", "Royal",
+          "Midnight", "Tropical", "Classic", "Salted"]
+BASES = ["Margarita", "Mojito", "Sour", "Fizz", "Mule", "Negroni", "Spritz", "Collins",
+         "Punch", "Julep", "Daiquiri", "Martini", "Sling", "Flip", "Smash"]
+INGREDIENTS = ["Vodka", "Gin", "Light rum", "Dark rum", "Tequila", "Bourbon", "Scotch",
+               "Brandy", "Triple sec", "Sweet vermouth", "Dry vermouth", "Campari",
+               "Lime juice", "Lemon juice", "Orange juice", "Pineapple juice", "Cranberry juice",
+               "Sugar syrup", "Sugar", "Grenadine", "Angostura bitters", "Orange bitters",
+               "Mint", "Soda water", "Tonic water", "Ginger beer", "Cola", "Egg white",
+               "Cream", "Coffee liqueur", "Amaretto", "Maraschino liqueur", "Elderflower cordial",
+               "Honey", "Agave syrup", "Falernum", "Absinthe", "Chartreuse", "Prosecco", "Salt"]
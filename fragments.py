@@ -0,0 +1,49 @@
+"""Rendered-HTML caches for drink cards and anonymous search pages.
+
+Drink cards are cached per (template, drink, content version, extra
+context), so an edited drink simply misses and re-renders. Cached keys are
+also tracked per drink so `invalidate_drink` can drop them eagerly.
+Whole pages are only cached for anonymous visitors and are cleared
+whenever any drink changes.
+"""
+
+import threading
+from collections import defaultdict
+
+from cache import LRUCache, MISSING
+
+
+class FragmentCache:
+
+    def __init__(self, maxsize=5000, ttl=3600):
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._keys_by_drink = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def render(self, template, drink_key, version, context, render):
+        key = (template, drink_key, version, tuple(sorted(context.items())))
+        html = self.cache.get(key)
+        if html is MISSING:
+            html = render()
+            self.cache.set(key, html)
+            self._track(drink_key, key)
+        return html
+
+    def _track(self, drink_key, key):
+        with self._lock:
+            self._keys_by_drink[drink_key].add(key)
+            if len(self._keys_by_drink) > 2 * self.cache.maxsize:
+                live = set(self.cache._data)
+                for drink, keys in list(self._keys_by_drink.items()):
+                    keys &= live
+                    if not keys:
+                        del self._keys_by_drink[drink]
+
+    def invalidate_drink(self, drink_key):
+        with self._lock:
+            keys = self._keys_by_drink.pop(drink_key, set())
+        for key in keys:
+            self.cache.invalidate(key)
+
+    def stats(self):
+        return self.cache.stats()
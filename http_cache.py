@@ -0,0 +1,52 @@
+"""Conditional GET support: strong ETags, Last-Modified and Cache-Control.
+
+`conditional_response` checks If-None-Match / If-Modified-Since before the
+body is built, so a matching request gets a bare 304 without re-rendering.
+"""
+
+import hashlib
+import json
+
+from flask import Response, make_response, request, session
+
+
+def content_etag(*parts):
+    """Strong ETag from a hash of JSON-serializable parts."""
+
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def is_not_modified(etag, last_modified=None):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+    return False
+
+
+def conditional_response(etag, render, last_modified=None, max_age=60, private=False):
+    """Build a response for `render()`, or a 304 if the client already has `etag`.
+
+    `private` responses depend on the logged-in user: they are marked
+    private so shared caches (our CDN) don't store them, and vary on Cookie.
+    Pending flash messages always force a full render, since a 304 would
+    leave them unshown.
+    """
+
+    if is_not_modified(etag, last_modified) and not session.get('_flashes'):
+        response = Response(status=304)
+    else:
+        response = make_response(render())
+
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified.replace(microsecond=0)
+    response.cache_control.max_age = max_age
+    if private:
+        response.cache_control.private = True
+        response.vary.add('Cookie')
+    else:
+        response.cache_control.public = True
+    response.cache_control.no_cache = None
+    return response
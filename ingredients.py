@@ -0,0 +1,187 @@
+"""Normalized ingredients and the "what can I make" inverted index.
+
+`set_drink_ingredients` keeps the drink_ingredients association in step
+with a Drink's ingredient1..10 columns. `MakeableIndex` maps each
+ingredient to the drinks that use it, so answering a pantry query only
+touches the drinks that share at least one ingredient with the pantry.
+"""
+
+import re
+import threading
+from collections import defaultdict
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, CatalogDrink, Drink, DrinkIngredient, Ingredient
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_ingredient(name):
+    if not name:
+        return None
+    name = WHITESPACE_RE.sub(' ', name).strip().lower()
+    return name or None
+
+
+def drink_ingredient_names(drink):
+    """Normalized, de-duplicated ingredient names of a Drink, in column order."""
+
+    names = []
+    for n in range(1, 11):
+        name = normalize_ingredient(getattr(drink, f'ingredient{n}'))
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def catalog_ingredient_names(data):
+    names = []
+    for n in range(1, 16):
+        name = normalize_ingredient(data.get(f'strIngredient{n}'))
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def existing_ingredients(names):
+    return {i.name: i for i in Ingredient.query.filter(Ingredient.name.in_(names))}
+
+
+def get_or_create_ingredients(names):
+    """Map of name -> Ingredient, inserting any names that don't exist yet.
+
+    Each insert runs in a savepoint. If a concurrent request inserted the
+    same name first, only that savepoint fails on the unique constraint and
+    the other request's row is used.
+    """
+
+    if not names:
+        return {}
+    found = existing_ingredients(names)
+    for name in names:
+        if name in found:
+            continue
+        ingredient = Ingredient(name=name)
+        try:
+            with db.session.begin_nested():
+                db.session.add(ingredient)
+        except IntegrityError:
+            ingredient = Ingredient.query.filter_by(name=name).one()
+        found[name] = ingredient
+    return found
+
+
+def link_rows(drinks):
+    """drink_ingredients rows for many drinks, creating missing ingredients. Caller commits."""
+
+    names_by_drink = {drink.id: drink_ingredient_names(drink) for drink in drinks}
+    all_names = sorted({name for names in names_by_drink.values() for name in names})
+    by_name = get_or_create_ingredients(all_names)
+    db.session.flush()
+    return [{'drink_id': drink_id, 'ingredient_id': by_name[name].id, 'position': position}
+            for drink_id, names in names_by_drink.items()
+            for position, name in enumerate(names, start=1)]
+
+
+def set_drink_ingredients(drink):
+    """Rebuild a drink's association rows from its ingredient columns. Caller commits."""
+
+    names = drink_ingredient_names(drink)
+    by_name = get_or_create_ingredients(names)
+    drink.ingredient_links = [DrinkIngredient(ingredient=by_name[name], position=position)
+                              for position, name in enumerate(names, start=1)]
+
+
+class MakeableIndex:
+    """Inverted index of ingredient -> drinks, plus each drink's ingredient count."""
+
+    def __init__(self):
+        self.drinks_by_ingredient = defaultdict(set)
+        self.ingredients_of = {}
+        self.cards = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.cards)
+
+    def add(self, key, card, names):
+        with self._lock:
+            self.remove(key)
+            if not names:
+                return
+            for name in names:
+                self.drinks_by_ingredient[name].add(key)
+            self.ingredients_of[key] = frozenset(names)
+            self.cards[key] = card
+
+    def remove(self, key):
+        with self._lock:
+            for name in self.ingredients_of.pop(key, ()):
+                drinks = self.drinks_by_ingredient[name]
+                drinks.discard(key)
+                if not drinks:
+                    del self.drinks_by_ingredient[name]
+            self.cards.pop(key, None)
+
+    def makeable(self, pantry, max_missing=0, limit=50):
+        """Drinks makeable from `pantry`, missing at most `max_missing` ingredients.
+
+        Results are sorted by fewest missing ingredients, then by how much of
+        the pantry they use.
+        """
+
+        pantry = {normalize_ingredient(name) for name in pantry} - {None}
+        with self._lock:
+            have = defaultdict(int)
+            for name in pantry:
+                for key in self.drinks_by_ingredient.get(name, ()):
+                    have[key] += 1
+
+            matches = []
+            for key, count in have.items():
+                missing = len(self.ingredients_of[key]) - count
+                if missing <= max_missing:
+                    matches.append((missing, -count, key))
+            matches.sort(key=lambda m: (m[0], m[1], str(m[2])))
+
+            return [dict(self.cards[key],
+                         missing=sorted(self.ingredients_of[key] - pantry))
+                    for _, _, key in matches[:limit]]
+
+
+def user_drink_card(drink):
+    return {'id': drink.id, 'name': drink.name, 'url': f"/user/original/{drink.id}"}
+
+
+def catalog_drink_card(data):
+    return {'id': int(data['idDrink']), 'name': data.get('strDrink'),
+            'url': f"/drinks/{data['idDrink']}"}
+
+
+def index_user_drink(index, drink):
+    index.add(('drink', drink.id), user_drink_card(drink), drink_ingredient_names(drink))
+
+
+def index_catalog_drink(index, data):
+    index.add(('catalog', int(data['idDrink'])), catalog_drink_card(data),
+              catalog_ingredient_names(data))
+
+
+def build_index():
+    index = MakeableIndex()
+    rows = db.session.execute(
+        db.select(Drink.id, Drink.name, Ingredient.name)
+        .join(DrinkIngredient, DrinkIngredient.drink_id == Drink.id)
+        .join(Ingredient, Ingredient.id == DrinkIngredient.ingredient_id)
+    )
+    names_of = defaultdict(list)
+    cards = {}
+    for drink_id, drink_name, ingredient_name in rows:
+        names_of[drink_id].append(ingredient_name)
+        cards[drink_id] = {'id': drink_id, 'name': drink_name, 'url': f"/user/original/{drink_id}"}
+    for drink_id, names in names_of.items():
+        index.add(('drink', drink_id), cards[drink_id], names)
+    for data in db.session.execute(db.select(CatalogDrink.data)).scalars():
+        index_catalog_drink(index, data)
+    return index
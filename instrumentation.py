@@ -0,0 +1,321 @@
+"""Per-request timings, query counts, Prometheus metrics and an opt-in profiler.
+
+Every request gets a RequestRecord on `g`. It collects the time spent in
+four phases:
+
+- database: SQLAlchemy cursor events on the app's engine
+- upstream HTTP: the CocktailDB clients' `observer`
+- template rendering: Flask's template signals
+- JSON serialization: the app's JSON provider
+
+When the request ends the record becomes metrics and a Server-Timing
+header; N+1 and slow-query detection live in querywatch.py. `/metrics`
+renders the counters in the Prometheus text format.
+
+Sampling profiles are off by default. PROFILE_SAMPLE_RATE profiles that
+fraction of requests; with PROFILE_ALLOW_HEADER set, a request carrying
+`X-Profile: 1` is always profiled, and the response's X-Profile header
+carries the profile's id. Profiles are written to PROFILE_DIR as
+`<time>-<endpoint>-<id>.folded`, in the collapsed-stack format that
+flamegraph.pl and speedscope read.
+"""
+
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+
+from flask import before_render_template, g, has_app_context, request, template_rendered
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+
+PHASES = ('db', 'upstream', 'template', 'serialize')
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+PROFILE_HEADER = 'X-Profile'
+
+log = logging.getLogger('mixology.requests')
+
+
+class Metrics:
+    """Thread-safe counters and histograms, rendered in Prometheus text format."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._help = {}
+        self._counters = defaultdict(float)
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, kind, text):
+        self._help[name] = (kind, text)
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            self._counters[name, tuple(sorted(labels.items()))] += value
+
+    def observe(self, name, value, **labels):
+        key = name, tuple(sorted(labels.items()))
+        with self._lock:
+            counts, total, n = self._histograms.get(key, ([0] * len(self.buckets), 0.0, 0))
+            counts = [count + (value <= bound) for count, bound in zip(counts, self.buckets)]
+            self._histograms[key] = counts, total + value, n + 1
+
+    def value(self, name, **labels):
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def render(self, gauges=()):
+        """Everything recorded, plus `gauges` ((name, labels, value) triples), as text."""
+
+        samples = defaultdict(list)
+        with self._lock:
+            for (name, labels), value in self._counters.items():
+                samples[name].append((name, labels, value))
+            for (name, labels), (counts, total, count) in self._histograms.items():
+                for bound, in_bucket in zip(self.buckets, counts):
+                    samples[name].append((f'{name}_bucket', labels + (('le', f'{bound:g}'),),
+                                          in_bucket))
+                samples[name].append((f'{name}_bucket', labels + (('le', '+Inf'),), count))
+                samples[name].append((f'{name}_sum', labels, total))
+                samples[name].append((f'{name}_count', labels, count))
+        for name, labels, value in gauges:
+            samples[name].append((name, tuple(sorted(labels.items())), value))
+
+        lines = []
+        for name in sorted(samples):
+            kind, text = self._help.get(name, ('gauge', ''))
+            if text:
+                lines.append(f'# HELP {name} {text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for sample, labels, value in samples[name]:
+                lines.append(f'{sample}{_labels(labels)} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+def stats_gauges(name, stats, **labels):
+    """(name, labels, value) gauges for every number in a (nested) stats dict."""
+
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            yield from stats_gauges(name, value, **dict(labels, group=key))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f'{name}_{key}', labels, value
+
+
+class RequestRecord:
+    """What one request spent its time on."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = Counter()
+        self.queries = 0
+        self.rendering = []
+        self.profiler = None
+        self.profile_requested = False
+
+
+def current_record():
+    return g.get('_instrument') if has_app_context() else None
+
+
+def add_time(phase, seconds):
+    record = current_record()
+    if record is not None:
+        record.phases[phase] += seconds
+
+
+class SamplingProfiler:
+    """Samples every other thread's stack every `interval` seconds.
+
+    Under a threaded server, concurrent requests are sampled too; profile
+    on a single worker, or read the stacks by thread name.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        names = {}
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == self._thread.ident:
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:'
+                                 f'{frame.f_lineno})')
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def folded(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """The default provider, counting dumps() time as 'serialize'."""
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            add_time('serialize', time.perf_counter() - started)
+
+
+class Instrumentation:
+    """Wires the request record into a Flask app and its SQLAlchemy engine."""
+
+    def __init__(self, metrics=None):
+        self.metrics = metrics or Metrics()
+        self.app = None
+        for name, kind, text in (
+            ('mixology_requests_total', 'counter', 'Requests by endpoint, method and status.'),
+            ('mixology_request_seconds', 'histogram', 'Request duration.'),
+            ('mixology_request_phase_seconds_total', 'counter', 'Request time by phase.'),
+            ('mixology_db_queries_total', 'counter', 'SQL statements run by requests.'),
+            ('mixology_upstream_requests_total', 'counter', 'CocktailDB calls by outcome.'),
+            ('mixology_upstream_seconds', 'histogram', 'CocktailDB call duration.'),
+        ):
+            self.metrics.describe(name, kind, text)
+
+    def init_app(self, app, db):
+        self.app = app
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._teardown)
+        app.json = TimedJSONProvider(app)
+        before_render_template.connect(self._render_started, app)
+        template_rendered.connect(self._render_finished, app)
+        with app.app_context():
+            engines = list(db.engines.values())
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._before_cursor)
+            event.listen(engine, 'after_cursor_execute', self._after_cursor)
+            event.listen(engine, 'handle_error', self._cursor_failed)
+
+    # -- request lifecycle --
+
+    def _start(self):
+        record = g._instrument = RequestRecord()
+        config = self.app.config
+        record.profile_requested = bool(config['PROFILE_ALLOW_HEADER']
+                                        and request.headers.get(PROFILE_HEADER) == '1')
+        if record.profile_requested or random.random() < config['PROFILE_SAMPLE_RATE']:
+            record.profiler = SamplingProfiler(config['PROFILE_INTERVAL']).start()
+
+    def _finish(self, response):
+        record = g.pop('_instrument', None)
+        if record is None:
+            return response
+        elapsed = time.perf_counter() - record.started
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics = self.metrics
+        metrics.inc('mixology_requests_total', endpoint=endpoint, method=request.method,
+                    status=response.status_code)
+        metrics.observe('mixology_request_seconds', elapsed, endpoint=endpoint)
+        metrics.inc('mixology_db_queries_total', record.queries, endpoint=endpoint)
+        for phase in PHASES:
+            metrics.inc('mixology_request_phase_seconds_total', record.phases[phase],
+                        endpoint=endpoint, phase=phase)
+
+        timing = [f'{phase};dur={record.phases[phase] * 1000:.1f}' for phase in PHASES]
+        timing[0] = f'db;desc="{record.queries} queries";dur={record.phases["db"] * 1000:.1f}'
+        timing.append(f'total;dur={elapsed * 1000:.1f}')
+        response.headers['Server-Timing'] = ', '.join(timing)
+
+        if record.profiler is not None:
+            profile_id = self._save_profile(record.profiler, endpoint)
+            if record.profile_requested:
+                response.headers[PROFILE_HEADER] = profile_id
+        if self.app.config['INSTRUMENTATION_LOG']:
+            log.info(json.dumps({
+                'method': request.method, 'path': request.path, 'endpoint': endpoint,
+                'status': response.status_code, 'ms': round(elapsed * 1000, 1),
+                'queries': record.queries,
+                **{f'{phase}_ms': round(record.phases[phase] * 1000, 1) for phase in PHASES},
+            }))
+        return response
+
+    def _teardown(self, exc):
+        # after_request didn't run (the view raised); don't leave a profiler going
+        record = g.pop('_instrument', None)
+        if record is not None and record.profiler is not None:
+            record.profiler.stop()
+
+    def _save_profile(self, profiler, endpoint):
+        profiler.stop()
+        directory = self.app.config['PROFILE_DIR']
+        os.makedirs(directory, exist_ok=True)
+        slug = ''.join(c if c.isalnum() else '_' for c in endpoint).strip('_') or 'root'
+        profile_id = uuid.uuid4().hex[:16]
+        path = os.path.join(directory, f'{time.strftime("%Y%m%d-%H%M%S")}-{slug}-{profile_id}.folded')
+        with open(path, 'w') as f:
+            f.write(profiler.folded())
+        return profile_id
+
+    # -- phases --
+
+    def _render_started(self, sender, template, context, **extra):
+        record = current_record()
+        if record is not None:
+            record.rendering.append(time.perf_counter())
+
+    def _render_finished(self, sender, template, context, **extra):
+        record = current_record()
+        if record is not None and record.rendering:
+            started = record.rendering.pop()
+            # templates rendered from inside another (drink cards) count once
+            if not record.rendering:
+                record.phases['template'] += time.perf_counter() - started
+
+    def _before_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('instrument_started', []).append(time.perf_counter())
+
+    def _after_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['instrument_started'].pop()
+        record = current_record()
+        if record is not None:
+            record.phases['db'] += time.perf_counter() - started
+            record.queries += 1
+
+    def _cursor_failed(self, context):
+        started = context.connection.info.get('instrument_started') if context.connection else None
+        if started:
+            started.pop()
+
+    def observe_upstream(self, endpoint, seconds, ok):
+        """Observer for the CocktailDB clients."""
+        add_time('upstream', seconds)
+        self.metrics.inc('mixology_upstream_requests_total', endpoint=endpoint,
+                         outcome='ok' if ok else 'error')
+        self.metrics.observe('mixology_upstream_seconds', seconds, endpoint=endpoint)
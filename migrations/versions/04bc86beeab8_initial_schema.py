@@ -0,0 +1,83 @@
+"""initial schema
+
+Tables that existed before migrations were introduced, as created by
+db.create_all(). Existing databases should be stamped at this revision
+(`flask db stamp 04bc86beeab8`) rather than upgraded through it.
+
+Revision ID: 04bc86beeab8
+Revises: 
+Create Date: 2026-10-18 15:02:11.402184
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '04bc86beeab8'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(length=20), nullable=False),
+    sa.Column('password', sa.String(length=80), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('username')
+    )
+    op.create_table('drinks',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('name', sa.Text(), nullable=False),
+    sa.Column('category', sa.Text(), nullable=True),
+    sa.Column('instructions', sa.Text(), nullable=True),
+    sa.Column('ingredient1', sa.Text(), nullable=True),
+    sa.Column('ingredient2', sa.Text(), nullable=True),
+    sa.Column('ingredient3', sa.Text(), nullable=True),
+    sa.Column('ingredient4', sa.Text(), nullable=True),
+    sa.Column('ingredient5', sa.Text(), nullable=True),
+    sa.Column('ingredient6', sa.Text(), nullable=True),
+    sa.Column('ingredient7', sa.Text(), nullable=True),
+    sa.Column('ingredient8', sa.Text(), nullable=True),
+    sa.Column('ingredient9', sa.Text(), nullable=True),
+    sa.Column('ingredient10', sa.Text(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='cascade'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('add_drinks',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('drink_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('catalog_drinks',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('name', sa.Text(), nullable=False),
+    sa.Column('category', sa.Text(), nullable=True),
+    sa.Column('modified_at', sa.DateTime(), nullable=True),
+    sa.Column('synced_at', sa.DateTime(), nullable=False),
+    sa.Column('data', sa.JSON(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_catalog_drinks_name'), 'catalog_drinks', ['name'], unique=False)
+    op.create_table('api_cache',
+    sa.Column('key', sa.Text(), nullable=False),
+    sa.Column('value', sa.Text(), nullable=False),
+    sa.Column('stored_at', sa.DateTime(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_api_cache_stored_at'), 'api_cache', ['stored_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_api_cache_stored_at'), table_name='api_cache')
+    op.drop_table('api_cache')
+    op.drop_index(op.f('ix_catalog_drinks_name'), table_name='catalog_drinks')
+    op.drop_table('catalog_drinks')
+    op.drop_table('add_drinks')
+    op.drop_table('drinks')
+    op.drop_table('users')
@@ -0,0 +1,29 @@
+"""upstream locks
+
+Revision ID: 3f1d2c9a7b60
+Revises: efa5b100b849
+Create Date: 2026-10-18 17:02:11.204318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1d2c9a7b60'
+down_revision = 'efa5b100b849'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('upstream_locks',
+    sa.Column('key', sa.Text(), nullable=False),
+    sa.Column('token', sa.String(length=32), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade():
+    op.drop_table('upstream_locks')
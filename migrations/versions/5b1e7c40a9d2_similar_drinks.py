@@ -0,0 +1,31 @@
+"""similar drinks
+
+Revision ID: 5b1e7c40a9d2
+Revises: d2b8c5e91f03
+Create Date: 2026-10-18 20:41:13.508214
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1e7c40a9d2'
+down_revision = 'd2b8c5e91f03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # filled by `flask compute-similar`
+    op.create_table('similar_drinks',
+    sa.Column('drink_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('rank', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('similar_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('drink_id', 'rank')
+    )
+
+
+def downgrade():
+    op.drop_table('similar_drinks')
@@ -0,0 +1,54 @@
+"""hourly popularity buckets
+
+Revision ID: 7a3c9d1e5f20
+Revises: 5b1e7c40a9d2
+Create Date: 2026-10-18 23:12:40.194127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a3c9d1e5f20'
+down_revision = '5b1e7c40a9d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('popularity_buckets_hourly',
+    sa.Column('drink_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('hour', sa.DateTime(), nullable=False),
+    sa.Column('adds', sa.Integer(), nullable=False),
+    sa.Column('removes', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('drink_id', 'hour')
+    )
+    # a day's counts go in its first hour
+    if op.get_bind().dialect.name == 'sqlite':
+        hour = "day || ' 00:00:00.000000'"
+    else:
+        hour = "CAST(day AS TIMESTAMP)"
+    op.execute("INSERT INTO popularity_buckets_hourly (drink_id, hour, adds, removes) "
+               f"SELECT drink_id, {hour}, adds, removes FROM popularity_buckets")
+    op.drop_index(op.f('ix_popularity_buckets_day'), table_name='popularity_buckets')
+    op.drop_table('popularity_buckets')
+    op.rename_table('popularity_buckets_hourly', 'popularity_buckets')
+    op.create_index(op.f('ix_popularity_buckets_hour'), 'popularity_buckets', ['hour'], unique=False)
+
+
+def downgrade():
+    op.create_table('popularity_buckets_daily',
+    sa.Column('drink_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('adds', sa.Integer(), nullable=False),
+    sa.Column('removes', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('drink_id', 'day')
+    )
+    op.execute("INSERT INTO popularity_buckets_daily (drink_id, day, adds, removes) "
+               "SELECT drink_id, DATE(hour), SUM(adds), SUM(removes) FROM popularity_buckets "
+               "GROUP BY drink_id, DATE(hour)")
+    op.drop_index(op.f('ix_popularity_buckets_hour'), table_name='popularity_buckets')
+    op.drop_table('popularity_buckets')
+    op.rename_table('popularity_buckets_daily', 'popularity_buckets')
+    op.create_index(op.f('ix_popularity_buckets_day'), 'popularity_buckets', ['day'], unique=False)
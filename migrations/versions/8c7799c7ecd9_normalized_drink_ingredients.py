@@ -0,0 +1,77 @@
+"""normalized drink ingredients
+
+Adds ingredients / drink_ingredients and backfills them from the
+ingredient1..10 columns on drinks.
+
+Revision ID: 8c7799c7ecd9
+Revises: 04bc86beeab8
+Create Date: 2026-10-18 15:09:47.118530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c7799c7ecd9'
+down_revision = '04bc86beeab8'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def normalize(name):
+    if not name:
+        return None
+    return ' '.join(name.split()).lower() or None
+
+
+def upgrade():
+    ingredients = op.create_table('ingredients',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('name', sa.Text(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    drink_ingredients = op.create_table('drink_ingredients',
+    sa.Column('drink_id', sa.Integer(), nullable=False),
+    sa.Column('ingredient_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['drink_id'], ['drinks.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['ingredient_id'], ['ingredients.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('drink_id', 'ingredient_id')
+    )
+    op.create_index(op.f('ix_drink_ingredients_ingredient_id'), 'drink_ingredients', ['ingredient_id'], unique=False)
+
+    # backfill from the fixed ingredient columns
+    conn = op.get_bind()
+    columns = [f'ingredient{n}' for n in range(1, 11)]
+    drinks = sa.table('drinks', sa.column('id'), *[sa.column(c) for c in columns])
+
+    names_by_drink = {}
+    for row in conn.execute(sa.select(drinks)):
+        names = []
+        for column in columns:
+            name = normalize(getattr(row, column))
+            if name and name not in names:
+                names.append(name)
+        if names:
+            names_by_drink[row.id] = names
+
+    all_names = sorted({name for names in names_by_drink.values() for name in names})
+    for start in range(0, len(all_names), BATCH_SIZE):
+        op.bulk_insert(ingredients, [{'name': name} for name in all_names[start:start + BATCH_SIZE]])
+    ids = dict(conn.execute(sa.select(ingredients.c.name, ingredients.c.id)).all())
+
+    links = [{'drink_id': drink_id, 'ingredient_id': ids[name], 'position': position}
+             for drink_id, names in names_by_drink.items()
+             for position, name in enumerate(names, start=1)]
+    for start in range(0, len(links), BATCH_SIZE):
+        op.bulk_insert(drink_ingredients, links[start:start + BATCH_SIZE])
+
+
+def downgrade():
+    op.drop_index(op.f('ix_drink_ingredients_ingredient_id'), table_name='drink_ingredients')
+    op.drop_table('drink_ingredients')
+    op.drop_table('ingredients')
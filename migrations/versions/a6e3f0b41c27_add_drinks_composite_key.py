@@ -0,0 +1,65 @@
+"""add_drinks composite key
+
+Revision ID: a6e3f0b41c27
+Revises: 3f1d2c9a7b60
+Create Date: 2026-10-18 18:10:42.918305
+
+add_drinks was keyed on user_id alone, so every user could hold only one
+favourite. The table is rebuilt keyed on (user_id, drink_id), with a
+created_at column for ordering and an index on drink_id. Rows without a
+drink_id are dropped; existing rows get the migration time as created_at.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6e3f0b41c27'
+down_revision = '3f1d2c9a7b60'
+branch_labels = None
+depends_on = None
+
+
+def _rename_constraints(table, old_prefix):
+    # Postgres names constraints after the table they were created on
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(f"ALTER TABLE {table} RENAME CONSTRAINT {old_prefix}_pkey TO {table}_pkey")
+        op.execute(f"ALTER TABLE {table} RENAME CONSTRAINT {old_prefix}_user_id_fkey "
+                   f"TO {table}_user_id_fkey")
+
+
+def upgrade():
+    op.create_table('add_drinks_new',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('drink_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'drink_id')
+    )
+    op.execute("INSERT INTO add_drinks_new (user_id, drink_id) "
+               "SELECT user_id, drink_id FROM add_drinks WHERE drink_id IS NOT NULL")
+    op.drop_table('add_drinks')
+    op.rename_table('add_drinks_new', 'add_drinks')
+    _rename_constraints('add_drinks', 'add_drinks_new')
+    op.create_index(op.f('ix_add_drinks_drink_id'), 'add_drinks', ['drink_id'], unique=False)
+    op.create_index('ix_add_drinks_user_id_created_at', 'add_drinks', ['user_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    # only one favourite per user fits the old table; keep the oldest
+    op.drop_index('ix_add_drinks_user_id_created_at', table_name='add_drinks')
+    op.drop_index(op.f('ix_add_drinks_drink_id'), table_name='add_drinks')
+    op.create_table('add_drinks_old',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('drink_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.execute("INSERT INTO add_drinks_old (user_id, drink_id) "
+               "SELECT a.user_id, MIN(a.drink_id) FROM add_drinks a "
+               "WHERE a.created_at = (SELECT MIN(b.created_at) FROM add_drinks b "
+               "WHERE b.user_id = a.user_id) GROUP BY a.user_id")
+    op.drop_table('add_drinks')
+    op.rename_table('add_drinks_old', 'add_drinks')
+    _rename_constraints('add_drinks', 'add_drinks_old')
@@ -0,0 +1,56 @@
+"""popularity counters
+
+Revision ID: d2b8c5e91f03
+Revises: a6e3f0b41c27
+Create Date: 2026-10-18 18:52:07.331846
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2b8c5e91f03'
+down_revision = 'a6e3f0b41c27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('drink_popularity',
+    sa.Column('drink_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('favourites', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('drink_id')
+    )
+    op.create_index(op.f('ix_drink_popularity_favourites'), 'drink_popularity', ['favourites'], unique=False)
+    op.create_table('popularity_buckets',
+    sa.Column('drink_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('adds', sa.Integer(), nullable=False),
+    sa.Column('removes', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('drink_id', 'day')
+    )
+    op.create_index(op.f('ix_popularity_buckets_day'), 'popularity_buckets', ['day'], unique=False)
+    op.create_table('trending_drinks',
+    sa.Column('window', sa.String(length=8), nullable=False),
+    sa.Column('rank', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('drink_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Integer(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('window', 'rank')
+    )
+
+    # seed the counters from existing favourites; run `flask rollup-popularity` after
+    op.execute("INSERT INTO drink_popularity (drink_id, favourites) "
+               "SELECT drink_id, COUNT(*) FROM add_drinks GROUP BY drink_id")
+    op.execute("INSERT INTO popularity_buckets (drink_id, day, adds, removes) "
+               "SELECT drink_id, DATE(created_at), COUNT(*), 0 FROM add_drinks "
+               "GROUP BY drink_id, DATE(created_at)")
+
+
+def downgrade():
+    op.drop_table('trending_drinks')
+    op.drop_index(op.f('ix_popularity_buckets_day'), table_name='popularity_buckets')
+    op.drop_table('popularity_buckets')
+    op.drop_index(op.f('ix_drink_popularity_favourites'), table_name='drink_popularity')
+    op.drop_table('drink_popularity')
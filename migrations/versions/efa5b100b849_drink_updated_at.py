@@ -0,0 +1,26 @@
+"""drink updated_at
+
+Revision ID: efa5b100b849
+Revises: 8c7799c7ecd9
+Create Date: 2026-10-18 15:31:26.550862
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'efa5b100b849'
+down_revision = '8c7799c7ecd9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('drinks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('drinks', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
@@ -1,16 +1,64 @@
 # import json
+from datetime import datetime
+from functools import wraps
+from flask import g, has_app_context
 from flask_login import UserMixin
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, String, Select, event
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from flask_bcrypt import Bcrypt
+from config import REPLICA_BIND
+
+
+class RoutingSession(Session):
+    """Sends SELECTs to the replica bind, if there is one, inside read_only views.
+
+    Flushes and writes always go to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and has_app_context() and g.get('_read_only')
+                and (clause is None or isinstance(clause, Select))):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_only(view):
+    """Mark a view as read-only so its queries may be served by the replica.
+
+    Replicas lag the primary; don't use this on pages a user is redirected
+    to right after changing what they show.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # stays set for the rest of the request, so streamed responses read the replica too
+        g._read_only = True
+        return view(*args, **kwargs)
+    return wrapper
 
 
 bcrypt = Bcrypt()
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # concurrent readers alongside one writer, for multi-threaded benchmark runs
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
 
 def connect_db(app):
     db.app = app
     db.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == "sqlite":
+                event.listen(engine, "connect", _sqlite_pragmas)
 
 class Drink(db.Model):
     __tablename__ = "drinks"
@@ -29,9 +77,12 @@ class Drink(db.Model):
     ingredient8 = db.Column(db.Text)
     ingredient9 = db.Column(db.Text)
     ingredient10 = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete="cascade"))
     user = db.relationship('User', backref="drinks")
+    ingredient_links = db.relationship('DrinkIngredient', cascade="all, delete-orphan",
+                                       passive_deletes=True, order_by='DrinkIngredient.position')
 
     def serialize(self):
         return {
@@ -55,10 +106,37 @@ class Drink(db.Model):
     def __repr__(self):
         return f"<drink name={self.name} category={self.category}             instructions = {self.instructions} ingredient1 = {self.ingredient1}ingredient2 = {self.ingredient2} ingredient3 = {self.ingredient3}ingredient4 = {self.ingredient4} ingredient5 = {self.ingredient5}ingredient6 = {self.ingredient6} ingredient7 = {self.ingredient7}ingredient8 = {self.ingredient8} ingredient9 = {self.ingredient9}ingredient10 = {self.ingredient10} ingredient11 = {self.ingredient11}ingredient12 = {self.ingredient12} ingredient13 = {self.ingredient13}ingredient14 = {self.ingredient14}ingredient15 = {self.ingredient15}>"
 
+class Ingredient(db.Model):
+    """One normalized ingredient name, shared by every drink that uses it."""
+
+    __tablename__ = 'ingredients'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    name = db.Column(db.Text, nullable=False, unique=True)
+
+    def __repr__(self):
+        return f"<Ingredient #{self.id}: {self.name}>"
+
+class DrinkIngredient(db.Model):
+    """Drink <-> ingredient association, backfilled from ingredient1..10."""
+
+    __tablename__ = 'drink_ingredients'
+
+    drink_id = db.Column(db.Integer, db.ForeignKey('drinks.id', ondelete="CASCADE"), primary_key=True)
+    ingredient_id = db.Column(db.Integer, db.ForeignKey('ingredients.id', ondelete="CASCADE"),
+                              primary_key=True, index=True)
+    position = db.Column(db.Integer, nullable=False)
+
+    ingredient = db.relationship('Ingredient')
+
 class AddDrink(db.Model):
-  
+    """A user's favourite drink (a TheCocktailDB id)."""
+
     __tablename__ = 'add_drinks'
-    
+    __table_args__ = (
+        db.Index('ix_add_drinks_user_id_created_at', 'user_id', 'created_at'),
+    )
+
     user_id = db.Column(
         db.Integer,
         db.ForeignKey("users.id", ondelete="CASCADE"),
@@ -66,10 +144,89 @@ class AddDrink(db.Model):
     )
 
     drink_id = db.Column(
-        db.Integer
-        
+        db.Integer,
+        primary_key=True,
+        index=True
     )
 
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<AddDrink user #{self.user_id}: drink #{self.drink_id}>"
+
+class DrinkPopularity(db.Model):
+    """Running favourite count per drink, kept in step with add_drinks."""
+
+    __tablename__ = 'drink_popularity'
+
+    drink_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    favourites = db.Column(db.Integer, nullable=False, default=0, index=True)
+
+class PopularityBucket(db.Model):
+    """Favourites added / removed per drink per hour, for trending windows."""
+
+    __tablename__ = 'popularity_buckets'
+
+    drink_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    hour = db.Column(db.DateTime, primary_key=True, index=True)
+    adds = db.Column(db.Integer, nullable=False, default=0)
+    removes = db.Column(db.Integer, nullable=False, default=0)
+
+class TrendingDrink(db.Model):
+    """Precomputed ranking for one window ('day', 'week' or 'all')."""
+
+    __tablename__ = 'trending_drinks'
+
+    window = db.Column(db.String(8), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    drink_id = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Integer, nullable=False)
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+class SimilarDrink(db.Model):
+    """Precomputed nearest neighbours of a catalogue drink by ingredients."""
+
+    __tablename__ = 'similar_drinks'
+
+    drink_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    rank = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    similar_id = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+
+class CatalogDrink(db.Model):
+    """Local mirror of one TheCocktailDB drink, kept fresh by `flask sync-catalog`."""
+
+    __tablename__ = 'catalog_drinks'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.Text, nullable=False, index=True)
+    category = db.Column(db.Text)
+    modified_at = db.Column(db.DateTime)
+    synced_at = db.Column(db.DateTime, nullable=False)
+    data = db.Column(db.JSON, nullable=False)
+
+    def __repr__(self):
+        return f"<CatalogDrink #{self.id}: {self.name}>"
+
+class CachedResponse(db.Model):
+    """Shared cache entry for an upstream CocktailDB response."""
+
+    __tablename__ = 'api_cache'
+
+    key = db.Column(db.Text, primary_key=True)
+    value = db.Column(db.Text, nullable=False)
+    stored_at = db.Column(db.DateTime, nullable=False, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+class UpstreamLock(db.Model):
+    """Cluster-wide lease on one upstream cache key (see cache.DBLock)."""
+
+    __tablename__ = 'upstream_locks'
+
+    key = db.Column(db.Text, primary_key=True)
+    token = db.Column(db.String(32), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
 class User(db.Model, UserMixin):
     __tablename__ = 'users'
 
@@ -77,6 +234,9 @@ class User(db.Model, UserMixin):
     username = Column(String(20), unique=True, nullable=False)
     password = Column(String(80), nullable=False)
 
+    favourites = db.relationship('AddDrink', order_by='AddDrink.created_at.desc()',
+                                 cascade="all, delete-orphan", passive_deletes=True)
+
 
     def __repr__(self):
         return f"<User #{self.id}: {self.username}, {self.email}>"
@@ -0,0 +1,146 @@
+"""Favourite counters and precomputed trending rankings.
+
+Every favourite added or removed bumps two counters in the same
+transaction: the drink's running total (`drink_popularity`) and its count
+for the hour (`popularity_buckets`). Windows roll by the hour: 'day' is
+the current hour and the 23 before it, 'week' the current hour and the
+167 before it. `rollup`, run periodically through the
+`rollup-popularity` CLI command, ranks the buckets into `trending_drinks`,
+which is the only table /api/drinks/trending reads.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, select
+
+from models import db, AddDrink, DrinkPopularity, PopularityBucket, TrendingDrink
+
+# window name -> number of days of hourly buckets it covers (None: all-time total)
+WINDOWS = {'day': 1, 'week': 7, 'all': None}
+
+
+def bucket_hour(when):
+    return when.replace(minute=0, second=0, microsecond=0)
+
+
+def window_start(now, days):
+    """First bucket hour of the `days` x 24 hours ending with now's bucket."""
+
+    return bucket_hour(now) - timedelta(days=days) + timedelta(hours=1)
+
+
+def _upsert(model, keys, **increments):
+    """Add `increments` to the row with primary key `keys`, creating it at zero."""
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        row = db.session.get(model, tuple(keys.values()))
+        if row is None:
+            row = model(**keys, **{name: 0 for name in increments})
+            db.session.add(row)
+        for name, amount in increments.items():
+            setattr(row, name, getattr(row, name) + amount)
+        return
+
+    columns = model.__table__.c
+    stmt = dialect_insert(model).values(**keys, **increments)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={name: columns[name] + amount for name, amount in increments.items()},
+    ))
+
+
+def record_favourite(drink_id, delta, now=None):
+    """Count one favourite added (delta=1) or removed (delta=-1). Caller commits."""
+
+    hour = bucket_hour(now or datetime.utcnow())
+    _upsert(DrinkPopularity, {'drink_id': drink_id}, favourites=delta)
+    _upsert(PopularityBucket, {'drink_id': drink_id, 'hour': hour},
+            **({'adds': 1} if delta > 0 else {'removes': 1}))
+
+
+def record_bucket_adds(adds):
+    """Add favourites written in bulk to their hourly buckets. Caller commits.
+
+    `adds` maps (drink_id, hour) to the number of favourites added; the
+    running totals are recounted separately with reconcile_totals().
+    """
+
+    for (drink_id, hour), count in adds.items():
+        _upsert(PopularityBucket, {'drink_id': drink_id, 'hour': hour}, adds=count)
+
+
+def reconcile_totals():
+    """Recount drink_popularity from add_drinks, fixing any drift."""
+
+    db.session.execute(delete(DrinkPopularity))
+    db.session.execute(insert(DrinkPopularity).from_select(
+        ['drink_id', 'favourites'],
+        select(AddDrink.drink_id, func.count()).group_by(AddDrink.drink_id),
+    ))
+
+
+def _window_rows(days, now, size):
+    if days is None:
+        return db.session.execute(
+            select(DrinkPopularity.drink_id, DrinkPopularity.favourites)
+            .where(DrinkPopularity.favourites > 0)
+            .order_by(DrinkPopularity.favourites.desc(), DrinkPopularity.drink_id)
+            .limit(size)
+        ).all()
+    score = func.sum(PopularityBucket.adds - PopularityBucket.removes)
+    return db.session.execute(
+        select(PopularityBucket.drink_id, score)
+        .where(PopularityBucket.hour >= window_start(now, days))
+        .group_by(PopularityBucket.drink_id)
+        .having(score > 0)
+        .order_by(score.desc(), PopularityBucket.drink_id)
+        .limit(size)
+    ).all()
+
+
+def rollup(now=None, size=100, retention_days=35, reconcile=False):
+    """Rebuild every trending window and prune old buckets. Returns rows per window."""
+
+    now = now or datetime.utcnow()
+    if reconcile:
+        reconcile_totals()
+    counts = {}
+    for window, days in WINDOWS.items():
+        rows = _window_rows(days, now, size)
+        db.session.execute(delete(TrendingDrink).where(TrendingDrink.window == window))
+        if rows:
+            db.session.execute(insert(TrendingDrink), [
+                {'window': window, 'rank': rank, 'drink_id': drink_id, 'score': score,
+                 'computed_at': now}
+                for rank, (drink_id, score) in enumerate(rows, start=1)
+            ])
+        counts[window] = len(rows)
+    db.session.execute(delete(PopularityBucket).where(
+        PopularityBucket.hour < window_start(now, retention_days)))
+    db.session.commit()
+    return counts
+
+
+def trending(window, limit):
+    """Top `limit` precomputed rows for `window`, best first."""
+
+    return db.session.execute(
+        select(TrendingDrink)
+        .where(TrendingDrink.window == window)
+        .order_by(TrendingDrink.rank)
+        .limit(limit)
+    ).scalars().all()
+
+
+def favourite_counts(drink_ids=None):
+    """Map of drink id -> current favourite count."""
+
+    query = select(DrinkPopularity.drink_id, DrinkPopularity.favourites)
+    if drink_ids is not None:
+        query = query.where(DrinkPopularity.drink_id.in_(drink_ids))
+    return dict(db.session.execute(query).all())
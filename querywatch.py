@@ -0,0 +1,227 @@
+"""Slow-query and N+1 detection, per-route query statistics and budgets.
+
+QueryWatch listens to `before_cursor_execute` / `after_cursor_execute` on
+an engine and files every statement under the current request. A
+statement's fingerprint is its SQL with literals and bound parameters
+replaced by `?` and IN lists collapsed, so `WHERE id = 1` and
+`WHERE id = 2` are the same query. At the end of a request:
+
+- a fingerprint run N_PLUS_ONE_THRESHOLD times or more is flagged as an
+  N+1 (one query per row of an earlier result);
+- the request's count and time are added to its route's aggregates;
+- a route over its query budget is counted as a violation.
+
+Any statement slower than SLOW_QUERY_MS is logged, inside a request or not.
+
+`report()` is what /api/stats/queries serves. Tests call
+`check_budgets()`, which raises QueryBudgetExceeded if a route went over
+its budget or ran an N+1.
+"""
+
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import Counter
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+
+log = logging.getLogger('mixology.queries')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PARAM = re.compile(r"%\(\w+\)s|%s|(?<!:):\w+|\$\d+|\?|__\[POSTCOMPILE_\w+\]")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement):
+    """(id, normalized SQL) for a statement; equal for the same query shape."""
+
+    sql = _STRING.sub('?', statement)
+    sql = _PARAM.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _LIST.sub('(...)', sql)
+    sql = _SPACE.sub(' ', sql).strip()
+    return hashlib.sha1(sql.encode()).hexdigest()[:12], sql
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class RequestQueries:
+    """Statements run by one request, by fingerprint."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.seconds = 0.0
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+
+class RouteStats:
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.requests = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.seconds = 0.0
+        self.over_budget = 0
+        self.n_plus_one = Counter()
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'queries': self.queries,
+            'mean_queries': round(self.queries / self.requests, 2) if self.requests else 0,
+            'max_queries': self.max_queries,
+            'db_ms': round(self.seconds * 1000, 1),
+            'budget': self.budget,
+            'over_budget': self.over_budget,
+            'n_plus_one': dict(self.n_plus_one),
+        }
+
+
+class QueryWatch:
+    """Per-route query aggregates for a Flask app, from SQLAlchemy cursor events.
+
+    `budgets` maps a route rule (e.g. "/users/<int:user_id>/fav/") to the
+    most statements one request to it may run. `metrics`, if given, is an
+    instrumentation.Metrics that N+1s and slow queries are counted in.
+    """
+
+    def __init__(self, budgets=None, n_plus_one_threshold=5, slow_query_ms=100, metrics=None):
+        self.budgets = dict(budgets or {})
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.slow_query_ms = slow_query_ms
+        self.metrics = metrics
+        self.statements = {}
+        self.slow_queries = Counter()
+        self._routes = {}
+        self._lock = threading.Lock()
+        if metrics is not None:
+            metrics.describe('mixology_n_plus_one_total', 'counter',
+                             'Requests that repeated one query N_PLUS_ONE_THRESHOLD times or more.')
+            metrics.describe('mixology_slow_queries_total', 'counter',
+                             'Statements slower than SLOW_QUERY_MS.')
+
+    def init_app(self, app, db):
+        self.n_plus_one_threshold = app.config.get('N_PLUS_ONE_THRESHOLD', self.n_plus_one_threshold)
+        self.slow_query_ms = app.config.get('SLOW_QUERY_MS', self.slow_query_ms)
+        self.budgets.update(app.config.get('QUERY_BUDGETS', {}))
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        with app.app_context():
+            for engine in db.engines.values():
+                self.watch(engine)
+
+    def watch(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._before_cursor)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor)
+        event.listen(engine, 'handle_error', self._cursor_failed)
+
+    def budget(self, rule, limit):
+        """Allow at most `limit` statements per request to route `rule`."""
+        with self._lock:
+            self.budgets[rule] = limit
+            if rule in self._routes:
+                self._routes[rule].budget = limit
+
+    # -- events --
+
+    def _start(self):
+        g._query_watch = RequestQueries()
+
+    def _before_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_watch_started', []).append(time.perf_counter())
+
+    def _after_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_watch_started'].pop()
+        key, sql = fingerprint(statement)
+        if key not in self.statements:
+            self.statements[key] = sql
+        current = g.get('_query_watch') if has_app_context() else None
+        if current is not None:
+            current.counts[key] += 1
+            current.seconds += elapsed
+        if elapsed * 1000 >= self.slow_query_ms:
+            self.slow_queries[key] += 1
+            if self.metrics is not None:
+                self.metrics.inc('mixology_slow_queries_total', fingerprint=key)
+            log.warning('Slow query (%.0f ms) [%s]: %s', elapsed * 1000, key, sql[:300])
+
+    def _cursor_failed(self, context):
+        started = context.connection.info.get('query_watch_started') if context.connection else None
+        if started:
+            started.pop()
+
+    def _finish(self, response):
+        current = g.pop('_query_watch', None)
+        if current is None:
+            return response
+        rule = request.url_rule.rule if request.url_rule else 'unmatched'
+        repeated = [(key, n) for key, n in current.counts.items() if n >= self.n_plus_one_threshold]
+        with self._lock:
+            stats = self._routes.get(rule)
+            if stats is None:
+                stats = self._routes[rule] = RouteStats(self.budgets.get(rule))
+            stats.requests += 1
+            stats.queries += current.total
+            stats.max_queries = max(stats.max_queries, current.total)
+            stats.seconds += current.seconds
+            if stats.budget is not None and current.total > stats.budget:
+                stats.over_budget += 1
+                log.warning('%s %s ran %d queries, over its budget of %d', request.method,
+                            request.path, current.total, stats.budget)
+            for key, n in repeated:
+                stats.n_plus_one[key] += 1
+        for key, n in repeated:
+            if self.metrics is not None:
+                self.metrics.inc('mixology_n_plus_one_total', endpoint=rule)
+            log.warning('Possible N+1 on %s %s: %d runs of [%s] %s', request.method, request.path,
+                        n, key, self.statements[key][:200])
+        return response
+
+    # -- reporting --
+
+    def report(self):
+        """Per-route aggregates, plus the SQL of every fingerprint they mention."""
+
+        with self._lock:
+            routes = {rule: stats.as_dict() for rule, stats in sorted(self._routes.items())}
+            slow = dict(self.slow_queries)
+        mentioned = set(slow) | {key for stats in routes.values() for key in stats['n_plus_one']}
+        return {
+            'routes': routes,
+            'slow_queries': slow,
+            'statements': {key: self.statements[key] for key in sorted(mentioned)},
+        }
+
+    def violations(self):
+        """Lines describing every route over budget or with an N+1."""
+
+        report = self.report()
+        found = []
+        for rule, stats in report['routes'].items():
+            if stats['over_budget']:
+                found.append(f"{rule}: {stats['over_budget']} of {stats['requests']} requests over "
+                             f"the budget of {stats['budget']} queries (max {stats['max_queries']})")
+            for key, requests in stats['n_plus_one'].items():
+                found.append(f"{rule}: N+1 in {requests} requests: {report['statements'][key]}")
+        return found
+
+    def check_budgets(self):
+        found = self.violations()
+        if found:
+            raise QueryBudgetExceeded('\n'.join(found))
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+            self.slow_queries.clear()
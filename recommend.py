@@ -0,0 +1,234 @@
+"""'You might also like' recommendations from ingredient overlap.
+
+Every mirrored drink is a row of a sparse drink x ingredient matrix,
+weighted by inverse document frequency (so sharing gin says less than
+sharing falernum) and L2-normalised, which makes X @ X.T the cosine
+similarity of every pair. `compute_similar` multiplies it out a block of
+rows at a time (see `top_k_similar` for how very common ingredients are
+kept from making that quadratic), keeps each drink's top k, and stores
+them in `similar_drinks`. Request-time lookups only read those rows.
+
+Per-user recommendations add up the stored neighbours of the user's
+favourites, so they cost one query over (favourites x k) rows.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import delete, insert, select
+
+from ingredients import catalog_ingredient_names
+from models import db, AddDrink, CatalogDrink, SimilarDrink
+
+BLOCK_ROWS = 512
+DENSE_BLOCK_ROWS = 256
+PAD_ROWS = 32
+MAX_CANDIDATE_DF = 2000
+INSERT_BATCH = 10000
+
+
+def ingredient_matrix(drinks):
+    """(ids, B, idf) for a list of (drink_id, ingredient names).
+
+    B is the binary drink x ingredient CSR matrix, idf the weight of each
+    ingredient column.
+    """
+
+    vocab = {}
+    rows, cols = [], []
+    for row, (_, names) in enumerate(drinks):
+        for name in names:
+            rows.append(row)
+            cols.append(vocab.setdefault(name, len(vocab)))
+    ids = np.array([drink_id for drink_id, _ in drinks], dtype=np.int64)
+    B = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)),
+                          shape=(len(drinks), len(vocab)))
+    B.sum_duplicates()
+    B.data[:] = 1
+    df = np.diff(B.tocsc().indptr)
+    idf = np.log((1 + len(drinks)) / (1 + df)).astype(np.float32) + 1
+    return ids, B, idf
+
+
+class CommonBits:
+    """The most common ingredient columns as one uint64 bitset per drink.
+
+    The shared-ingredient score of two drinks is then an AND of their
+    bitsets and four 16-bit table lookups, instead of a gather per column.
+    """
+
+    def __init__(self, B, idf, cols, inv_norm):
+        self.inv_norm = inv_norm
+        present = B[:, cols].toarray() > 0
+        bits = np.uint64(1) << np.arange(len(cols), dtype=np.uint64)
+        self.masks = (present * bits).sum(axis=1, dtype=np.uint64)
+        weights = np.zeros(64, dtype=np.float32)
+        weights[:len(cols)] = idf[cols] ** 2
+        halfwords = (np.arange(1 << 16)[:, None] >> np.arange(16)) & 1
+        self.tables = [(halfwords @ weights[16 * q:16 * q + 16]).astype(np.float32)
+                       for q in range(-(-len(cols) // 16))]
+        self.dense = (present * idf[cols]) * inv_norm[:, None]
+
+    def scores(self, rows, cols):
+        shared = self.masks[rows] & self.masks[cols]
+        total = np.zeros(len(rows), dtype=np.float32)
+        for q, table in enumerate(self.tables):
+            total += table[(shared >> np.uint64(16 * q)) & np.uint64(0xFFFF)]
+        return total * self.inv_norm[rows] * self.inv_norm[cols]
+
+
+def _top_k(rows, cols, scores, k, exclude=None):
+    """Yield (row, cols, scores) for each row's k best positive-scoring columns.
+
+    `cols` and `scores` are 2D, one padded row of candidates per entry in
+    `rows`; the column in `exclude` (by default the row itself) and
+    non-positive scores are not neighbours.
+    """
+
+    exclude = rows if exclude is None else exclude
+    scores = np.where(cols == exclude[:, None], 0, scores)
+    if scores.shape[1] > k:
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        cols = np.take_along_axis(cols, best, axis=1)
+        scores = np.take_along_axis(scores, best, axis=1)
+    order = np.lexsort((cols, -scores), axis=1)
+    cols = np.take_along_axis(cols, order, axis=1)
+    scores = np.take_along_axis(scores, order, axis=1)
+    for row, row_cols, row_scores in zip(rows, cols, scores):
+        keep = row_scores > 0
+        if keep.any():
+            yield row, row_cols[keep], row_scores[keep]
+
+
+def top_k_similar(B, idf, k=10, max_df=MAX_CANDIDATE_DF, block_rows=BLOCK_ROWS):
+    """Yield (row, neighbour rows, scores): each row's k most similar other rows by cosine.
+
+    Multiplying out ingredients that appear in more than `max_df` drinks
+    would pair almost every drink with every other, so candidates only
+    come from the rarer ingredients. The (up to 64) common ones are added
+    to each candidate's score exactly, via CommonBits. Drinks made only of
+    common ingredients are scored against every drink, densely. The one
+    approximation: a drink that has a rare ingredient is only compared
+    with drinks that share one of its rare ingredients.
+    """
+
+    weighted = (B @ sparse.diags(idf)).tocsr()
+    norms = np.sqrt(weighted.multiply(weighted).sum(axis=1)).A1
+    inv_norm = np.divide(1, norms, out=np.zeros_like(norms), where=norms > 0).astype(np.float32)
+
+    df = np.diff(B.tocsc().indptr)
+    by_df = np.argsort(-df, kind='stable')[:64]
+    common_cols = by_df[df[by_df] > max_df]
+    rare_cols = np.setdiff1d(np.arange(B.shape[1]), common_cols)
+    common = CommonBits(B, idf, common_cols, inv_norm)
+    rare = (sparse.diags(inv_norm) @ weighted[:, rare_cols]).tocsr()
+    rare_t = rare.T.tocsc()
+    has_rare = np.diff(rare.indptr) > 0
+
+    for start in range(0, B.shape[0], block_rows):
+        block = (rare[start:start + block_rows] @ rare_t).tocsr()
+        counts = np.diff(block.indptr)
+        if len(common_cols):
+            owners = np.repeat(np.arange(start, start + block.shape[0]), counts)
+            block.data += common.scores(owners, block.indices)
+        # take the top k of PAD_ROWS rows at a time, padding each row's
+        # candidates to the longest in its group; grouping rows of similar
+        # length keeps the padding small
+        local = np.flatnonzero(has_rare[start:start + block.shape[0]])
+        local = local[np.argsort(counts[local], kind='stable')]
+        for group in np.array_split(local, -(-len(local) // PAD_ROWS) or 1):
+            if not len(group):
+                continue
+            group_counts = counts[group]
+            width = max(int(group_counts.max()), 1)
+            slots = np.arange(width) < group_counts[:, None]
+            take = (block.indptr[group][:, None] + np.arange(width))[slots]
+            cols = np.full((len(group), width), -1, dtype=block.indices.dtype)
+            scores = np.zeros((len(group), width), dtype=np.float32)
+            cols[slots] = block.indices[take]
+            scores[slots] = block.data[take]
+            yield from _top_k(group + start, cols, scores, k)
+
+    # A drink made only of common ingredients scores the same against every
+    # drink with the same bitset and norm, so each distinct bitset is scored
+    # once, against the k + 1 highest-norm drinks of every distinct bitset.
+    only_common = np.flatnonzero(~has_rare & (common.masks > 0))
+    _, first, query_of = np.unique(common.masks[only_common], return_index=True,
+                                   return_inverse=True)
+    targets = _best_per_mask(common.masks, inv_norm, k + 1)
+    best = {}
+    for start in range(0, len(first), DENSE_BLOCK_ROWS):
+        queries = np.arange(start, min(start + DENSE_BLOCK_ROWS, len(first)))
+        scores = common.dense[only_common[first[queries]]] @ common.dense[targets].T
+        no_self = np.full(len(queries), -1)
+        cols = np.broadcast_to(targets, scores.shape)
+        best.update((query, (cols, scores)) for query, cols, scores
+                    in _top_k(queries, cols, scores, k + 1, exclude=no_self))
+    for row, query in zip(only_common, query_of.ravel()):
+        if query in best:
+            cols, scores = best[query]
+            not_self = cols != row
+            yield row, cols[not_self][:k], scores[not_self][:k]
+
+
+def _best_per_mask(masks, inv_norm, keep):
+    """Rows with a non-empty mask, at most `keep` per distinct mask, highest inv_norm first."""
+
+    order = np.lexsort((-inv_norm, masks))
+    sorted_masks = masks[order]
+    group_start = np.flatnonzero(np.r_[True, sorted_masks[1:] != sorted_masks[:-1]])
+    rank = np.arange(len(order)) - np.repeat(group_start, np.diff(np.r_[group_start, len(order)]))
+    return order[(rank < keep) & (sorted_masks > 0)]
+
+
+def compute_similar(k=10):
+    """Rebuild `similar_drinks` for the whole mirror. Returns the number of drinks covered."""
+
+    drinks = [(drink_id, catalog_ingredient_names(data)) for drink_id, data in
+              db.session.execute(select(CatalogDrink.id, CatalogDrink.data))]
+    db.session.execute(delete(SimilarDrink))
+    if not drinks:
+        db.session.commit()
+        return 0
+
+    ids, B, idf = ingredient_matrix(drinks)
+    batch, covered = [], 0
+    for row, neighbours, scores in top_k_similar(B, idf, k):
+        covered += 1
+        batch.extend({'drink_id': int(ids[row]), 'rank': rank, 'similar_id': int(ids[col]),
+                      'score': float(score)}
+                     for rank, (col, score) in enumerate(zip(neighbours, scores), start=1))
+        if len(batch) >= INSERT_BATCH:
+            db.session.execute(insert(SimilarDrink), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(SimilarDrink), batch)
+    db.session.commit()
+    return covered
+
+
+def similar_ids(drink_id, limit=10):
+    """Ids of the drinks most like `drink_id`, best first."""
+
+    return db.session.execute(
+        select(SimilarDrink.similar_id)
+        .where(SimilarDrink.drink_id == drink_id)
+        .order_by(SimilarDrink.rank)
+        .limit(limit)
+    ).scalars().all()
+
+
+def recommended_ids(user_id, limit=10):
+    """Drinks most like the user's favourites, excluding the favourites themselves."""
+
+    favourites = select(AddDrink.drink_id).where(AddDrink.user_id == user_id)
+    rows = db.session.execute(
+        select(SimilarDrink.similar_id, SimilarDrink.score)
+        .where(SimilarDrink.drink_id.in_(favourites))
+        .where(SimilarDrink.similar_id.not_in(favourites))
+    )
+    totals = defaultdict(float)
+    for similar_id, score in rows:
+        totals[similar_id] += score
+    return sorted(totals, key=lambda drink_id: (-totals[drink_id], drink_id))[:limit]
@@ -0,0 +1,223 @@
+"""Background refresh of stale upstream cache entries.
+
+Entries past their soft TTL are still served, and their key is queued
+here. A single daemon worker reloads queued keys most popular first, so
+drinks that many users have favourited and terms people keep searching for
+are refreshed before the long tail. The queue is bounded; when it is full
+new keys are dropped and simply refreshed on a later stale hit.
+
+`Rebuilder` does the same for whole in-memory indexes: a stale index is
+served while its replacement is built on a background thread.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import Counter
+
+from flask import current_app
+
+
+class DecayingCounter:
+    """Counter whose counts halve every `half_life` seconds ("recent" popularity)."""
+
+    def __init__(self, half_life=600, clock=time.monotonic):
+        self.half_life = half_life
+        self.clock = clock
+        self._counts = Counter()
+        self._decayed_at = clock()
+        self._lock = threading.Lock()
+
+    def _decay(self):
+        halvings = int((self.clock() - self._decayed_at) // self.half_life)
+        if halvings:
+            self._decayed_at += halvings * self.half_life
+            self._counts = Counter({k: v >> halvings for k, v in self._counts.items()
+                                    if v >> halvings})
+
+    def incr(self, key):
+        with self._lock:
+            self._decay()
+            self._counts[key] += 1
+
+    def __getitem__(self, key):
+        with self._lock:
+            self._decay()
+            return self._counts[key]
+
+    def items(self):
+        with self._lock:
+            self._decay()
+            return list(self._counts.items())
+
+
+class Refresher:
+    """Priority queue of stale keys, drained by one background thread.
+
+    Scheduling a key only records it, so a request never pays for ranking
+    it. The worker ranks the keys scheduled since it last looked with one
+    `priorities(keys)` call (a dict of key -> priority, higher runs first,
+    missing keys 0) inside `app.app_context()`. Each job runs in the app
+    context too and goes through `flight`, so it never duplicates a
+    foreground load of the same key.
+    """
+
+    def __init__(self, app, cache, flight, priorities, maxsize=1000):
+        self.app = app
+        self.cache = cache
+        self.flight = flight
+        self.priorities = priorities
+        self.maxsize = maxsize
+        self.refreshed = 0
+        self.failed = 0
+        self.dropped = 0
+        self._heap = []
+        self._pending = {}
+        self._arrived = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def schedule(self, key, loader):
+        """Queue `loader()` to refresh `key`; returns False if it was dropped."""
+
+        with self._cond:
+            if key in self._pending:
+                self._pending[key] = loader
+                return True
+            if len(self._pending) >= self.maxsize:
+                self.dropped += 1
+                return False
+            self._pending[key] = loader
+            self._arrived.append(key)
+            self._ensure_worker()
+            self._cond.notify()
+        return True
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="cache-refresh", daemon=True)
+            self._thread.start()
+
+    def _rank(self):
+        """Move newly scheduled keys into the heap, by priority."""
+
+        with self._cond:
+            keys, self._arrived = self._arrived, []
+        if not keys:
+            return
+        try:
+            with self.app.app_context():
+                ranks = self.priorities(keys)
+        except Exception:
+            logging.warning("Ranking %d stale keys failed", len(keys), exc_info=True)
+            ranks = {}
+        with self._cond:
+            for key in keys:
+                heapq.heappush(self._heap, (-ranks.get(key, 0), next(self._seq), key))
+
+    def _pop(self, block):
+        while True:
+            self._rank()
+            with self._cond:
+                if self._heap:
+                    _, _, key = heapq.heappop(self._heap)
+                    return key, self._pending.pop(key)
+                if not self._arrived:
+                    if not block:
+                        return None, None
+                    self._cond.wait()
+
+    def _run(self):
+        while True:
+            self.run_one(*self._pop(block=True))
+
+    def drain(self):
+        """Run every queued refresh now, in the calling thread."""
+
+        key, loader = self._pop(block=False)
+        while key is not None:
+            self.run_one(key, loader)
+            key, loader = self._pop(block=False)
+
+    def run_one(self, key, loader):
+        with self.app.app_context():
+            try:
+                self.flight.do(key, lambda: self.flight.fill(self.cache, key, loader))
+                self.refreshed += 1
+            except Exception:
+                self.failed += 1
+                logging.warning("Background refresh of %s failed", key, exc_info=True)
+
+    def stats(self):
+        with self._cond:
+            return {'queued': len(self._pending), 'refreshed': self.refreshed,
+                    'failed': self.failed, 'dropped': self.dropped}
+
+
+class Rebuilder:
+    """Holds a value made by `build()`, rebuilding it in the background when stale.
+
+    Only the first `get()` builds in the calling thread, since there is
+    nothing to serve yet. After that a value older than `max_age` seconds
+    is still returned, and one daemon thread builds its replacement inside
+    the current app's context and swaps it in with a single assignment;
+    readers never wait for it or see a half-built value. A failed rebuild
+    is logged and tried again `max_age` seconds later.
+
+    The new value reflects the database as of the start of its build, so
+    in-place updates made to the old one while the build runs can be
+    missing until the following rebuild.
+    """
+
+    def __init__(self, name, clock=time.monotonic):
+        self.name = name
+        self.clock = clock
+        self.value = None
+        self.built_at = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def get(self, build, max_age):
+        value = self.value
+        if value is None:
+            with self._lock:
+                if self.value is None:
+                    self.value, self.built_at = build(), self.clock()
+                return self.value
+        if self.clock() - self.built_at > max_age:
+            self._start(build)
+        return value
+
+    def _start(self, build):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            app = current_app._get_current_object()
+            self._thread = threading.Thread(target=self._rebuild, args=(app, build),
+                                            name=self.name, daemon=True)
+            self._thread.start()
+
+    def _rebuild(self, app, build):
+        started = self.clock()
+        try:
+            with app.app_context():
+                value = build()
+        except Exception:
+            logging.warning("Rebuilding %s failed", self.name, exc_info=True)
+            self.built_at = started
+            return
+        self.value, self.built_at = value, started
+
+    def join(self, timeout=None):
+        """Wait for a running rebuild to finish."""
+
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def reset(self):
+        with self._lock:
+            self.value = None
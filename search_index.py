@@ -0,0 +1,234 @@
+"""In-memory full-text + fuzzy search over mirrored and user-created drinks.
+
+Documents are tokenised into an inverted index (token -> {doc: weight}).
+Typo tolerance comes from a second, much smaller index over the
+vocabulary itself (trigram -> tokens): a query word is expanded to every
+known word with enough trigram overlap, or that it is a prefix of, and
+those words' postings are scored by similarity, field weight and idf.
+
+Scoring runs over numpy arrays: each document gets a slot, each token's
+postings are kept as (slots, weights) arrays, and a query accumulates
+into one dense score vector. That keeps broad words, whose postings cover
+most of the catalogue, to a few milliseconds.
+"""
+
+import math
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+import numpy as np
+
+from models import db, CatalogDrink, Drink
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+FIELD_WEIGHTS = {
+    'name': 4.0,
+    'ingredients': 2.0,
+    'category': 1.5,
+    'instructions': 0.5,
+}
+
+STOP_WORDS = frozenset("""
+    a an and are as at be by for from in into is it of on or the then to with
+""".split())
+
+MIN_SIMILARITY = 0.4
+PREFIX_SIMILARITY = 0.8
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOP_WORDS]
+
+
+def trigrams(token):
+    padded = f"^{token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Ranked, typo-tolerant search over drink documents.
+
+    A document is identified by a hashable key and carries the dict that
+    gets rendered for it in results (`card`).
+    """
+
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        self.grams = defaultdict(set)
+        self.doc_tokens = {}
+        self.cards = {}
+        self._slots = {}
+        self._keys = []
+        self._arrays = {}
+        self._sorted_vocab = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.cards)
+
+    def add(self, key, card, name, category=None, instructions=None, ingredients=()):
+        fields = {
+            'name': name,
+            'category': category,
+            'instructions': instructions,
+            'ingredients': ' '.join(i for i in ingredients if i),
+        }
+        weights = defaultdict(float)
+        for field, text in fields.items():
+            for token in tokenize(text):
+                weights[token] += FIELD_WEIGHTS[field]
+
+        with self._lock:
+            self.remove(key)
+            if key not in self._slots:
+                self._slots[key] = len(self._keys)
+                self._keys.append(key)
+            for token, weight in weights.items():
+                if token not in self.postings:
+                    for gram in trigrams(token):
+                        self.grams[gram].add(token)
+                    self._sorted_vocab = None
+                self.postings[token][key] = weight
+                self._arrays.pop(token, None)
+            self.doc_tokens[key] = list(weights)
+            self.cards[key] = card
+
+    def remove(self, key):
+        with self._lock:
+            for token in self.doc_tokens.pop(key, ()):
+                docs = self.postings[token]
+                docs.pop(key, None)
+                self._arrays.pop(token, None)
+                if not docs:
+                    del self.postings[token]
+                    for gram in trigrams(token):
+                        self.grams[gram].discard(token)
+                    self._sorted_vocab = None
+            self.cards.pop(key, None)
+
+    def _vocab(self):
+        if self._sorted_vocab is None:
+            self._sorted_vocab = sorted(self.postings)
+        return self._sorted_vocab
+
+    def _posting_arrays(self, token):
+        arrays = self._arrays.get(token)
+        if arrays is None:
+            docs = self.postings[token]
+            slots = np.fromiter((self._slots[key] for key in docs), dtype=np.int64, count=len(docs))
+            weights = np.fromiter(docs.values(), dtype=np.float64, count=len(docs))
+            arrays = self._arrays[token] = slots, weights
+        return arrays
+
+    def compile(self):
+        """Prepare the vocabulary and every posting array ahead of the first search."""
+
+        with self._lock:
+            self._vocab()
+            for token in self.postings:
+                self._posting_arrays(token)
+
+    def expand(self, word):
+        """Known tokens matching `word`, mapped to a 0..1 similarity."""
+
+        matches = {}
+        if word in self.postings:
+            matches[word] = 1.0
+
+        vocab = self._vocab()
+        i = bisect_left(vocab, word)
+        while i < len(vocab) and vocab[i].startswith(word):
+            matches.setdefault(vocab[i], PREFIX_SIMILARITY)
+            i += 1
+
+        if word.isdigit():
+            # numbers ("No. 4242") match exactly or as a prefix; fuzzy matching
+            # them only drags in thousands of unrelated numbers
+            return matches
+
+        word_grams = trigrams(word)
+        overlap = defaultdict(int)
+        for gram in word_grams:
+            for token in self.grams.get(gram, ()):
+                overlap[token] += 1
+        for token, shared in overlap.items():
+            similarity = shared / (len(word_grams) + len(trigrams(token)) - shared)
+            if similarity >= MIN_SIMILARITY and similarity > matches.get(token, 0):
+                matches[token] = similarity
+        return matches
+
+    def search(self, query, page=1, per_page=20):
+        """Return (total, cards) for one page of results, best match first."""
+
+        words = tokenize(query)
+        if not words:
+            return 0, []
+
+        with self._lock:
+            n_docs = len(self.cards) or 1
+            scores = np.zeros(len(self._keys))
+            for word in words:
+                # a word scores each document by its best-matching expansion
+                best = np.zeros(len(self._keys))
+                for token, similarity in self.expand(word).items():
+                    slots, weights = self._posting_arrays(token)
+                    factor = similarity * math.log(1 + n_docs / len(slots))
+                    best[slots] = np.maximum(best[slots], weights * factor)
+                scores += best
+
+            hits = np.flatnonzero(scores)
+            total = len(hits)
+            wanted = page * per_page
+            if wanted < total:
+                hits = hits[np.argpartition(-scores[hits], wanted - 1)[:wanted]]
+            ranked = hits[np.argsort(-scores[hits], kind='stable')]
+            return total, [self.cards[self._keys[slot]] for slot in ranked[(page - 1) * per_page:]]
+
+
+def catalog_ingredients(data):
+    return [data.get(f'strIngredient{n}') for n in range(1, 16)]
+
+
+def drink_ingredients(drink):
+    return [getattr(drink, f'ingredient{n}') for n in range(1, 11)]
+
+
+def drink_card(drink):
+    """Render a user-created Drink in the same shape as an upstream drink."""
+
+    card = {
+        'idDrink': None,
+        'url': f"/user/original/{drink.id}",
+        'version': drink.updated_at.isoformat() if drink.updated_at else None,
+        'strDrink': drink.name,
+        'strCategory': drink.category,
+        'strInstructions': drink.instructions,
+    }
+    for n, ingredient in enumerate(drink_ingredients(drink), start=1):
+        card[f'strIngredient{n}'] = ingredient
+    return card
+
+
+def index_catalog_drink(index, data):
+    index.add(('catalog', int(data['idDrink'])), data, data.get('strDrink'),
+              data.get('strCategory'), data.get('strInstructions'), catalog_ingredients(data))
+
+
+def index_user_drink(index, drink):
+    index.add(('drink', drink.id), drink_card(drink), drink.name, drink.category,
+              drink.instructions, drink_ingredients(drink))
+
+
+def build_index():
+    index = SearchIndex()
+    for row in db.session.execute(db.select(CatalogDrink.data)).scalars():
+        index_catalog_drink(index, row)
+    for drink in db.session.execute(db.select(Drink)).scalars():
+        index_user_drink(index, drink)
+    index.compile()
+    return index
@@ -1,9 +1,202 @@
-from app import app, db
-from models import User
+"""Bulk-load synthetic users, drinks and favourites for capacity testing.
+
+    flask seed --users 100000 --drinks 1000000 --favs 20
+
+Rows go in `batch` at a time: with COPY on Postgres (psycopg2) and with
+executemany INSERTs elsewhere. Ids are assigned here, continuing from the
+current maximum, so drinks and favourites can point at their users
+without reading anything back; Postgres sequences are moved past them at
+the end. Existing rows are left alone.
+
+Passwords are real bcrypt hashes, computed across a process pool. bcrypt
+is slow on purpose (about 0.25 s a hash at 12 rounds), so millions of
+users take `--rounds 4` or a small `--distinct-passwords`: user n's
+password is "seed-password-{n % distinct}", hashed once per distinct
+password with its own salt.
+
+Favourites are drawn from the mirrored catalogue (run sync-catalog
+first), or from TheCocktailDB's id range if nothing is mirrored, and are
+counted into the hourly popularity buckets as well as the totals, so the
+trending windows cover them.
+
+`python seed.py` still creates the tables and two demo users.
+"""
+
+import csv
+import io
+import os
+import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import bcrypt
+from sqlalchemy import func, insert, select, text
+
+import popularity
+from drink_words import INGREDIENTS, STYLES, BASES
+from ingredients import get_or_create_ingredients, normalize_ingredient
+from models import db, User, Drink, AddDrink, CatalogDrink, DrinkIngredient
+
+BATCH = 10000
+DEFAULT_ROUNDS = 12
+UPSTREAM_IDS = range(11000, 18000)
+
+
+def seed_password(n, distinct):
+    return f"seed-password-{n % distinct}"
+
+
+def _hash(job):
+    password, rounds = job
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+
+
+def hash_passwords(passwords, rounds=DEFAULT_ROUNDS, processes=None):
+    """bcrypt hashes of `passwords`, in order, computed in `processes` worker processes."""
+
+    if not passwords:
+        return []
+    jobs = [(password, rounds) for password in passwords]
+    if processes == 1 or len(jobs) == 1:
+        return [_hash(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        chunksize = max(1, len(jobs) // ((processes or os.cpu_count() or 1) * 4))
+        return list(pool.map(_hash, jobs, chunksize=chunksize))
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _next_id(model):
+    return (db.session.scalar(select(func.max(model.id))) or 0) + 1
+
+
+def _uses_copy():
+    return db.engine.dialect.name == 'postgresql' and db.engine.driver == 'psycopg2'
+
+
+def write_rows(model, columns, rows):
+    """Insert tuples of `columns` into `model`'s table, with COPY where the driver has it."""
+
+    table = model.__table__
+    if _uses_copy():
+        buf = io.StringIO()
+        # csv writes None as an empty unquoted field, which COPY reads as NULL
+        csv.writer(buf).writerows(rows)
+        buf.seek(0)
+        cursor = db.session.connection().connection.cursor()
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                           buf)
+        cursor.close()
+    else:
+        db.session.execute(insert(table), [dict(zip(columns, row)) for row in rows])
+
+
+def _fix_sequences(*models):
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for model in models:
+        name = model.__tablename__
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{name}', 'id'), "
+            f"(SELECT coalesce(max(id), 1) FROM {name}))"))
+
+
+def _user_rows(first_id, count, hashes):
+    for n in range(count):
+        user_id = first_id + n
+        yield user_id, f"seed{user_id}", hashes[n % len(hashes)]
+
+
+def _drink_rows(first_id, count, owners, rng, now):
+    for n in range(count):
+        drink_id = first_id + n
+        names = rng.sample(INGREDIENTS, rng.randint(2, 6))
+        yield (drink_id, f"{rng.choice(STYLES)} {rng.choice(BASES)} #{drink_id}", 'Cocktail',
+               'Build over ice and stir.', owners[n % len(owners)], now,
+               *names, *([None] * (10 - len(names))))
+
+
+def _favourite_rows(user_ids, per_user, pool, rng, now):
+    for user_id in user_ids:
+        for n, drink_id in enumerate(rng.sample(pool, min(per_user, len(pool)))):
+            yield user_id, drink_id, now - timedelta(minutes=n)
+
+
+def seed(users=0, drinks=0, favs=0, rounds=DEFAULT_ROUNDS, distinct_passwords=None,
+         processes=None, batch=BATCH, random_seed=0, echo=print):
+    """Add `users` users, `drinks` drinks and `favs` favourites per new user.
+
+    Drinks are owned round-robin by the new users, or by the existing ones
+    when `users` is 0. Returns the number of rows written per table.
+    """
+
+    rng = random.Random(random_seed)
+    now = datetime.utcnow()
+    counts = {'users': 0, 'drinks': 0, 'drink_ingredients': 0, 'favourites': 0,
+              'popularity_buckets': 0}
+
+    first_user = _next_id(User)
+    user_ids = list(range(first_user, first_user + users))
+    if users:
+        distinct = min(distinct_passwords or users, users)
+        echo(f"Hashing {distinct} passwords ({rounds} rounds)...")
+        hashes = hash_passwords([seed_password(n, distinct) for n in range(distinct)],
+                                rounds, processes)
+        for rows in _batches(_user_rows(first_user, users, hashes), batch):
+            write_rows(User, ('id', 'username', 'password'), rows)
+            db.session.commit()
+            counts['users'] += len(rows)
+        echo(f"users: {counts['users']}")
+
+    if drinks:
+        owners = user_ids or db.session.scalars(select(User.id).order_by(User.id)).all()
+        if not owners:
+            raise ValueError("Drinks need owners: add --users or seed some users first")
+        by_name = get_or_create_ingredients([normalize_ingredient(name) for name in INGREDIENTS])
+        db.session.commit()
+        ingredient_ids = {name: ingredient.id for name, ingredient in by_name.items()}
+        columns = ('id', 'name', 'category', 'instructions', 'user_id', 'updated_at',
+                   *(f'ingredient{n}' for n in range(1, 11)))
+        rows_in = _drink_rows(_next_id(Drink), drinks, owners, rng, now)
+        for rows in _batches(rows_in, batch):
+            write_rows(Drink, columns, rows)
+            links = [(row[0], ingredient_ids[normalize_ingredient(name)], position)
+                     for row in rows
+                     for position, name in enumerate((n for n in row[6:] if n), start=1)]
+            write_rows(DrinkIngredient, ('drink_id', 'ingredient_id', 'position'), links)
+            db.session.commit()
+            counts['drinks'] += len(rows)
+            counts['drink_ingredients'] += len(links)
+        echo(f"drinks: {counts['drinks']}")
+
+    if favs and user_ids:
+        pool = db.session.scalars(select(CatalogDrink.id)).all() or list(UPSTREAM_IDS)
+        buckets = Counter()
+        for rows in _batches(_favourite_rows(user_ids, favs, pool, rng, now), batch):
+            write_rows(AddDrink, ('user_id', 'drink_id', 'created_at'), rows)
+            db.session.commit()
+            counts['favourites'] += len(rows)
+            buckets.update((drink_id, popularity.bucket_hour(created_at))
+                           for _, drink_id, created_at in rows)
+        popularity.reconcile_totals()
+        popularity.record_bucket_adds(buckets)
+        counts['popularity_buckets'] = len(buckets)
+        echo(f"favourites: {counts['favourites']}")
+
+    _fix_sequences(User, Drink)
+    db.session.commit()
+    return counts
 
-# Create tables
-with app.app_context():
-    db.create_all()
 
 # Seed data
 def seed_users():
@@ -13,11 +206,17 @@ def seed_users():
         # Add more users as needed
     ]
 
-    for user_data in users:
-        user = User(username=user_data['username'], password=user_data['password'])
+    hashes = hash_passwords([user_data['password'] for user_data in users])
+    for user_data, hashed in zip(users, hashes):
+        user = User(username=user_data['username'], password=hashed)
         db.session.add(user)
 
     db.session.commit()
 
 if __name__ == '__main__':
-    seed_users()
\ No newline at end of file
+    from app import create_app
+
+    with create_app().app_context():
+        # Create tables
+        db.create_all()
+        seed_users()
@@ -0,0 +1,63 @@
+"""Autocomplete index tests"""
+
+from unittest import TestCase
+from autocomplete import Autocomplete, catalog_rows
+
+
+class AutocompleteTestCase(TestCase):
+    """Test cases for the prefix suggestion index"""
+
+    def setUp(self):
+        self.index = Autocomplete()
+        self.index.add_many([
+            *catalog_rows({"idDrink": "11007", "strDrink": "Margarita",
+                           "strIngredient1": "Tequila", "strIngredient2": "Lime juice"}, weight=5),
+            *catalog_rows({"idDrink": "11118", "strDrink": "Blue Margarita",
+                           "strIngredient1": "Tequila"}),
+            *catalog_rows({"idDrink": "11728", "strDrink": "New York Sour"}),
+        ])
+
+    def labels(self, prefix, limit=10):
+        return [s["label"] for s in self.index.suggest(prefix, limit)]
+
+    def test_prefix_and_word_start(self):
+        """Prefixes match the start of any word in a name"""
+
+        self.assertEqual(self.labels("marg"), ["Margarita", "Blue Margarita"])
+        self.assertEqual(self.labels("sou"), ["New York Sour"])
+        self.assertEqual(self.labels("TEQ"), ["Tequila"])
+        self.assertEqual(self.labels(""), [])
+
+    def test_popularity_ranking(self):
+        """Searches and favourites move names up the list"""
+
+        self.index.bump("blue margarita", 10)
+        self.assertEqual(self.labels("marg", limit=1), ["Blue Margarita"])
+
+        self.index.add_weight(("catalog", 11007), 6)
+        self.assertEqual(self.labels("marg", limit=1), ["Margarita"])
+
+    def test_incremental_updates(self):
+        """Added, renamed and removed entries show up without a rebuild"""
+
+        self.labels("m")
+        self.index.add(("drink", 1), "Marg Royale")
+        self.assertIn("Marg Royale", self.labels("marg"))
+        self.assertIn("Marg Royale", self.labels("m"))
+
+        self.index.add(("drink", 1), "Gin Royale")
+        self.assertNotIn("Marg Royale", self.labels("marg"))
+        self.assertNotIn("Marg Royale", self.labels("m"))
+        self.assertEqual(self.labels("roy"), ["Gin Royale"])
+        self.assertEqual(self.labels("g"), ["Gin Royale"])
+
+        self.index.remove(("drink", 1))
+        self.assertEqual(self.labels("roy"), [])
+        self.assertEqual(self.labels("r"), [])
+
+    def test_duplicate_names_once(self):
+        """A user drink named like a catalogue drink is suggested once"""
+
+        self.index.add(("drink", 2), "margarita")
+
+        self.assertEqual(self.labels("margarita"), ["Margarita", "Blue Margarita"])
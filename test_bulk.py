@@ -0,0 +1,96 @@
+"""Bulk drinks API tests"""
+
+from unittest import TestCase
+
+from app import create_app
+from models import db, Drink, DrinkIngredient
+
+
+class BulkDrinksTestCase(TestCase):
+    """Test cases for batch create, update and delete"""
+
+    def setUp(self):
+        self.app = create_app({"DATABASE_URL": "sqlite://", "SQLALCHEMY_ECHO": False,
+                               "BULK_MAX_ITEMS": 5})
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def bulk(self, method, body):
+        res = self.client.open("/api/drinks/bulk", method=method, json=body)
+        self.assertEqual(res.status_code, 200, res.get_data(as_text=True))
+        return res.json
+
+    def statuses(self, body):
+        return [(r["status"], r.get("error")) for r in body["results"]]
+
+    def test_create(self):
+        """Valid items are created with their ingredient links; invalid ones are reported by index"""
+
+        body = self.bulk("POST", {"drinks": [
+            {"name": "Gimlet", "ingredient1": "Gin", "ingredient2": "Lime juice"},
+            {"category": "Cocktail"},
+            {"name": "Paloma", "colour": "pink"},
+            {"name": 7},
+            {"name": "Negroni"},
+        ]})
+
+        self.assertEqual(self.statuses(body), [
+            ("created", None), ("error", "name is required"), ("error", "unknown fields: colour"),
+            ("error", "name must be a string"), ("created", None)])
+        self.assertEqual((body["succeeded"], body["failed"]), (2, 3))
+        gimlet = db.session.get(Drink, body["results"][0]["id"])
+        self.assertEqual([link.ingredient.name for link in gimlet.ingredient_links],
+                         ["gin", "lime juice"])
+
+    def test_update(self):
+        """Items are patched by id; missing, repeated and non-integer ids are errors"""
+
+        ids = [r["id"] for r in self.bulk("POST", {"drinks": [{"name": "Gimlet"},
+                                                               {"name": "Negroni"}]})["results"]]
+
+        body = self.bulk("PATCH", {"drinks": [
+            {"id": ids[0], "ingredient1": "Vodka"},
+            {"id": ids[0], "name": "Again"},
+            {"id": 999, "name": "Nobody"},
+            {"id": True, "name": "Boolean"},
+            {"id": ids[1], "name": ""},
+        ]})
+
+        self.assertEqual(self.statuses(body), [
+            ("updated", None), ("error", "id appears more than once in this batch"),
+            ("error", "not found"), ("error", "id is required"), ("error", "name cannot be empty")])
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Drink, ids[0]).ingredient1, "Vodka")
+        self.assertEqual(db.session.get(Drink, ids[0]).name, "Gimlet")
+        self.assertEqual(DrinkIngredient.query.filter_by(drink_id=ids[0]).count(), 1)
+        self.assertEqual(db.session.get(Drink, ids[1]).name, "Negroni")
+
+    def test_delete(self):
+        """Drinks and their links are deleted by id; bools are not ids"""
+
+        ids = [r["id"] for r in self.bulk("POST", {"drinks": [
+            {"name": "Gimlet", "ingredient1": "Gin"}, {"name": "Negroni"}]})["results"]]
+
+        body = self.bulk("DELETE", {"ids": [ids[0], True, ids[0], 999, "2"]})
+
+        self.assertEqual(self.statuses(body), [
+            ("deleted", None), ("error", "id must be an integer"),
+            ("error", "id appears more than once in this batch"), ("error", "not found"),
+            ("error", "id must be an integer")])
+        self.assertEqual([d.id for d in Drink.query.all()], [ids[1]])
+        self.assertEqual(DrinkIngredient.query.count(), 0)
+
+    def test_bad_batches(self):
+        """A body without the list is a 400; an oversized batch is a 413"""
+
+        self.assertEqual(self.client.post("/api/drinks/bulk", json={"items": []}).status_code, 400)
+        self.assertEqual(self.client.delete("/api/drinks/bulk", json={"ids": "1,2"}).status_code, 400)
+        self.assertEqual(self.client.post("/api/drinks/bulk",
+                                          json={"drinks": [{"name": "x"}] * 6}).status_code, 413)
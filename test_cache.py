@@ -0,0 +1,350 @@
+"""Upstream cache tests"""
+
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from unittest import IsolatedAsyncioTestCase, TestCase
+from cache import (DBCache, DBLock, LRUCache, MISSING, SingleFlight, make_single_flight,
+                   read_through, read_through_async)
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class LRUCacheTestCase(TestCase):
+    """Test cases for the in-process LRU cache"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = LRUCache(maxsize=2, ttl=10, clock=self.clock)
+
+    def test_hit_and_miss(self):
+        """Stored values are returned and counted as hits"""
+
+        self.assertIs(self.cache.get("lookup:11007"), MISSING)
+        self.cache.set("lookup:11007", {"idDrink": "11007"})
+
+        self.assertEqual(self.cache.get("lookup:11007"), {"idDrink": "11007"})
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_ttl_expiry(self):
+        """Entries older than the TTL are dropped"""
+
+        self.cache.set("search:margarita", [])
+        self.clock.now = 11
+
+        self.assertIs(self.cache.get("search:margarita"), MISSING)
+        self.assertEqual(self.cache.stats()["expirations"], 1)
+
+    def test_lru_eviction(self):
+        """The least recently used entry is evicted first"""
+
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.cache.get("a")
+        self.cache.set("c", 3)
+
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertIs(self.cache.get("b"), MISSING)
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_invalidate(self):
+        """Single keys can be invalidated"""
+
+        self.cache.set("lookup:11007", {})
+
+        self.assertTrue(self.cache.invalidate("lookup:11007"))
+        self.assertFalse(self.cache.invalidate("lookup:11007"))
+        self.assertIs(self.cache.get("lookup:11007"), MISSING)
+
+    def test_read_through(self):
+        """read_through only calls the loader on a miss, and caches None results"""
+
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return None
+
+        self.assertIsNone(read_through(self.cache, "search:zzz", loader))
+        self.assertIsNone(read_through(self.cache, "search:zzz", loader))
+        self.assertEqual(len(calls), 1)
+
+
+class StaleWhileRevalidateTestCase(TestCase):
+    """Test cases for soft TTLs"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = LRUCache(ttl=100, soft_ttl=10, clock=self.clock)
+
+    def test_stale_entries_are_served(self):
+        """Past the soft TTL the value is returned and flagged stale"""
+
+        self.cache.set("lookup:11007", "old")
+        self.assertEqual(self.cache.get_entry("lookup:11007"), ("old", False))
+
+        self.clock.now = 11
+        self.assertEqual(self.cache.get_entry("lookup:11007"), ("old", True))
+        self.assertEqual(self.cache.stats()["stale_hits"], 1)
+
+        self.clock.now = 101
+        self.assertIs(self.cache.get_entry("lookup:11007"), MISSING)
+
+    def test_read_through_reports_stale(self):
+        """read_through serves the stale value and calls on_stale"""
+
+        self.cache.set("search:gin", "old")
+        self.clock.now = 11
+        stale = []
+
+        value = read_through(self.cache, "search:gin", lambda: "new",
+                             on_stale=lambda: stale.append(True))
+
+        self.assertEqual(value, "old")
+        self.assertEqual(stale, [True])
+
+
+class SingleFlightTestCase(TestCase):
+    """Test cases for coalescing concurrent cache misses"""
+
+    def test_concurrent_misses_share_one_load(self):
+        """Threads missing the same key wait for the first loader"""
+
+        cache = LRUCache()
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            release.wait(5)
+            return "margarita"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            read_through(cache, "search:margarita", loader, flight))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        while flight.stats()["coalesced"] < 7:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["margarita"] * 8)
+        self.assertEqual(flight.stats()["in_flight"], 0)
+
+    def test_errors_are_shared_and_not_cached(self):
+        """A failed load raises for the caller and the next call retries"""
+
+        cache = LRUCache()
+        flight = SingleFlight()
+
+        with self.assertRaises(ValueError):
+            read_through(cache, "lookup:1", lambda: int("x"), flight)
+        self.assertEqual(read_through(cache, "lookup:1", lambda: 1, flight), 1)
+
+
+class AsyncSingleFlightTestCase(IsolatedAsyncioTestCase):
+    """Test cases for coalescing coroutine loaders"""
+
+    async def test_tasks_share_one_load(self):
+        """Concurrent tasks on one loop share a single upstream call"""
+
+        cache = LRUCache()
+        flight = SingleFlight()
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"idDrink": "11007"}
+
+        results = await asyncio.gather(*(
+            read_through_async(cache, "lookup:11007", loader, flight) for _ in range(5)))
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"idDrink": "11007"}] * 5)
+
+    async def test_cancelled_leader_hands_over(self):
+        """If the leader is cancelled a waiting caller loads instead"""
+
+        cache = LRUCache()
+        flight = SingleFlight()
+
+        async def loader():
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        leader = asyncio.ensure_future(read_through_async(cache, "k", loader, flight))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(read_through_async(cache, "k", loader, flight))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        self.assertEqual(await follower, "ok")
+
+    async def test_cancelled_follower(self):
+        """A waiting caller that is cancelled leaves the load and the other waiters alone"""
+
+        flight = SingleFlight()
+        thread_result = []
+
+        async def loader():
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        leader = asyncio.ensure_future(flight.do_async("k", loader))
+        await asyncio.sleep(0)
+        cancelled = asyncio.ensure_future(flight.do_async("k", loader))
+        follower = asyncio.ensure_future(flight.do_async("k", loader))
+        waiter = threading.Thread(target=lambda: thread_result.append(flight.do("k", lambda: "again")))
+        waiter.start()
+        while flight.followers < 3:
+            await asyncio.sleep(0.001)
+        cancelled.cancel()
+
+        self.assertEqual(await leader, "ok")
+        self.assertEqual(await follower, "ok")
+        with self.assertRaises(asyncio.CancelledError):
+            await cancelled
+        waiter.join(1)
+        self.assertEqual(thread_result, ["ok"])
+        self.assertEqual(flight.leaders, 1)
+
+
+class DBTestCase(TestCase):
+    """Shared setup: an app on a throwaway SQLite file with the cache tables"""
+
+    def setUp(self):
+        from app import create_app
+        from models import db, CachedResponse, UpstreamLock
+
+        path = os.path.join(tempfile.mkdtemp(), "cache.sqlite")
+        self.app = create_app({"DATABASE_URL": f"sqlite:///{path}", "SQLALCHEMY_ECHO": False})
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.metadata.create_all(db.engine, tables=[CachedResponse.__table__,
+                                                  UpstreamLock.__table__])
+        self.db = db
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        self.db.session.remove()
+        self.ctx.pop()
+
+
+class DBCacheTestCase(DBTestCase):
+    """Test cases for the shared table-backed cache"""
+
+    def setUp(self):
+        super().setUp()
+        from models import CachedResponse
+        self.model = CachedResponse
+        self.cache = DBCache(self.db, CachedResponse, maxsize=2, ttl=10, soft_ttl=5,
+                             trim_interval=60, clock=self.clock)
+
+    def test_hit_miss_and_overwrite(self):
+        """Values round-trip as JSON, and setting a key again replaces it"""
+
+        self.assertIs(self.cache.get("lookup:11007"), MISSING)
+        self.cache.set("lookup:11007", {"idDrink": "11007"})
+        self.cache.set("lookup:11007", {"idDrink": "11007", "strDrink": "Margarita"})
+
+        self.assertEqual(self.cache.get_entry("lookup:11007"),
+                         ({"idDrink": "11007", "strDrink": "Margarita"}, False))
+        self.assertTrue(self.cache.invalidate("lookup:11007"))
+        self.assertIs(self.cache.get("lookup:11007"), MISSING)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_leaves_request_session_alone(self):
+        """Cache writes don't commit what the request has pending"""
+
+        self.db.session.add(self.model(key="pending", value="1", stored_at=datetime.utcnow(),
+                                       expires_at=datetime.utcnow()))
+        self.cache.set("lookup:11007", {"idDrink": "11007"})
+        self.cache.invalidate("lookup:1")
+        self.db.session.rollback()
+
+        self.assertIsNone(self.db.session.get(self.model, "pending"))
+        self.assertEqual(self.cache.get("lookup:11007"), {"idDrink": "11007"})
+
+    def test_periodic_trim(self):
+        """Expired rows, then the oldest, are deleted once per trim interval"""
+
+        self.cache.set("lookup:0", 0, ttl=0)
+        for n in range(1, 4):
+            self.cache.set(f"lookup:{n}", n)
+        self.assertEqual(self.cache.stats()["size"], 4)
+
+        self.clock.now = 60
+        self.cache.set("lookup:4", 4)
+
+        self.assertEqual(self.cache.stats()["size"], 2)
+        self.assertEqual([self.cache.get(f"lookup:{n}") for n in (3, 4)], [3, 4])
+        self.assertEqual(self.cache.stats()["expirations"], 1)
+        self.assertEqual(self.cache.stats()["evictions"], 2)
+
+
+class DBLockTestCase(DBTestCase):
+    """Test cases for the cluster-wide upstream lease"""
+
+    def setUp(self):
+        super().setUp()
+        from models import UpstreamLock
+        self.lock = DBLock(self.db, UpstreamLock, ttl=10)
+
+    def test_one_holder(self):
+        """Only one caller holds a key until it releases it"""
+
+        token = self.lock.acquire("lookup:11007")
+
+        self.assertTrue(token)
+        self.assertTrue(self.lock.held("lookup:11007"))
+        self.assertIsNone(self.lock.acquire("lookup:11007"))
+        self.assertTrue(self.lock.acquire("lookup:11118"))
+        self.lock.release("lookup:11007", "someone else's token")
+        self.assertTrue(self.lock.held("lookup:11007"))
+        self.lock.release("lookup:11007", token)
+        self.assertFalse(self.lock.held("lookup:11007"))
+        self.assertTrue(self.lock.acquire("lookup:11007"))
+
+    def test_expired_lease_is_taken_over(self):
+        """A lease past its ttl (a crashed worker's) no longer blocks anyone"""
+
+        self.lock.ttl = 0
+        self.assertTrue(self.lock.acquire("lookup:11007"))
+
+        self.assertFalse(self.lock.held("lookup:11007"))
+        self.assertTrue(self.lock.acquire("lookup:11007"))
+
+    def test_leaves_request_session_alone(self):
+        """Taking and releasing a lease doesn't commit the request's work"""
+
+        from models import CachedResponse
+        self.db.session.add(CachedResponse(key="pending", value="1", stored_at=datetime.utcnow(),
+                                           expires_at=datetime.utcnow()))
+        self.lock.release("lookup:11007", self.lock.acquire("lookup:11007"))
+        self.db.session.rollback()
+
+        self.assertIsNone(self.db.session.get(CachedResponse, "pending"))
+
+    def test_needs_shared_cache(self):
+        """A cluster lock over per-process caches is refused"""
+
+        with self.assertRaises(ValueError):
+            make_single_flight({"CACHE_LOCK": "db", "CACHE_BACKEND": "memory"})
+        self.assertIsInstance(make_single_flight({"CACHE_LOCK": "db", "CACHE_BACKEND": "db"}).lock,
+                              DBLock)
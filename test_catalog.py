@@ -0,0 +1,97 @@
+"""Catalogue mirror tests"""
+
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+from app import create_app
+import catalog
+from models import db, CatalogDrink
+
+
+def drink(drink_id, name, modified="2016-07-18 22:49:04"):
+    return {"idDrink": str(drink_id), "strDrink": name, "strCategory": "Cocktail",
+            "dateModified": modified}
+
+
+class FakeClient:
+
+    def __init__(self, letters):
+        self.letters = letters
+        self.fetched = []
+
+    def by_letter(self, letter):
+        self.fetched.append(letter)
+        drinks = self.letters.get(letter)
+        if isinstance(drinks, Exception):
+            raise drinks
+        return drinks
+
+
+class CatalogTestCase(TestCase):
+    """Test cases for syncing the local catalogue mirror"""
+
+    def setUp(self):
+        self.app = create_app({"DATABASE_URL": "sqlite://", "SQLALCHEMY_ECHO": False})
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_store_drink(self):
+        """A drink is added once, updated when it changes and left alone otherwise"""
+
+        self.assertEqual(catalog.store_drink(drink(11007, "Margarita")), "added")
+        db.session.commit()
+        self.assertEqual(catalog.store_drink(drink(11007, "Margarita")), "unchanged")
+        self.assertEqual(catalog.store_drink(drink(11007, "Margarita", "2017-01-01 00:00:00")),
+                         "updated")
+        db.session.commit()
+
+        row = db.session.get(CatalogDrink, 11007)
+        self.assertEqual(row.modified_at, datetime(2017, 1, 1))
+        self.assertEqual(catalog.get_catalog_drink("11007")["dateModified"], "2017-01-01 00:00:00")
+
+    def test_sync(self):
+        """Each letter is mirrored; a failing letter is counted and the rest still sync"""
+
+        client = FakeClient({"a": [drink(1, "Aviation"), drink(2, "Americano")],
+                             "b": RuntimeError("upstream down"), "c": None})
+
+        counts = catalog.sync_catalog(client, letters="abc")
+
+        self.assertEqual(counts["added"], 2)
+        self.assertEqual(counts["failed_letters"], 1)
+        self.assertEqual(sorted(catalog.get_catalog_drinks([1, 2, 3])), [1, 2])
+        self.assertTrue(catalog.has_catalog())
+
+    def test_removed_upstream(self):
+        """Drinks a letter no longer lists are deleted, other letters' are kept"""
+
+        catalog.sync_catalog(FakeClient({"a": [drink(1, "Aviation"), drink(2, "Americano")],
+                                         "b": [drink(3, "Bramble")]}), letters="ab")
+
+        counts = catalog.sync_catalog(FakeClient({"a": [drink(1, "Aviation")]}), letters="a")
+
+        self.assertEqual(counts["deleted"], 1)
+        self.assertEqual(sorted(catalog.get_catalog_drinks([1, 2, 3])), [1, 3])
+
+    def test_max_age(self):
+        """Letters synced within max_age are skipped; stale and failed ones are fetched"""
+
+        letters = {"a": [drink(1, "Aviation")], "b": [drink(2, "Bramble")],
+                   "c": RuntimeError("upstream down")}
+        catalog.sync_catalog(FakeClient(letters), letters="abc")
+        db.session.get(CatalogDrink, 2).synced_at -= timedelta(hours=2)
+        db.session.commit()
+
+        client = FakeClient(letters)
+        counts = catalog.sync_catalog(client, letters="abc", max_age=timedelta(hours=1))
+
+        self.assertEqual(client.fetched, ["b", "c"])
+        self.assertEqual(counts["skipped_letters"], 1)
+        self.assertGreater(db.session.get(CatalogDrink, 2).synced_at,
+                           datetime.utcnow() - timedelta(hours=1))
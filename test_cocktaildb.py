@@ -0,0 +1,167 @@
+"""CocktailDB client tests"""
+
+import asyncio
+from unittest import IsolatedAsyncioTestCase, TestCase, mock
+
+import httpx
+
+from cocktaildb import (AsyncCocktailDBClient, CircuitBreaker, CircuitOpenError,
+                        CocktailDBClient, UpstreamError)
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTestCase(TestCase):
+    """Test cases for the upstream circuit breaker"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(threshold=2, reset_timeout=30, clock=self.clock)
+
+    def test_opens_after_threshold(self):
+        """Consecutive failures open the circuit"""
+
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_half_open_allows_one_trial(self):
+        """After the reset timeout a single trial call is let through"""
+
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now = 31
+
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_trial_reopens(self):
+        """A failed trial call opens the circuit again"""
+
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now = 31
+        self.breaker.allow()
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_client_fails_fast_when_open(self):
+        """The client raises without calling upstream while the circuit is open"""
+
+        client = CocktailDBClient(base_url="http://127.0.0.1:9", breaker=self.breaker)
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+
+        with self.assertRaises(CircuitOpenError):
+            client.lookup(11007)
+
+
+class AsyncClientTestCase(IsolatedAsyncioTestCase):
+    """Test cases for the httpx-based upstream client"""
+
+    def make_client(self, handler, **kwargs):
+        self.requests = []
+
+        def record(request):
+            self.requests.append(request)
+            return handler(request)
+
+        return AsyncCocktailDBClient(base_url="http://cocktaildb.test", backoff=0,
+                                     transport=httpx.MockTransport(record), **kwargs)
+
+    async def test_lookup(self):
+        """A lookup returns the first drink"""
+
+        client = self.make_client(
+            lambda request: httpx.Response(200, json={"drinks": [{"idDrink": "11007"}]}))
+
+        drink = await client.lookup(11007)
+
+        self.assertEqual(drink, {"idDrink": "11007"})
+        self.assertEqual(self.requests[0].url.params["i"], "11007")
+
+    async def test_session_opens_one_client_lazily(self):
+        """Calls in a session share one httpx client, and a session without calls opens none"""
+
+        client = self.make_client(lambda request: httpx.Response(200, json={"drinks": None}))
+
+        with mock.patch("cocktaildb.httpx.AsyncClient", wraps=httpx.AsyncClient) as opened:
+            async with client.session():
+                pass
+            self.assertEqual(opened.call_count, 0)
+            async with client.session():
+                await client.search("margarita")
+                await client.lookup(11007)
+            self.assertEqual(opened.call_count, 1)
+
+    async def test_retries_transient_status(self):
+        """5xx responses are retried before giving up"""
+
+        responses = iter([httpx.Response(503), httpx.Response(200, json={"drinks": None})])
+        client = self.make_client(lambda request: next(responses))
+
+        self.assertIsNone(await client.search("nothing"))
+        self.assertEqual(len(self.requests), 2)
+
+    async def test_failure_opens_shared_breaker(self):
+        """Failures count against the breaker shared with the sync client"""
+
+        breaker = CircuitBreaker(threshold=1)
+        client = self.make_client(lambda request: httpx.Response(404), breaker=breaker)
+
+        with self.assertRaises(UpstreamError):
+            await client.lookup(1)
+        with self.assertRaises(CircuitOpenError):
+            await client.lookup(1)
+        self.assertEqual(len(self.requests), 1)
+
+    async def test_observer(self):
+        """Each call is reported once with its endpoint and outcome, retries included"""
+
+        calls = []
+        responses = iter([httpx.Response(503), httpx.Response(200, json={"drinks": None}),
+                          httpx.Response(404)])
+        client = self.make_client(lambda request: next(responses),
+                                  observer=lambda *args: calls.append(args))
+
+        await client.search("nothing")
+        with self.assertRaises(UpstreamError):
+            await client.lookup(1)
+
+        self.assertEqual([(endpoint, ok) for endpoint, _, ok in calls],
+                         [("search.php", True), ("lookup.php", False)])
+
+    async def test_cancelled_trial_is_released(self):
+        """A half-open trial cancelled mid-call doesn't keep the circuit shut"""
+
+        clock = FakeClock()
+        breaker = CircuitBreaker(threshold=1, reset_timeout=30, clock=clock)
+        breaker.record_failure()
+        clock.now = 31
+
+        async def hang(request):
+            await asyncio.sleep(60)
+
+        client = self.make_client(hang, breaker=breaker)
+        task = asyncio.ensure_future(client.lookup(1))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
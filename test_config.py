@@ -0,0 +1,90 @@
+"""Database configuration tests"""
+
+import os
+import tempfile
+from unittest import TestCase
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import column, select, table, text
+
+from config import database_config
+from models import RoutingSession, read_only
+
+
+class DatabaseConfigTestCase(TestCase):
+    """Test cases for profile and environment driven engine settings"""
+
+    def test_profile_defaults_and_overrides(self):
+        """A profile supplies defaults; environment variables win"""
+
+        cfg = database_config({"MIXOLOGY_PROFILE": "production", "DB_POOL_SIZE": "3",
+                               "DATABASE_URL": "postgres://u@db/mixology"})
+        options = cfg["SQLALCHEMY_ENGINE_OPTIONS"]
+
+        self.assertEqual(cfg["SQLALCHEMY_DATABASE_URI"], "postgresql://u@db/mixology")
+        self.assertEqual(options["pool_size"], 3)
+        self.assertEqual(options["max_overflow"], 5)
+        self.assertIs(options["pool_pre_ping"], True)
+        self.assertEqual(options["connect_args"], {"options": "-c statement_timeout=5000"})
+        self.assertEqual(cfg["SQLALCHEMY_BINDS"], {})
+
+    def test_sqlite(self):
+        """In-memory SQLite gets no pool sizing; the timeout becomes the busy timeout"""
+
+        cfg = database_config({"MIXOLOGY_PROFILE": "test", "DB_STATEMENT_TIMEOUT_MS": "2500"})
+
+        self.assertEqual(cfg["SQLALCHEMY_DATABASE_URI"], "sqlite://")
+        self.assertEqual(cfg["SQLALCHEMY_ENGINE_OPTIONS"],
+                         {"pool_pre_ping": False, "connect_args": {"timeout": 2.5}})
+
+    def test_uri_override(self):
+        """create_app derives the engine options from an overriding SQLALCHEMY_DATABASE_URI"""
+
+        from app import create_app
+
+        app = create_app({"MIXOLOGY_PROFILE": "production", "SQLALCHEMY_DATABASE_URI": "sqlite://"})
+
+        self.assertEqual(app.config["SQLALCHEMY_DATABASE_URI"], "sqlite://")
+        self.assertNotIn("pool_size", app.config["SQLALCHEMY_ENGINE_OPTIONS"])
+        with app.app_context():
+            self.assertEqual(app.extensions["sqlalchemy"].engine.url.render_as_string(), "sqlite://")
+
+    def test_unknown_profile(self):
+        """A misspelt profile is an error, not a silent fallback"""
+
+        with self.assertRaises(ValueError):
+            database_config({"MIXOLOGY_PROFILE": "prod"})
+
+
+class ReplicaRoutingTestCase(TestCase):
+    """Test cases for sending read-only views to the replica"""
+
+    def setUp(self):
+        workdir = tempfile.mkdtemp()
+        cfg = database_config({
+            "MIXOLOGY_PROFILE": "test",
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'primary.sqlite')}",
+            "DATABASE_REPLICA_URL": f"sqlite:///{os.path.join(workdir, 'replica.sqlite')}",
+        })
+        app = Flask(__name__)
+        app.config.update(cfg)
+        db = SQLAlchemy(app, session_options={"class_": RoutingSession})
+        with app.app_context():
+            for bind, name in ((None, "primary"), ("replica", "replica")):
+                with db.engines[bind].begin() as conn:
+                    conn.execute(text("CREATE TABLE source (name TEXT)"))
+                    conn.execute(text("INSERT INTO source VALUES (:name)"), {"name": name})
+
+        def source():
+            return db.session.execute(select(column("name")).select_from(table("source"))).scalar_one()
+
+        app.add_url_rule("/read", "read", read_only(source))
+        app.add_url_rule("/write", "write", source)
+        self.client = app.test_client()
+
+    def test_routing(self):
+        """Only views marked read_only read from the replica"""
+
+        self.assertEqual(self.client.get("/read").get_data(as_text=True), "replica")
+        self.assertEqual(self.client.get("/write").get_data(as_text=True), "primary")
@@ -0,0 +1,83 @@
+"""Concurrent drink lookup tests"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+import httpx
+
+from app import create_app, favourite_drinks, get_drinks_by_ids
+from models import db, AddDrink, CatalogDrink, User
+
+SLOW, FAILING = 11001, 11003
+
+
+class DrinkLookupsTestCase(TestCase):
+    """Test cases for looking up many drinks against a deadline"""
+
+    def setUp(self):
+        self.app = create_app({"DATABASE_URL": "sqlite://", "SQLALCHEMY_ECHO": False,
+                               "LOOKUP_DEADLINE": 0.3, "UPSTREAM_RETRIES": 0})
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        db.session.add(CatalogDrink(id=11005, name="Mirrored", synced_at=datetime.utcnow(),
+                                    data={"idDrink": "11005", "strDrink": "Mirrored"}))
+        db.session.commit()
+        self.requested = []
+        self.app.extensions["mixology"].cocktaildb_async.transport = httpx.MockTransport(self.upstream)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    async def upstream(self, request):
+        drink_id = int(request.url.params["i"])
+        self.requested.append(drink_id)
+        if drink_id == SLOW:
+            await asyncio.sleep(2)
+        elif drink_id == FAILING:
+            return httpx.Response(500)
+        else:
+            # finish in the reverse of the order asked for
+            await asyncio.sleep((11010 - drink_id) / 100)
+        return httpx.Response(200, json={"drinks": [{"idDrink": str(drink_id),
+                                                     "strDrink": f"Drink {drink_id}"}]})
+
+    def lookup(self, ids):
+        started = time.monotonic()
+        with self.assertLogs(level="WARNING") as logs:
+            drinks = asyncio.run(get_drinks_by_ids(ids))
+        return [int(drink["idDrink"]) for drink in drinks], time.monotonic() - started, logs.output
+
+    def test_partial_results_by_the_deadline(self):
+        """Slow and failing lookups are left out and logged; the rest come back at the deadline"""
+
+        ids, elapsed, logs = self.lookup([11002, SLOW, 11005, FAILING, 11004])
+
+        self.assertEqual(ids, [11002, 11005, 11004])
+        self.assertLess(elapsed, 1)
+        self.assertTrue(any("11001 missed the 0.3s deadline" in line for line in logs))
+        self.assertTrue(any("11003 failed" in line for line in logs))
+        self.assertNotIn(11005, self.requested)
+        self.assertEqual(sorted(drink.id for drink in CatalogDrink.query), [11002, 11004, 11005])
+
+    def test_favourites_newest_first(self):
+        """Favourites come back newest first, however the lookups finish"""
+
+        user = User(username="fan", password="x")
+        db.session.add(user)
+        db.session.flush()
+        start = datetime.utcnow()
+        db.session.add_all([AddDrink(user_id=user.id, drink_id=drink_id,
+                                     created_at=start + timedelta(minutes=minutes))
+                            for drink_id, minutes in ((11004, 1), (11006, 3), (11002, 0), (11005, 2))])
+        db.session.commit()
+        user_id = user.id
+        db.session.expunge_all()
+
+        drinks = asyncio.run(favourite_drinks(db.session.get(User, user_id).favourites))
+
+        self.assertEqual([drink["idDrink"] for drink in drinks], ["11006", "11005", "11004", "11002"])
@@ -4,9 +4,10 @@ from unittest import TestCase
 from models import Category, Glass, db, Drink, Ingredient, Language, User
 
 os.environ["DATABASE_URL"] = "postgresql:///mixology-test"
-from app import app, USER_KEY
+from app import create_app, USER_KEY
 
-app.config["SQLALCHEMY_ECHO"] = False
+app = create_app({"SQLALCHEMY_ECHO": False})
+app.app_context().push()
 
 db.drop_all()
 db.create_all()
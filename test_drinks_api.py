@@ -0,0 +1,67 @@
+"""Drinks listing API tests"""
+
+import json
+from unittest import TestCase
+
+from app import create_app
+from models import db, Drink
+
+
+class ListDrinksTestCase(TestCase):
+    """Test cases for keyset pagination and NDJSON streaming of /api/drinks"""
+
+    def setUp(self):
+        self.app = create_app({"DATABASE_URL": "sqlite://", "SQLALCHEMY_ECHO": False,
+                               "API_MAX_PAGE_SIZE": 3, "API_STREAM_CHUNK": 2})
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        db.session.add_all([Drink(name=f"Drink {n}") for n in range(7)])
+        db.session.commit()
+        self.ids = [drink.id for drink in Drink.query.order_by(Drink.id)]
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_keyset_pages(self):
+        """Following `next` visits every drink once, in id order"""
+
+        seen, after = [], 0
+        while after is not None:
+            res = self.client.get(f"/api/drinks?after={after}&limit=2").json
+            self.assertLessEqual(len(res["drinks"]), 2)
+            seen.extend(drink["id"] for drink in res["drinks"])
+            after = res["next"]
+
+        self.assertEqual(seen, self.ids)
+
+    def test_pages_survive_deletes(self):
+        """Deleting a seen drink doesn't shift the next page, unlike an offset"""
+
+        first = self.client.get("/api/drinks?limit=2").json
+        db.session.delete(db.session.get(Drink, self.ids[0]))
+        db.session.commit()
+
+        second = self.client.get(f"/api/drinks?after={first['next']}&limit=2").json
+
+        self.assertEqual([drink["id"] for drink in second["drinks"]], self.ids[2:4])
+
+    def test_limit_is_clamped(self):
+        """limit is kept between 1 and API_MAX_PAGE_SIZE"""
+
+        self.assertEqual(len(self.client.get("/api/drinks?limit=50").json["drinks"]), 3)
+        self.assertEqual(len(self.client.get("/api/drinks?limit=-1").json["drinks"]), 1)
+
+    def test_ndjson_stream(self):
+        """format=ndjson or an NDJSON Accept header streams every remaining drink, one per line"""
+
+        for url, headers in ((f"/api/drinks?format=ndjson&after={self.ids[1]}", {}),
+                             (f"/api/drinks?after={self.ids[1]}",
+                              {"Accept": "application/x-ndjson"})):
+            with self.client.get(url, headers=headers) as res:
+                self.assertEqual(res.mimetype, "application/x-ndjson")
+                lines = res.get_data(as_text=True).splitlines()
+            self.assertEqual([json.loads(line)["id"] for line in lines], self.ids[2:])
@@ -0,0 +1,84 @@
+"""Rendered fragment cache tests"""
+
+from datetime import datetime
+from unittest import TestCase
+
+from app import create_app, page_cache
+from fragments import FragmentCache
+from models import db, CatalogDrink
+
+
+class FragmentCacheTestCase(TestCase):
+    """Test cases for caching rendered drink cards"""
+
+    def setUp(self):
+        self.cache = FragmentCache(maxsize=10)
+        self.renders = []
+
+    def render(self, drink_key, version="v1", template="drink_card.html", **context):
+        def build():
+            self.renders.append((template, drink_key, version))
+            return f"<div>{drink_key} {version}</div>"
+        return self.cache.render(template, drink_key, version, context, build)
+
+    def test_renders_once_per_version(self):
+        """The same card is rendered once; a new content version re-renders it"""
+
+        self.assertEqual(self.render("11007"), "<div>11007 v1</div>")
+        self.render("11007")
+        self.render("11007", version="v2")
+
+        self.assertEqual(len(self.renders), 2)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_template_and_context_are_part_of_the_key(self):
+        """A drink's card in another template or context is a separate entry"""
+
+        self.render("11007")
+        self.render("11007", template="fav_card.html")
+        self.render("11007", template="fav_card.html")
+        self.render("11007", compact=True)
+
+        self.assertEqual(len(self.renders), 3)
+
+    def test_invalidate_drink(self):
+        """Every cached card of a drink is dropped, and no other drink's"""
+
+        self.render("/user/original/1")
+        self.render("/user/original/1", template="fav_card.html")
+        self.render("/user/original/2")
+        self.cache.invalidate_drink("/user/original/1")
+        self.render("/user/original/1")
+        self.render("/user/original/2")
+
+        self.assertEqual(len(self.renders), 4)
+
+
+class SearchPageCacheTestCase(TestCase):
+    """Test cases for caching whole search pages for anonymous visitors"""
+
+    def setUp(self):
+        self.app = create_app({"DATABASE_URL": "sqlite://", "SQLALCHEMY_ECHO": False})
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        db.session.add(CatalogDrink(id=11007, name="Margarita", synced_at=datetime.utcnow(),
+                                    data={"idDrink": "11007", "strDrink": "Margarita"}))
+        db.session.commit()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_term_as_typed(self):
+        """A search is served from the cache only for the same spelling it shows"""
+
+        first = self.client.get("/search?search-name=margarita").get_data(as_text=True)
+        again = self.client.get("/search?search-name=margarita").get_data(as_text=True)
+        other = self.client.get("/search?search-name=Margarita").get_data(as_text=True)
+
+        self.assertEqual(again, first)
+        self.assertIn('Search Results for "Margarita"', other)
+        self.assertEqual(page_cache.stats()["hits"], 1)
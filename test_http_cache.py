@@ -0,0 +1,92 @@
+"""Conditional GET tests"""
+
+from datetime import datetime
+from unittest import TestCase
+
+from app import create_app, CURR_USER_KEY
+from models import db, Drink, User
+
+UPDATED = datetime(2024, 5, 1, 12, 30, 15, 250000)
+
+
+class ConditionalResponseTestCase(TestCase):
+    """Test cases for 304s and cache headers on a user-created drink's page"""
+
+    def setUp(self):
+        self.app = create_app({"DATABASE_URL": "sqlite://", "SQLALCHEMY_ECHO": False})
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        user = User(username="maker", password="x")
+        db.session.add(user)
+        db.session.flush()
+        drink = Drink(name="House Sour", user_id=user.id, updated_at=UPDATED)
+        db.session.add(drink)
+        db.session.commit()
+        self.user_id, self.url = user.id, f"/user/original/{drink.id}"
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_if_none_match(self):
+        """A matching ETag gets a bare 304 with the same validators; a stale one the page"""
+
+        first = self.client.get(self.url)
+        etag = first.headers["ETag"]
+
+        res = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.get_data(), b"")
+        self.assertEqual(res.headers["ETag"], etag)
+        self.assertTrue(res.cache_control.public)
+
+        res = self.client.get(self.url, headers={"If-None-Match": '"stale"'})
+        self.assertEqual(res.status_code, 200)
+        self.assertIn("House Sour", res.get_data(as_text=True))
+
+    def test_if_modified_since(self):
+        """Last-Modified is whole seconds; If-Modified-Since at or after it is a 304"""
+
+        self.assertEqual(self.client.get(self.url).headers["Last-Modified"],
+                         "Wed, 01 May 2024 12:30:15 GMT")
+        res = self.client.get(self.url, headers={"If-Modified-Since": "Wed, 01 May 2024 12:30:15 GMT"})
+        self.assertEqual(res.status_code, 304)
+
+        res = self.client.get(self.url, headers={"If-Modified-Since": "Wed, 01 May 2024 12:30:14 GMT"})
+        self.assertEqual(res.status_code, 200)
+
+    def test_pending_flash_forces_render(self):
+        """A page with flash messages to show is rendered even when the client's copy matches"""
+
+        etag = self.client.get(self.url).headers["ETag"]
+        with self.client.session_transaction() as sess:
+            sess["_flashes"] = [("success", "Drink saved")]
+
+        res = self.client.get(self.url, headers={"If-None-Match": etag})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn("Drink saved", res.get_data(as_text=True))
+
+    def test_cache_headers(self):
+        """Anonymous pages are public, logged-in ones private; both vary on Cookie"""
+
+        anonymous = self.client.get(self.url)
+        self.assertTrue(anonymous.cache_control.public)
+        self.assertIsNone(anonymous.cache_control.private)
+        self.assertEqual(anonymous.cache_control.max_age,
+                         self.app.config["DRINK_CACHE_MAX_AGE"])
+        self.assertIn("Cookie", anonymous.vary)
+
+        with self.client.session_transaction() as sess:
+            sess[CURR_USER_KEY] = self.user_id
+        logged_in = self.client.get(self.url)
+        self.assertTrue(logged_in.cache_control.private)
+        self.assertFalse(logged_in.cache_control.public)
+        self.assertIn("Cookie", logged_in.vary)
+        self.assertNotEqual(logged_in.headers["ETag"], anonymous.headers["ETag"])
+
+        res = self.client.get(self.url, headers={"If-None-Match": anonymous.headers["ETag"]})
+        self.assertEqual(res.status_code, 200)
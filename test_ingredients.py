@@ -0,0 +1,136 @@
+"""Ingredient normalization and makeable-drinks tests"""
+
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import ingredients
+from ingredients import MakeableIndex, get_or_create_ingredients, set_drink_ingredients
+
+
+class MakeableIndexTestCase(TestCase):
+    """Test cases for the ingredient -> drinks index"""
+
+    def setUp(self):
+        self.index = MakeableIndex()
+        self.index.add(("catalog", 11007), {"name": "Margarita"},
+                       ["tequila", "triple sec", "lime juice", "salt"])
+        self.index.add(("catalog", 11000), {"name": "Mojito"},
+                       ["light rum", "lime", "sugar", "mint", "soda water"])
+        self.index.add(("drink", 1), {"name": "Gin and Tonic"}, ["gin", "tonic water"])
+
+    def test_exact_pantry(self):
+        """Only drinks whose every ingredient is in the pantry, names normalized"""
+
+        drinks = self.index.makeable(["Gin", " tonic  water", "Lime"])
+
+        self.assertEqual(drinks, [{"name": "Gin and Tonic", "missing": []}])
+
+    def test_missing_ingredients(self):
+        """Drinks short of up to max_missing ingredients are listed, fewest missing first"""
+
+        pantry = ["tequila", "triple sec", "lime juice", "gin"]
+
+        drinks = self.index.makeable(pantry, max_missing=1)
+
+        self.assertEqual([d["name"] for d in drinks], ["Margarita", "Gin and Tonic"])
+        self.assertEqual(drinks[0]["missing"], ["salt"])
+        self.assertEqual(self.index.makeable(pantry, max_missing=1, limit=1)[0]["name"], "Margarita")
+
+    def test_remove(self):
+        """Removed drinks drop out of results"""
+
+        self.index.remove(("drink", 1))
+
+        self.assertEqual(self.index.makeable(["gin", "tonic water"]), [])
+        self.assertEqual(len(self.index), 2)
+
+
+class IngredientRowsTestCase(TestCase):
+    """Test cases for the normalized ingredients tables"""
+
+    def setUp(self):
+        from app import create_app
+        from models import db
+
+        path = os.path.join(tempfile.mkdtemp(), "ingredients.sqlite")
+        self.app = create_app({"DATABASE_URL": f"sqlite:///{path}", "SQLALCHEMY_ECHO": False,
+                               "TESTING": True})
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.db = db
+
+    def tearDown(self):
+        self.db.session.remove()
+        self.ctx.pop()
+
+    def test_set_drink_ingredients(self):
+        """A drink's links follow its ingredient columns, sharing Ingredient rows"""
+
+        from models import Drink, Ingredient, User
+
+        user = User(username="mixer", password="x")
+        self.db.session.add(user)
+        self.db.session.flush()
+        drink = Drink(name="Gimlet", user_id=user.id, ingredient1="Gin",
+                      ingredient2="Lime  Juice", ingredient3="gin")
+        self.db.session.add(drink)
+        set_drink_ingredients(drink)
+        self.db.session.commit()
+
+        self.assertEqual([(link.position, link.ingredient.name) for link in drink.ingredient_links],
+                         [(1, "gin"), (2, "lime juice")])
+
+        drink.ingredient1 = "Vodka"
+        set_drink_ingredients(drink)
+        self.db.session.commit()
+
+        self.assertEqual([link.ingredient.name for link in drink.ingredient_links],
+                         ["vodka", "lime juice", "gin"])
+        self.assertEqual(Ingredient.query.count(), 3)
+
+    def test_concurrent_insert(self):
+        """A name inserted by someone else after our lookup is reused, not a 500"""
+
+        from models import Ingredient
+
+        with self.db.engine.begin() as conn:
+            conn.execute(Ingredient.__table__.insert(), {"name": "gin"})
+
+        with patch.object(ingredients, "existing_ingredients", return_value={}):
+            found = get_or_create_ingredients(["gin", "lime"])
+        self.db.session.commit()
+
+        self.assertEqual(sorted(found), ["gin", "lime"])
+        self.assertEqual(Ingredient.query.count(), 2)
+
+    def test_makeable_api_validation(self):
+        """Bad pantry queries are a 400; limit is at least 1"""
+
+        client = self.app.test_client()
+
+        for body in ({"ingredients": ["gin"], "missing": "x"}, {"ingredients": "gin"},
+                     {"ingredients": ["gin"], "limit": True}, ["gin"]):
+            self.assertEqual(client.post("/api/drinks/makeable", json=body).status_code, 400, body)
+        self.assertEqual(client.get("/api/drinks/makeable?ingredients=gin&limit=x").status_code, 400)
+
+        self.add_drink("Gin Rickey", "Gin", "Soda water")
+        res = client.post("/api/drinks/makeable", json={"ingredients": ["gin"], "missing": 1,
+                                                         "limit": -5})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([d["name"] for d in res.json["drinks"]], ["Gin Rickey"])
+
+    def add_drink(self, name, *names):
+        from models import Drink, User
+
+        user = User(username=f"owner of {name}", password="x")
+        self.db.session.add(user)
+        self.db.session.flush()
+        drink = Drink(name=name, user_id=user.id,
+                      **{f"ingredient{n}": value for n, value in enumerate(names, start=1)})
+        self.db.session.add(drink)
+        set_drink_ingredients(drink)
+        self.db.session.commit()
+        return drink
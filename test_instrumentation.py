@@ -0,0 +1,80 @@
+"""Instrumentation tests"""
+
+import os
+import tempfile
+from unittest import TestCase
+
+from instrumentation import Metrics, stats_gauges
+
+
+class MetricsTestCase(TestCase):
+    """Test cases for the Prometheus text rendering"""
+
+    def test_counters_and_histograms(self):
+        """Counters sum per label set; histogram buckets are cumulative"""
+
+        metrics = Metrics(buckets=(0.1, 1))
+        metrics.describe("requests_total", "counter", "Requests.")
+        metrics.inc("requests_total", endpoint="/a")
+        metrics.inc("requests_total", 2, endpoint="/a")
+        metrics.observe("seconds", 0.05, endpoint="/a")
+        metrics.observe("seconds", 5, endpoint="/a")
+
+        lines = metrics.render().splitlines()
+
+        self.assertIn("# TYPE requests_total counter", lines)
+        self.assertIn('requests_total{endpoint="/a"} 3', lines)
+        self.assertIn('seconds_bucket{endpoint="/a",le="0.1"} 1', lines)
+        self.assertIn('seconds_bucket{endpoint="/a",le="1"} 1', lines)
+        self.assertIn('seconds_bucket{endpoint="/a",le="+Inf"} 2', lines)
+        self.assertIn('seconds_count{endpoint="/a"} 2', lines)
+
+    def test_gauges_and_escaping(self):
+        """Stats dicts become gauges; label values are escaped"""
+
+        gauges = list(stats_gauges("cache", {"hits": 4, "ok": True, "inner": {"size": 2}},
+                                   cache='say "hi"'))
+        text = Metrics().render(gauges)
+
+        self.assertIn('cache_hits{cache="say \\"hi\\""} 4', text)
+        self.assertIn('cache_size{cache="say \\"hi\\"",group="inner"} 2', text)
+        self.assertNotIn("cache_ok", text)
+
+
+
+class InternalEndpointsTestCase(TestCase):
+    """Test cases for the metrics endpoint and on-demand profiles"""
+
+    def make_client(self, **config):
+        from app import create_app
+
+        self.profile_dir = tempfile.mkdtemp()
+        app = create_app({"DATABASE_URL": "sqlite://", "SQLALCHEMY_ECHO": False,
+                          "PROFILE_DIR": self.profile_dir, **config})
+        return app.test_client()
+
+    def test_metrics_need_token(self):
+        """/metrics is off without STATS_TOKEN, and needs it as a bearer token when set"""
+
+        self.assertEqual(self.make_client().get("/metrics").status_code, 404)
+
+        client = self.make_client(STATS_TOKEN="s3cret")
+        self.assertEqual(client.get("/metrics").status_code, 401)
+        self.assertEqual(client.get("/metrics", headers={"Authorization": "Bearer nope"}).status_code,
+                         401)
+        res = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+        self.assertEqual(res.status_code, 200)
+        self.assertIn("mixology_requests_total", res.get_data(as_text=True))
+
+    def test_profile_header_is_an_id(self):
+        """X-Profile names the profile without revealing where it is stored"""
+
+        client = self.make_client(PROFILE_ALLOW_HEADER=True, STATS_TOKEN="s3cret")
+
+        res = client.get("/metrics", headers={"X-Profile": "1", "Authorization": "Bearer s3cret"})
+
+        profile_id = res.headers["X-Profile"]
+        self.assertNotIn(os.sep, profile_id)
+        self.assertNotIn(self.profile_dir, profile_id)
+        [saved] = os.listdir(self.profile_dir)
+        self.assertTrue(saved.endswith(f"-{profile_id}.folded"))
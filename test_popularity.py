@@ -0,0 +1,89 @@
+"""Favourite counter and trending tests"""
+
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+import popularity
+from app import create_app
+from models import db, AddDrink, DrinkPopularity, PopularityBucket, User
+
+NOW = datetime(2026, 10, 18, 9, 30)
+
+
+class PopularityTestCase(TestCase):
+    """Test cases for the counters and the precomputed trending windows"""
+
+    def setUp(self):
+        self.app = create_app({"DATABASE_URL": "sqlite://", "SQLALCHEMY_ECHO": False})
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def favourite(self, drink_id, ago, delta=1):
+        popularity.record_favourite(drink_id, delta, now=NOW - ago)
+
+    def ranking(self, window):
+        return [(row.drink_id, row.score) for row in popularity.trending(window, 10)]
+
+    def test_upsert_counters(self):
+        """Adds and removes land in the running total and the hour's bucket"""
+
+        self.favourite(11007, timedelta(0))
+        self.favourite(11007, timedelta(minutes=20))
+        self.favourite(11007, timedelta(minutes=25), delta=-1)
+        db.session.commit()
+
+        self.assertEqual(db.session.get(DrinkPopularity, 11007).favourites, 1)
+        bucket = db.session.get(PopularityBucket, (11007, datetime(2026, 10, 18, 9)))
+        self.assertEqual((bucket.adds, bucket.removes), (2, 1))
+
+    def test_rolling_windows(self):
+        """'day' is the last 24 hours and 'week' the last 7 days, not calendar days"""
+
+        self.favourite(1, timedelta(hours=23))
+        self.favourite(2, timedelta(hours=25))
+        self.favourite(2, timedelta(days=6, hours=23))
+        self.favourite(3, timedelta(days=7, hours=1))
+        db.session.commit()
+
+        counts = popularity.rollup(now=NOW)
+
+        self.assertEqual(self.ranking("day"), [(1, 1)])
+        self.assertEqual(self.ranking("week"), [(2, 2), (1, 1)])
+        self.assertEqual(self.ranking("all"), [(2, 2), (1, 1), (3, 1)])
+        self.assertEqual(counts, {"day": 1, "week": 2, "all": 3})
+
+    def test_removes_and_retention(self):
+        """Net removals drop a drink from a window; buckets past retention are pruned"""
+
+        self.favourite(1, timedelta(hours=2))
+        self.favourite(1, timedelta(hours=1), delta=-1)
+        self.favourite(2, timedelta(hours=1))
+        self.favourite(3, timedelta(days=40))
+        db.session.commit()
+
+        popularity.rollup(now=NOW, retention_days=35)
+
+        self.assertEqual(self.ranking("day"), [(2, 1)])
+        self.assertEqual(PopularityBucket.query.filter_by(drink_id=3).count(), 0)
+        self.assertEqual(db.session.get(DrinkPopularity, 3).favourites, 1)
+
+    def test_reconcile(self):
+        """reconcile recounts the totals from add_drinks"""
+
+        user = User(username="fan", password="x")
+        db.session.add(user)
+        db.session.flush()
+        db.session.add_all([AddDrink(user_id=user.id, drink_id=drink_id) for drink_id in (1, 2)])
+        self.favourite(3, timedelta(0))
+        db.session.commit()
+
+        popularity.rollup(now=NOW, reconcile=True)
+
+        self.assertEqual(popularity.favourite_counts(), {1: 1, 2: 1})
+        self.assertEqual(self.ranking("all"), [(1, 1), (2, 1)])
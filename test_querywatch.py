@@ -0,0 +1,97 @@
+"""Query watch tests"""
+
+from unittest import TestCase
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+
+from instrumentation import Metrics
+from querywatch import QueryBudgetExceeded, QueryWatch, fingerprint
+
+
+class FingerprintTestCase(TestCase):
+    """Test cases for statement normalization"""
+
+    def test_literals_and_parameters(self):
+        """Queries differing only in values share a fingerprint"""
+
+        a = fingerprint("SELECT * FROM drinks WHERE id = 12 AND name = 'Mojito'")
+        b = fingerprint("SELECT *\n  FROM drinks WHERE id = %(id_1)s AND name = %(name_1)s")
+        c = fingerprint("SELECT * FROM drinks WHERE id = ? AND name = :name")
+
+        self.assertEqual(a, b)
+        self.assertEqual(a, c)
+        self.assertEqual(a[1], "SELECT * FROM drinks WHERE id = ? AND name = ?")
+
+    def test_in_lists(self):
+        """IN lists of any length collapse to one shape"""
+
+        self.assertEqual(fingerprint("SELECT 1 FROM t WHERE id IN (1, 2, 3)")[1],
+                         fingerprint("SELECT 1 FROM t WHERE id IN (?)")[1])
+        self.assertNotEqual(fingerprint("SELECT a FROM t")[0], fingerprint("SELECT b FROM t")[0])
+
+
+class QueryWatchTestCase(TestCase):
+    """Test cases for per-route aggregation, N+1 flags and budgets"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config.update(SQLALCHEMY_DATABASE_URI="sqlite://", N_PLUS_ONE_THRESHOLD=3,
+                               QUERY_BUDGETS={"/one": 1})
+        db = SQLAlchemy(self.app)
+        self.metrics = Metrics()
+        self.watch = QueryWatch(metrics=self.metrics)
+        self.watch.init_app(self.app, db)
+
+        @self.app.route("/one")
+        def one():
+            db.session.execute(text("SELECT 1"))
+            return "ok"
+
+        @self.app.route("/loop/<int:n>")
+        def loop(n):
+            for i in range(n):
+                db.session.execute(text("SELECT :i"), {"i": i})
+            return "ok"
+
+        self.client = self.app.test_client()
+
+    def test_route_aggregates(self):
+        """Counts are kept per route rule, not per URL"""
+
+        self.client.get("/one")
+        self.client.get("/loop/1")
+        self.client.get("/loop/2")
+
+        routes = self.watch.report()["routes"]
+        self.assertEqual(routes["/one"]["queries"], 1)
+        self.assertEqual(routes["/loop/<int:n>"]["requests"], 2)
+        self.assertEqual(routes["/loop/<int:n>"]["queries"], 3)
+        self.assertEqual(routes["/loop/<int:n>"]["max_queries"], 2)
+        self.watch.check_budgets()
+
+    def test_n_plus_one(self):
+        """One statement repeated up to the threshold in a request is flagged"""
+
+        self.client.get("/loop/3")
+
+        report = self.watch.report()
+        [(key, requests)] = report["routes"]["/loop/<int:n>"]["n_plus_one"].items()
+        self.assertEqual(requests, 1)
+        self.assertEqual(report["statements"][key], "SELECT ?")
+        self.assertIn('mixology_n_plus_one_total{endpoint="/loop/<int:n>"} 1',
+                      self.metrics.render())
+        with self.assertRaises(QueryBudgetExceeded):
+            self.watch.check_budgets()
+
+    def test_budget(self):
+        """A route over its budget fails the check until reset"""
+
+        self.watch.budget("/loop/<int:n>", 1)
+        self.client.get("/loop/2")
+
+        with self.assertRaisesRegex(QueryBudgetExceeded, "budget of 1 queries"):
+            self.watch.check_budgets()
+        self.watch.reset()
+        self.watch.check_budgets()
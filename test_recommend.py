@@ -0,0 +1,58 @@
+"""Ingredient similarity tests"""
+
+from unittest import TestCase
+
+import numpy as np
+
+from recommend import ingredient_matrix, top_k_similar
+
+
+def cosine(B, idf):
+    X = B.multiply(idf).toarray()
+    X /= np.linalg.norm(X, axis=1, keepdims=True)
+    scores = X @ X.T
+    np.fill_diagonal(scores, 0)
+    return scores
+
+
+class TopKSimilarTestCase(TestCase):
+    """Test cases for the blocked top-k cosine search"""
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        weights = 1 / np.arange(1, 41)
+        self.drinks = [(1000 + i, [f"i{j}" for j in rng.choice(40, size=rng.integers(2, 6),
+                                                                 replace=False, p=weights / weights.sum())])
+                       for i in range(300)]
+        self.ids, self.B, self.idf = ingredient_matrix(self.drinks)
+
+    def test_matrix(self):
+        """One binary row per drink, rarer ingredients weigh more"""
+
+        self.assertEqual(list(self.ids[:2]), [1000, 1001])
+        self.assertEqual(self.B.shape[0], 300)
+        self.assertEqual(set(self.B.data), {1})
+        df = np.asarray(self.B.sum(axis=0)).ravel()
+        self.assertGreater(self.idf[df.argmin()], self.idf[df.argmax()])
+
+    def test_exact_without_common_ingredients(self):
+        """With every ingredient treated as rare the result is the exact top k"""
+
+        exact = cosine(self.B, self.idf)
+        found = list(top_k_similar(self.B, self.idf, 5, max_df=len(self.drinks), block_rows=64))
+        self.assertEqual(len(found), len(self.drinks))
+        for row, cols, scores in found:
+            best = np.sort(exact[row])[::-1][:5]
+            np.testing.assert_allclose(scores, best[best > 0], rtol=1e-4)
+            np.testing.assert_allclose(exact[row, cols], scores, rtol=1e-4)
+
+    def test_common_ingredients(self):
+        """Bitset scores match the exact cosine; drinks never list themselves"""
+
+        exact = cosine(self.B, self.idf)
+        found = list(top_k_similar(self.B, self.idf, 5, max_df=20, block_rows=64))
+        for row, cols, scores in found:
+            self.assertNotIn(row, cols)
+            np.testing.assert_allclose(exact[row, cols], scores, rtol=1e-4)
+            self.assertTrue(np.all(np.diff(scores) <= 0))
+        self.assertEqual(len(found), len(self.drinks))
@@ -0,0 +1,150 @@
+"""Background refresh tests"""
+
+from contextlib import nullcontext
+from unittest import TestCase
+from flask import Flask
+from cache import LRUCache, SingleFlight
+from refresh import DecayingCounter, Rebuilder, Refresher
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeApp:
+
+    def app_context(self):
+        return nullcontext()
+
+
+class DecayingCounterTestCase(TestCase):
+    """Test cases for recent-popularity counts"""
+
+    def test_counts_halve_each_half_life(self):
+        """Old counts fade so recent activity wins"""
+
+        clock = FakeClock()
+        counter = DecayingCounter(half_life=60, clock=clock)
+        for _ in range(8):
+            counter.incr("search:margarita")
+
+        clock.now = 120
+        counter.incr("search:mojito")
+
+        self.assertEqual(counter["search:margarita"], 2)
+        self.assertEqual(counter["search:mojito"], 1)
+        self.assertEqual(counter["search:negroni"], 0)
+
+
+class RefresherTestCase(TestCase):
+    """Test cases for the stale-entry refresh queue"""
+
+    def setUp(self):
+        self.cache = LRUCache()
+        self.ranked = []
+        self.refresher = Refresher(FakeApp(), self.cache, SingleFlight(), self.priorities, maxsize=3)
+        # run jobs with drain() instead of the background thread
+        self.refresher._ensure_worker = lambda: None
+        self.order = []
+
+    def priorities(self, keys):
+        self.ranked.append(list(keys))
+        return {key: {"lookup:2": 50, "lookup:3": 5}.get(key, 1) for key in keys}
+
+    def loader(self, key):
+        def load():
+            self.order.append(key)
+            return key.upper()
+        return load
+
+    def test_most_popular_first(self):
+        """Queued keys are refreshed in priority order and stored in the cache"""
+
+        for key in ("lookup:1", "lookup:2", "lookup:3"):
+            self.refresher.schedule(key, self.loader(key))
+        self.refresher.drain()
+
+        self.assertEqual(self.order, ["lookup:2", "lookup:3", "lookup:1"])
+        self.assertEqual(self.cache.get("lookup:2"), "LOOKUP:2")
+        self.assertEqual(self.refresher.stats()["refreshed"], 3)
+
+    def test_ranked_by_the_worker(self):
+        """Scheduling doesn't rank; the worker ranks all new keys in one call"""
+
+        for key in ("lookup:1", "lookup:2", "lookup:3"):
+            self.refresher.schedule(key, self.loader(key))
+        self.assertEqual(self.ranked, [])
+        self.refresher.drain()
+
+        self.assertEqual(self.ranked, [["lookup:1", "lookup:2", "lookup:3"]])
+
+    def test_duplicates_and_overflow(self):
+        """A key is queued once, and keys past maxsize are dropped"""
+
+        for key in ("lookup:1", "lookup:1", "lookup:2", "lookup:3"):
+            self.refresher.schedule(key, self.loader(key))
+        self.assertFalse(self.refresher.schedule("lookup:4", self.loader("lookup:4")))
+        self.refresher.drain()
+
+        self.assertEqual(len(self.order), 3)
+        self.assertEqual(self.refresher.stats()["dropped"], 1)
+
+    def test_failures_are_counted(self):
+        """A failing refresh is logged and leaves the old entry alone"""
+
+        self.cache.set("lookup:1", "old")
+        self.refresher.schedule("lookup:1", lambda: 1 / 0)
+        with self.assertLogs(level="WARNING"):
+            self.refresher.drain()
+
+        self.assertEqual(self.cache.get("lookup:1"), "old")
+        self.assertEqual(self.refresher.stats()["failed"], 1)
+
+
+class RebuilderTestCase(TestCase):
+    """Test cases for rebuilding an index in the background"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.rebuilder = Rebuilder("test-rebuild", clock=self.clock)
+        self.builds = 0
+        self.ctx = Flask(__name__).app_context()
+        self.ctx.push()
+
+    def tearDown(self):
+        self.ctx.pop()
+
+    def build(self):
+        self.builds += 1
+        return f"index {self.builds}"
+
+    def test_stale_value_served_while_rebuilding(self):
+        """Only the first build blocks; a stale value is swapped once its replacement is ready"""
+
+        self.assertEqual(self.rebuilder.get(self.build, max_age=60), "index 1")
+        self.clock.now = 30
+        self.assertEqual(self.rebuilder.get(self.build, max_age=60), "index 1")
+        self.assertEqual(self.builds, 1)
+
+        self.clock.now = 61
+        self.assertEqual(self.rebuilder.get(self.build, max_age=60), "index 1")
+        self.rebuilder.join()
+        self.assertEqual(self.rebuilder.get(self.build, max_age=60), "index 2")
+        self.assertEqual(self.rebuilder.built_at, 61)
+
+    def test_failed_rebuild_keeps_old_value(self):
+        """A failing rebuild is logged, and the old value kept until the next attempt"""
+
+        self.rebuilder.get(self.build, max_age=60)
+        self.clock.now = 61
+        with self.assertLogs(level="WARNING"):
+            self.rebuilder.get(lambda: 1 / 0, max_age=60)
+            self.rebuilder.join()
+
+        self.assertEqual(self.rebuilder.get(self.build, max_age=60), "index 1")
+        self.assertEqual(self.builds, 1)
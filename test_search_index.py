@@ -0,0 +1,63 @@
+"""Drink search index tests"""
+
+from unittest import TestCase
+from search_index import SearchIndex
+
+
+class SearchIndexTestCase(TestCase):
+    """Test cases for the in-memory drink search index"""
+
+    def setUp(self):
+        self.index = SearchIndex()
+        self.index.add(("catalog", 11007), {"strDrink": "Margarita"}, "Margarita",
+                       "Ordinary Drink", "Rub the rim of the glass with the lime slice.",
+                       ["Tequila", "Triple sec", "Lime juice", "Salt"])
+        self.index.add(("catalog", 11118), {"strDrink": "Blue Margarita"}, "Blue Margarita",
+                       "Ordinary Drink", "Shake and strain.",
+                       ["Tequila", "Blue Curacao", "Lime juice", "Salt"])
+        self.index.add(("drink", 1), {"strDrink": "Gin Fizz"}, "Gin Fizz",
+                       "Cocktail", "Shake with ice.", ["Gin", "Lemon", "Soda water"])
+
+    def test_name_match_ranks_first(self):
+        """An exact name match outranks drinks that only share ingredients"""
+
+        total, res = self.index.search("margarita")
+
+        self.assertEqual(total, 2)
+        self.assertEqual(res[0]["strDrink"], "Margarita")
+
+    def test_typo_tolerance(self):
+        """Misspelt words still find the drink"""
+
+        total, res = self.index.search("margerita")
+
+        self.assertEqual(total, 2)
+        total, res = self.index.search("tequilla")
+        self.assertEqual(total, 2)
+
+    def test_ingredient_and_prefix_search(self):
+        """Ingredients are searchable, and words match as prefixes"""
+
+        total, res = self.index.search("sod")
+
+        self.assertEqual(total, 1)
+        self.assertEqual(res[0]["strDrink"], "Gin Fizz")
+
+    def test_pagination(self):
+        """Results are split into pages"""
+
+        total, first = self.index.search("lime", page=1, per_page=1)
+        total, second = self.index.search("lime", page=2, per_page=1)
+
+        self.assertEqual(total, 2)
+        self.assertEqual(len(first), 1)
+        self.assertEqual(len(second), 1)
+        self.assertNotEqual(first, second)
+
+    def test_remove(self):
+        """Removed drinks drop out of results"""
+
+        self.index.remove(("drink", 1))
+
+        self.assertEqual(self.index.search("gin fizz"), (0, []))
+        self.assertEqual(len(self.index), 2)
@@ -0,0 +1,71 @@
+"""Bulk seeding tests"""
+
+from unittest import TestCase
+
+from sqlalchemy import func, select
+
+import seed
+from app import create_app
+import popularity
+from models import db, User, Drink, AddDrink, DrinkIngredient, DrinkPopularity, PopularityBucket
+
+
+class SeedTestCase(TestCase):
+    """Test cases for the synthetic data loader"""
+
+    def setUp(self):
+        self.app = create_app({"DATABASE_URL": "sqlite://", "SQLALCHEMY_ECHO": False})
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def count(self, model):
+        return db.session.scalar(select(func.count()).select_from(model))
+
+    def test_seed(self):
+        """Users, drinks, ingredient links and favourites are all written"""
+
+        db.session.add(User(username="existing", password="x"))
+        db.session.commit()
+
+        counts = seed.seed(users=5, drinks=12, favs=3, rounds=4, distinct_passwords=2,
+                           processes=2, batch=4, echo=lambda message: None)
+
+        self.assertEqual(counts["users"], 5)
+        self.assertEqual(self.count(User), 6)
+        self.assertEqual(self.count(Drink), 12)
+        self.assertEqual(self.count(AddDrink), 15)
+        self.assertEqual(self.count(DrinkIngredient), counts["drink_ingredients"])
+        self.assertEqual(db.session.scalar(select(func.sum(DrinkPopularity.favourites))), 15)
+        self.assertEqual(db.session.get(Drink, 1).user_id, 2)
+
+    def test_trending(self):
+        """Seeded favourites land in the hourly buckets, so the day's trending list is filled"""
+
+        seed.seed(users=4, favs=3, rounds=4, processes=1, echo=lambda message: None)
+
+        self.assertEqual(db.session.scalar(select(func.sum(PopularityBucket.adds))), 12)
+        counts = popularity.rollup()
+        self.assertGreater(counts["day"], 0)
+        self.assertEqual(counts["day"], counts["all"])
+
+    def test_passwords(self):
+        """Seeded passwords are bcrypt hashes that log in"""
+
+        seed.seed(users=3, rounds=4, distinct_passwords=2, processes=1, echo=lambda message: None)
+
+        user = User.authenticate("seed3", seed.seed_password(2, 2))
+        self.assertTrue(user)
+        self.assertTrue(user.password.startswith("$2b$04$"))
+        self.assertFalse(User.authenticate("seed3", seed.seed_password(1, 2)))
+
+    def test_drinks_need_owners(self):
+        """Drinks without any users to own them are refused"""
+
+        with self.assertRaises(ValueError):
+            seed.seed(drinks=1, echo=lambda message: None)
@@ -5,9 +5,10 @@ from unittest import TestCase
 from models import Bookmark, db, Language, User, Glass, Category, Ingredient, Drink
 
 os.environ["DATABASE_URL"] = "postgresql:///mixology-test"
-from app import app
+from app import create_app
 
-app.config["SQLALCHEMY_ECHO"] = False
+app = create_app({"SQLALCHEMY_ECHO": False})
+app.app_context().push()
 
 db.drop_all()
 db.create_all()
@@ -0,0 +1,167 @@
+"""User page query-count tests"""
+
+import os
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+import httpx
+from sqlalchemy import event
+
+import popularity
+from app import (create_app, query_watch, drink_index, makeable_index, autocomplete_index,
+                 CURR_USER_KEY)
+from models import db, User, Drink, AddDrink, CatalogDrink
+
+# the logged-in user, the page's user with their drinks, their favourites,
+# the favourited catalogue drinks and the recommendations
+PAGE_QUERIES = 5
+
+app = create_app({"DATABASE_URL": os.environ.get("DATABASE_URL", "sqlite://"),
+                  "SQLALCHEMY_ECHO": False, "WTF_CSRF_ENABLED": False})
+app.app_context().push()
+
+db.drop_all()
+db.create_all()
+
+
+class UserPageQueriesTestCase(TestCase):
+    """The user and favourites pages cost the same number of queries for any user"""
+
+    def setUp(self):
+        AddDrink.query.delete()
+        Drink.query.delete()
+        CatalogDrink.query.delete()
+        User.query.delete()
+        db.session.expunge_all()
+        now = datetime.utcnow()
+        db.session.add_all([
+            CatalogDrink(id=i, name=f"Drink {i}", synced_at=now,
+                         data={"idDrink": str(i), "strDrink": f"Drink {i}"})
+            for i in range(1, 41)
+        ])
+        self.few = self.make_user("few", drinks=1, favourites=1)
+        self.many = self.make_user("many", drinks=25, favourites=40)
+        self.other = self.make_user("other", drinks=5, favourites=0)
+        db.session.commit()
+        self.client = app.test_client()
+        query_watch.reset()
+
+    def tearDown(self):
+        db.session.rollback()
+
+    def make_user(self, username, drinks, favourites):
+        user = User(username=username, password="x")
+        db.session.add(user)
+        db.session.flush()
+        db.session.add_all([Drink(name=f"{username} {n}", user_id=user.id) for n in range(drinks)])
+        start = datetime.utcnow()
+        db.session.add_all([AddDrink(user_id=user.id, drink_id=n + 1,
+                                     created_at=start + timedelta(seconds=n))
+                            for n in range(favourites)])
+        return user.id
+
+    def count_queries(self, url, user_id):
+        with self.client.session_transaction() as sess:
+            sess[CURR_USER_KEY] = user_id
+        db.session.expunge_all()
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", count)
+        try:
+            resp = self.client.get(url)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", count)
+        self.assertEqual(resp.status_code, 200)
+        return len(statements), resp
+
+    def test_favourites_page(self):
+        """Favourites page: same query count for 1 or 40 favourites and only the user's drinks"""
+
+        few, _ = self.count_queries(f"/users/{self.few}/fav/", self.few)
+        many, resp = self.count_queries(f"/users/{self.many}/fav/", self.many)
+        self.assertEqual(few, PAGE_QUERIES)
+        self.assertEqual(many, PAGE_QUERIES)
+        query_watch.check_budgets()
+        html = resp.get_data(as_text=True)
+        self.assertIn("many 24", html)
+        self.assertNotIn("other 0", html)
+        self.assertLess(html.index("Drink 40"), html.index("Drink 1<"))
+
+    def test_cold_catalogue(self):
+        """Favourites missing from the mirror cost a fixed number of queries and get mirrored"""
+
+        CatalogDrink.query.delete()
+        db.session.commit()
+        drink_index(), makeable_index(), autocomplete_index()
+        client = app.extensions["mixology"].cocktaildb_async
+        client.transport = httpx.MockTransport(lambda request: httpx.Response(200, json={"drinks": [
+            {"idDrink": request.url.params["i"], "strDrink": f"Drink {request.url.params['i']}"}]}))
+        try:
+            few, _ = self.count_queries(f"/users/{self.few}/fav/", self.few)
+            CatalogDrink.query.delete()
+            db.session.commit()
+            many, resp = self.count_queries(f"/users/{self.many}/fav/", self.many)
+        finally:
+            client.transport = None
+
+        # plus reading the fetched drinks' mirror rows and one INSERT
+        self.assertEqual(few, PAGE_QUERIES + 2)
+        self.assertEqual(many, PAGE_QUERIES + 2)
+        self.assertEqual(CatalogDrink.query.count(), 40)
+        self.assertIn("Drink 40", resp.get_data(as_text=True))
+
+    def test_user_page(self):
+        """User page: same query count for 1 or 40 favourites"""
+
+        few, _ = self.count_queries(f"/users/{self.few}", self.few)
+        many, _ = self.count_queries(f"/users/{self.many}", self.many)
+        self.assertEqual(few, PAGE_QUERIES)
+        self.assertEqual(many, PAGE_QUERIES)
+        query_watch.check_budgets()
+
+
+class RemoveFavouriteTestCase(TestCase):
+    """Test cases for removing a drink from the logged-in user's favourites"""
+
+    def setUp(self):
+        AddDrink.query.delete()
+        User.query.delete()
+        db.session.expunge_all()
+        user = User(username="fan", password="x")
+        other = User(username="other", password="x")
+        db.session.add_all([user, other])
+        db.session.flush()
+        self.user_id, self.other_id = user.id, other.id
+        db.session.add_all([AddDrink(user_id=self.user_id, drink_id=11007),
+                            AddDrink(user_id=self.other_id, drink_id=11007)])
+        popularity.reconcile_totals()
+        db.session.commit()
+        self.client = app.test_client()
+        with self.client.session_transaction() as sess:
+            sess[CURR_USER_KEY] = self.user_id
+
+    def tearDown(self):
+        db.session.rollback()
+
+    def test_remove(self):
+        """Only the user's own favourite goes, and the drink's count drops by one"""
+
+        resp = self.client.post("/users/11007/delete")
+
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(resp.location, "/")
+        db.session.expunge_all()
+        self.assertIsNone(db.session.get(AddDrink, (self.user_id, 11007)))
+        self.assertIsNotNone(db.session.get(AddDrink, (self.other_id, 11007)))
+        self.assertEqual(popularity.favourite_counts([11007]), {11007: 1})
+
+    def test_not_a_favourite(self):
+        """Removing a drink the user never favourited is a 404 and changes nothing"""
+
+        resp = self.client.post("/users/11000/delete")
+
+        self.assertEqual(resp.status_code, 404)
+        self.assertEqual(popularity.favourite_counts([11007]), {11007: 2})
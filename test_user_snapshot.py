@@ -0,0 +1,82 @@
+"""Per-request identity lookup tests"""
+
+import time
+from unittest import TestCase
+
+from flask import g, session
+from sqlalchemy import event
+
+from app import create_app, CURR_USER_KEY, USER_SNAPSHOT_KEY
+from models import db, User
+
+
+class AddUserToGTestCase(TestCase):
+    """Test cases for how many queries finding the logged-in user costs"""
+
+    def setUp(self):
+        self.app = create_app({"DATABASE_URL": "sqlite://", "SQLALCHEMY_ECHO": False,
+                               "IDENTITY_SNAPSHOT_TTL": 60})
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        user = User(username="regular", password="x")
+        db.session.add(user)
+        db.session.commit()
+        self.user_id = user.id
+        self.statements = []
+        event.listen(db.engine, "before_cursor_execute", self.count)
+
+    def tearDown(self):
+        event.remove(db.engine, "before_cursor_execute", self.count)
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def count(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def preprocess(self, path="/", logged_in=False, snapshot_age=None):
+        """Run the before-request hooks for `path`; returns (g.user, the session snapshot)."""
+
+        with self.app.test_request_context(path):
+            if logged_in:
+                session[CURR_USER_KEY] = self.user_id
+            if snapshot_age is not None:
+                session[USER_SNAPSHOT_KEY] = {"id": self.user_id, "username": "regular",
+                                              "at": time.time() - snapshot_age}
+            self.app.preprocess_request()
+            return g.user, session.get(USER_SNAPSHOT_KEY)
+
+    def test_static_files(self):
+        """Static files skip the user lookup, even with a stale snapshot"""
+
+        user, _ = self.preprocess("/static/site.css", logged_in=True, snapshot_age=3600)
+
+        self.assertIsNone(user)
+        self.assertEqual(self.statements, [])
+
+    def test_anonymous(self):
+        """Anonymous requests run no queries"""
+
+        user, _ = self.preprocess()
+
+        self.assertIsNone(user)
+        self.assertEqual(self.statements, [])
+
+    def test_fresh_snapshot(self):
+        """Within the TTL the user comes from the signed session, not the users table"""
+
+        user, _ = self.preprocess(logged_in=True, snapshot_age=30)
+
+        self.assertEqual((user.id, user.username), (self.user_id, "regular"))
+        self.assertEqual(self.statements, [])
+
+    def test_expired_snapshot(self):
+        """Past the TTL the user is loaded once and the snapshot renewed"""
+
+        user, snapshot = self.preprocess(logged_in=True, snapshot_age=120)
+
+        self.assertIsInstance(user, User)
+        self.assertEqual(len(self.statements), 1)
+        self.assertIn("FROM users", self.statements[0])
+        self.assertGreater(snapshot["at"], time.time() - 5)
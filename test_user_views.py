@@ -4,11 +4,11 @@ from models import db, User, Language, Bookmark, Ingredient, Glass, Category, Dr
 
 os.environ["DATABASE_URL"] = "postgresql:///mixology-test"
 
-from app import app, USER_KEY
+from app import create_app, USER_KEY
 
-app.config["SQLALCHEMY_DATABASE_URI"] = "postgresql:///mixology-test"
-app.config["SQLALCHEMY_ECHO"] = False
-app.config["WTF_CSRF_ENABLED"] = False
+app = create_app({"SQLALCHEMY_DATABASE_URI": "postgresql:///mixology-test",
+                  "SQLALCHEMY_ECHO": False, "WTF_CSRF_ENABLED": False})
+app.app_context().push()
 
 db.drop_all()
 db.create_all()